@@ -0,0 +1,63 @@
+"""
+Compares avalidate_many in the event loop, in the default thread pool and in a process pool, and shows how long the
+event loop is blocked at most while the IBANs are validated.
+
+Usage: python benchmarks/async_validation.py [number of items]
+"""
+from __future__ import print_function
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django_iban.async_validation import avalidate_many  # noqa: E402
+
+from validate_many import SAMPLES  # noqa: E402
+
+
+async def ticker(stop, delays):
+    """ Records how late a 1 ms sleep wakes up, which is how long other tasks of the loop had to wait. """
+    while not stop.is_set():
+        start = time.time()
+        await asyncio.sleep(0.001)
+        delays.append(time.time() - start - 0.001)
+
+
+async def consume(values, delays, **kwargs):
+    stop = asyncio.Event()
+    task = asyncio.ensure_future(ticker(stop, delays))
+    await asyncio.sleep(0)
+    async for result in avalidate_many(values, **kwargs):
+        pass
+    stop.set()
+    await task
+
+
+def run(**kwargs):
+    delays = []
+
+    def func(values):
+        asyncio.run(consume(values, delays, **kwargs))
+    return func, delays
+
+
+def main(count):
+    values = (SAMPLES * (count // len(SAMPLES) + 1))[:count]
+    print('{0} items'.format(count))
+    with ProcessPoolExecutor() as executor:
+        for name, kwargs in [
+                ('event loop', {'executor_threshold': count + 1}),
+                ('thread pool', {'executor_threshold': 1}),
+                ('process pool', {'executor_threshold': 1, 'executor': executor})]:
+            func, delays = run(batch_size=10000, **kwargs)
+            report('avalidate_many, ' + name, measure(func, values))
+            print('{0:<40} {1:>10.1f} ms'.format('  longest event loop delay', max(delays or [0]) * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,59 @@
+"""
+Measures BIC existence checks and IBAN to BIC lookups in a generated BIC directory.
+
+Usage: python benchmarks/bic_directory.py [number of banks]
+"""
+from __future__ import print_function
+
+import io
+import os
+import shutil
+import string
+import sys
+import tempfile
+import time
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django_iban.bic_directory import BICDirectory, build_bic_index  # noqa: E402
+from django_iban.checksum import check_digits  # noqa: E402
+
+
+def bic(seed):
+    letters = ''.join(string.ascii_uppercase[(seed // 26 ** i) % 26] for i in range(4))
+    return letters + 'DE' + 'FF' + '%03d' % (seed % 1000)
+
+
+def main(count):
+    directory = tempfile.mkdtemp()
+    try:
+        csv_path = os.path.join(directory, 'banks.csv')
+        index_path = os.path.join(directory, 'banks.idx')
+        with io.open(csv_path, 'w', newline='') as f:
+            f.write('bic,country_code,bank_code\n')
+            for seed in range(count):
+                f.write('%s,DE,%08d\n' % (bic(seed), seed * 7))
+
+        start = time.time()
+        build_bic_index(csv_path, index_path)
+        print('{0} banks, index built in {1:.2f} seconds, {2:,} bytes'.format(
+            count, time.time() - start, os.path.getsize(index_path)))
+
+        bic_directory = BICDirectory(index_path)
+        bics = [bic(seed * 13 % count) for seed in range(10000)]
+        ibans = []
+        for seed in range(10000):
+            bban = '%08d%010d' % (seed * 7 % (count * 7), seed)
+            ibans.append('DE' + check_digits('DE', bban) + bban)
+        report('BICDirectory.exists', measure(lambda values: [bic_directory.exists(x) for x in values], bics))
+        report('BICDirectory.bic_for_iban', measure(lambda values: [bic_directory.bic_for_iban(x) for x in values],
+                                                    ibans))
+        bic_directory.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of the mod-97 checksum for every country format in IBAN_COUNTRY_CODE_LENGTH.
+
+Compares django_iban.checksum.mod97 with the digit-string expansion previously used by IBANValidator.
+
+Usage: python benchmarks/checksum.py
+"""
+from __future__ import print_function
+
+import timeit
+
+from common import setup_django
+
+setup_django()
+
+from django_iban.checksum import check_digits, mod97  # noqa: E402
+from django_iban.validators import IBAN_COUNTRY_CODE_LENGTH  # noqa: E402
+
+
+def legacy_mod97(value):
+    """ The algorithm IBANValidator used before the checksum module was added. """
+    value_digits = ''
+    for x in value:
+        ord_value = ord(x)
+        if 48 <= ord_value <= 57:  # 0 - 9
+            value_digits += x
+        elif 65 <= ord_value <= 90:  # A - Z
+            value_digits += str(ord_value - 55)
+        else:
+            return None
+    return int(value_digits) % 97
+
+
+def sample_iban(country_code, length):
+    """ A valid IBAN for the country with a BBAN that alternates letters and digits. """
+    bban = ('AB12CD34EF56GH78IJ90KL12MN34PQ56' * 2)[:length - 4]
+    return country_code + check_digits(country_code, bban) + bban
+
+
+def main(number=20000):
+    print('{0:<8} {1:>6} {2:>12} {3:>12} {4:>8}'.format('country', 'length', 'legacy us', 'mod97 us', 'speedup'))
+    total_legacy = total_new = 0.0
+    for country_code, length in sorted(IBAN_COUNTRY_CODE_LENGTH.items()):
+        iban = sample_iban(country_code, length)
+        rearranged = iban[4:] + iban[:4]
+        assert legacy_mod97(rearranged) == mod97(rearranged) == 1
+
+        legacy = min(timeit.repeat(lambda: legacy_mod97(rearranged), number=number, repeat=3)) * 1e6 / number
+        new = min(timeit.repeat(lambda: mod97(rearranged), number=number, repeat=3)) * 1e6 / number
+        total_legacy += legacy
+        total_new += new
+        print('{0:<8} {1:>6} {2:>12.3f} {3:>12.3f} {4:>7.1f}x'.format(country_code, length, legacy, new, legacy / new))
+
+    print('{0:<15} {1:>12.3f} {2:>12.3f} {3:>7.1f}x'.format('total', total_legacy, total_new, total_legacy / total_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+Shared helpers for the django-iban benchmark scripts.
+
+The scripts in this directory are run directly from a checkout, e.g. ``python benchmarks/validate_many.py``.
+"""
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+
+def setup_django():
+    """ Make the checkout importable and configure Django with the test settings. """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'testsettings')
+
+    import django
+    if hasattr(django, 'setup'):
+        django.setup()
+
+
+def measure(func, items, repeat=5):
+    """ Returns the best per-item cost of ``func(items)`` in microseconds. """
+    best = min(timeit.repeat(lambda: func(items), number=1, repeat=repeat))
+    return best * 1e6 / len(items)
+
+
+def report(name, per_item_us):
+    ops = 1e6 / per_item_us if per_item_us else float('inf')
+    print('{0:<40} {1:>10.3f} us/item {2:>14,.0f} ops/sec'.format(name, per_item_us, ops))
@@ -0,0 +1,53 @@
+"""
+Measures the throughput of extract_ibans in MB/s on generated text with IBANs in compact, spaced and dashed formats.
+
+Usage: python benchmarks/extraction.py [size in MB]
+"""
+from __future__ import print_function
+
+import io
+import sys
+import timeit
+
+from common import setup_django
+
+setup_django()
+
+from django_iban.extraction import extract_ibans  # noqa: E402
+
+from validate_many import SAMPLES  # noqa: E402
+
+
+WORDS = ('Payment for invoice 2017-0042 of 12 March, reference AB12 CD34. Please transfer the amount of EUR 1.234,56 '
+         'to the account below before the due date. ').split()
+
+
+def generate_text(size, every=20):
+    """ Returns about ``size`` bytes of text with an IBAN every ``every`` words. """
+    parts = []
+    length = 0
+    index = 0
+    while length < size:
+        word = WORDS[index % len(WORDS)]
+        if index % every == every - 1:
+            iban = SAMPLES[index // every % len(SAMPLES)]
+            word = '-'.join(iban[i:i + 4] for i in range(0, len(iban), 4)) if index // every % 2 else iban
+        parts.append(word)
+        length += len(word) + 1
+        index += 1
+    return ' '.join(parts).encode('ascii')
+
+
+def main(megabytes):
+    for every in (20, 500):
+        data = generate_text(int(megabytes * 1024 * 1024), every)
+        print('{0:.1f} MB, an IBAN every {1} words, {2} IBANs found'.format(
+            len(data) / 1024.0 / 1024, every, len(list(extract_ibans(data)))))
+        for name, chunk_size in [('64 KiB chunks', 64 * 1024), ('1 MiB chunks', 1024 * 1024)]:
+            elapsed = min(timeit.repeat(lambda: list(extract_ibans(io.BytesIO(data), chunk_size=chunk_size)),
+                                        number=1, repeat=3))
+            print('{0:<40} {1:>10.1f} MB/s'.format('extract_ibans, ' + name, len(data) / elapsed / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 20)
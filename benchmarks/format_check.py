@@ -0,0 +1,60 @@
+"""
+Compares the compiled IBAN format of django_iban.bban.get_iban_format with the separate structural checks that
+IBANValidator did before: the length, the characters, the check digits and BBANStructure.matches.
+
+Usage: python benchmarks/format_check.py [number of items]
+"""
+from __future__ import print_function
+
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from suite import generate_ibans  # noqa: E402
+
+from django_iban.bban import get_bban_structure, get_iban_format  # noqa: E402
+from django_iban.validators import IBAN_COUNTRY_CODE_LENGTH, NORDEA_COUNTRY_CODE_LENGTH, IBANValidator  # noqa: E402
+
+
+LENGTHS = dict(IBAN_COUNTRY_CODE_LENGTH, **NORDEA_COUNTRY_CODE_LENGTH)
+
+
+def legacy_format_check(value):
+    """ The structural checks IBANValidator did before the compiled IBAN format. """
+    expected_length = LENGTHS.get(value[:2])
+    if expected_length is None or expected_length != len(value):
+        return False
+    if not (value.isalnum() and value.isascii()):
+        return False
+    check_digits = value[2:4]
+    if not (check_digits.isdigit() and '02' <= check_digits <= '98'):
+        return False
+    return get_bban_structure(value[:2]).matches(value[4:])
+
+
+def compiled_format_check(value):
+    return value[:2] in LENGTHS and get_iban_format().fullmatch(value) is not None and '02' <= value[2:4] <= '98'
+
+
+def main(count):
+    valid, invalid = generate_ibans()
+    # A digit where the BBAN has letters, or a letter where it has digits.
+    invalid.extend(iban[:-1] + ('1' if iban[-1].isalpha() else 'A') for iban in valid)
+    values = valid + invalid
+    assert [legacy_format_check(value) for value in values] == [compiled_format_check(value) for value in values]
+    values = (values * (count // len(values) + 1))[:count]
+
+    get_iban_format()
+    validator = IBANValidator(use_nordea_extensions=True)
+    print('{0} items, {1:.0%} invalid'.format(count, float(len(invalid)) / (len(valid) + len(invalid))))
+    report('legacy format check', measure(lambda items: [legacy_format_check(x) for x in items], values))
+    report('compiled IBAN format', measure(lambda items: [compiled_format_check(x) for x in items], values))
+    report('IBANValidator.precheck', measure(lambda items: [validator.precheck(x) for x in items], values))
+    report('IBANValidator.precheck (valid only)', measure(lambda items: [validator.precheck(x) for x in items],
+                                                          valid * (count // len(valid))))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
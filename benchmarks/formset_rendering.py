@@ -0,0 +1,90 @@
+"""
+Rendering cost of formsets with many IBANFormField rows, before and after the display format of IBANs was cached.
+
+"before" uses a form field that regroups the value on every render like django-iban did before format_iban. The
+formsets are rendered unbound with initial values, and bound with the submitted values and a validation error in every
+row, the way a formset is shown again after a failed submit. "cold" clears the display format cache before every run.
+
+Usage: python benchmarks/formset_rendering.py [number of rows]
+"""
+from __future__ import print_function
+
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django import forms  # noqa: E402
+
+from django_iban.forms import IBANFormField  # noqa: E402
+from django_iban.generator import IBANGenerator  # noqa: E402
+from django_iban.validators import _format_iban, normalize_iban  # noqa: E402
+
+
+class LegacyIBANFormField(IBANFormField):
+    def prepare_value(self, value):
+        if value is None:
+            return value
+        grouping = 4
+        value = normalize_iban(value)
+        return ' '.join(value[i:i + grouping] for i in range(0, len(value), grouping))
+
+
+class PaymentForm(forms.Form):
+    iban = IBANFormField()
+    # Fails for every row, so the bound formset is rendered with errors.
+    amount = forms.DecimalField(max_value=0)
+
+
+class LegacyPaymentForm(PaymentForm):
+    iban = LegacyIBANFormField()
+
+
+def render_initial(form_class, ibans):
+    formset_class = forms.formset_factory(form_class, extra=0)
+    return lambda rows: formset_class(initial=[{'iban': iban, 'amount': 1} for iban in rows]).as_table()
+
+
+def render_bound(form_class, ibans):
+    formset_class = forms.formset_factory(form_class, extra=0)
+    data = {'form-TOTAL_FORMS': str(len(ibans)), 'form-INITIAL_FORMS': '0'}
+    for i, iban in enumerate(ibans):
+        # Submitted values in the display format, as the browser sends them back.
+        data['form-%d-iban' % i] = ' '.join(iban[j:j + 4] for j in range(0, len(iban), 4))
+        data['form-%d-amount' % i] = '1'
+
+    def run(rows):
+        formset = formset_class(data)
+        assert not formset.is_valid()
+        return formset.as_table()
+    return run
+
+
+def cold(func):
+    def run(rows):
+        _format_iban.cache_clear()
+        return func(rows)
+    return run
+
+
+def main(count):
+    ibans = [iban for iban, error_code in IBANGenerator(seed=1).generate(count)]
+    legacy_field = LegacyIBANFormField()
+    report('prepare_value, before', measure(lambda values: [legacy_field.prepare_value(value) for value in values],
+                                            ibans))
+    field = IBANFormField()
+    report('prepare_value, after (cold)', measure(cold(lambda values: [field.prepare_value(value) for value in values]),
+                                                  ibans))
+    report('prepare_value, after', measure(lambda values: [field.prepare_value(value) for value in values], ibans))
+
+    print('{0} rows, per row'.format(count))
+    report('initial formset, before', measure(render_initial(LegacyPaymentForm, ibans), ibans))
+    report('initial formset, after (cold)', measure(cold(render_initial(PaymentForm, ibans)), ibans))
+    report('initial formset, after', measure(render_initial(PaymentForm, ibans), ibans))
+    report('bound formset, before', measure(render_bound(LegacyPaymentForm, ibans), ibans))
+    report('bound formset, after', measure(render_bound(PaymentForm, ibans), ibans))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
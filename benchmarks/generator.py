@@ -0,0 +1,55 @@
+"""
+Measures how fast django_iban.generator produces IBANs and writes and reads corpus files.
+
+Usage: python benchmarks/generator.py [number of IBANs]
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django_iban.generator import ERROR_TYPES, IBANGenerator, read_corpus, write_corpus  # noqa: E402
+from django_iban.sepa_countries import IBAN_SEPA_COUNTRIES  # noqa: E402
+from django_iban.validators import IBANValidator  # noqa: E402
+
+
+def main(count):
+    error_rates = dict((error_code, 0.05) for error_code in ERROR_TYPES)
+    report('IBANGenerator, valid only', measure(lambda n: list(IBANGenerator(seed=1).generate(len(n))), range(count)))
+    report('IBANGenerator, 30% invalid', measure(
+        lambda n: list(IBANGenerator(seed=1, include_countries=IBAN_SEPA_COUNTRIES,
+                                     error_rates=error_rates).generate(len(n))), range(count)))
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'ibans.csv')
+        generator = IBANGenerator(seed=1, include_countries=IBAN_SEPA_COUNTRIES, error_rates=error_rates)
+        start = time.time()
+        write_corpus(path, generator.generate(count))
+        elapsed = time.time() - start
+        size = os.path.getsize(path)
+        print('wrote {0:,} IBANs ({1:,} bytes) in {2:.2f} seconds, {3:.1f} MB/s'.format(
+            count, size, elapsed, size / elapsed / 1e6))
+
+        start = time.time()
+        items = list(read_corpus(path))
+        print('read {0:,} IBANs in {1:.2f} seconds'.format(len(items), time.time() - start))
+
+        validator = IBANValidator(include_countries=IBAN_SEPA_COUNTRIES)
+        mismatches = sum(1 for (iban, error_code), (value, normalized, result) in
+                         zip(items, validator.validate_many(iban for iban, error_code in items))
+                         if error_code != result)
+        print('{0} IBANs with another error code than expected'.format(mismatches))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,72 @@
+"""
+Form round-trip cost of IBAN normalization: form field clean, model field clean and prepare_value for display.
+
+"before" uses field subclasses that normalize with plain strings like django-iban did before normalize_iban, so every
+stage normalizes the value again.
+
+Usage: python benchmarks/normalization.py [number of items]
+"""
+from __future__ import print_function
+
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django_iban.fields import IBANField  # noqa: E402
+from django_iban.forms import IBANFormField  # noqa: E402
+
+
+def legacy_normalize(value):
+    return value.upper().replace(' ', '').replace('-', '')
+
+
+class LegacyIBANFormField(IBANFormField):
+    def to_python(self, value):
+        value = super(IBANFormField, self).to_python(value)
+        if value is not None:
+            return legacy_normalize(value)
+        return value
+
+    def prepare_value(self, value):
+        if value is None:
+            return value
+        grouping = 4
+        value = legacy_normalize(value)
+        return ' '.join(value[i:i + grouping] for i in range(0, len(value), grouping))
+
+
+class LegacyIBANField(IBANField):
+    def to_python(self, value):
+        value = super(IBANField, self).to_python(value)
+        if value is not None:
+            return legacy_normalize(value)
+        return value
+
+
+SAMPLES = [
+    'NL91 ABNA 0417 1643 00',
+    'GB82WEST12345698765432',
+    'gr16-0110-1250-0000-0001-2300-695',
+    'MU17 BOMM 0101 1010 3030 0200 000M UR',
+]
+
+
+def round_trip(form_field, model_field):
+    def run(values):
+        for value in values:
+            cleaned = form_field.clean(value)
+            cleaned = model_field.clean(cleaned, None)
+            form_field.prepare_value(cleaned)
+    return run
+
+
+def main(count):
+    values = (SAMPLES * (count // len(SAMPLES) + 1))[:count]
+    report('before', measure(round_trip(LegacyIBANFormField(), LegacyIBANField()), values))
+    report('after', measure(round_trip(IBANFormField(), IBANField()), values))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
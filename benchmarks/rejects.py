@@ -0,0 +1,93 @@
+"""
+Cost of rejecting invalid IBANs and BICs with ValidationError, before and after the messages were rendered lazily.
+
+"before" formats and translates the message when the ValidationError is raised, like django-iban did before the errors
+got a code and params. "codes only" catches the errors and reads the code, as a batch job or JSON API does. "messages"
+reads the rendered messages too, as a form does. The German translation is active.
+
+Usage: python benchmarks/rejects.py [number of items]
+"""
+from __future__ import print_function
+
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django.core.exceptions import ValidationError  # noqa: E402
+from django.utils import translation  # noqa: E402
+
+from django_iban.generator import ERROR_TYPES, IBANGenerator  # noqa: E402
+from django_iban.validators import (BIC_ERROR_MESSAGES, BIC_INVALID_COUNTRY_CODE,  # noqa: E402
+                                    BIC_INVALID_INSTITUTION_CODE, BIC_INVALID_LENGTH, IBAN_COUNTRY_NOT_ALLOWED,
+                                    IBAN_ERROR_MESSAGES, IBAN_INVALID_CHARACTER, IBAN_INVALID_COUNTRY,
+                                    IBAN_INVALID_LENGTH, IBANValidator, _check_swift_bic, swift_bic_validator)
+from suite import generate_bics  # noqa: E402
+
+
+class LegacyIBANValidator(IBANValidator):
+    def validation_error(self, value, error_code, error_param):
+        if error_code == IBAN_INVALID_LENGTH:
+            msg_params = {'country_code': value[:2], 'number': error_param}
+            return ValidationError(IBAN_ERROR_MESSAGES[error_code] % msg_params)
+        elif error_code == IBAN_INVALID_COUNTRY or error_code == IBAN_COUNTRY_NOT_ALLOWED:
+            return ValidationError(IBAN_ERROR_MESSAGES[error_code] % {'country_code': error_param})
+        elif error_code == IBAN_INVALID_CHARACTER:
+            return ValidationError(IBAN_ERROR_MESSAGES[error_code] % {'character': error_param})
+        return ValidationError(IBAN_ERROR_MESSAGES[error_code])
+
+
+def legacy_swift_bic_validator(value):
+    error_code = _check_swift_bic(value)
+    if error_code == BIC_INVALID_LENGTH:
+        raise ValidationError(BIC_ERROR_MESSAGES[error_code], code=error_code)
+    elif error_code == BIC_INVALID_INSTITUTION_CODE:
+        raise ValidationError(BIC_ERROR_MESSAGES[error_code] % {'institution_code': value[:4]}, code=error_code)
+    elif error_code == BIC_INVALID_COUNTRY_CODE:
+        raise ValidationError(BIC_ERROR_MESSAGES[error_code] % {'country_code': value[4:6]}, code=error_code)
+
+
+def codes(validator):
+    def run(values):
+        for value in values:
+            try:
+                validator(value)
+            except ValidationError as e:
+                e.code
+    return run
+
+
+def messages(validator):
+    def run(values):
+        for value in values:
+            try:
+                validator(value)
+            except ValidationError as e:
+                e.messages
+    return run
+
+
+def main(count):
+    # All error types except IBAN_COUNTRY_NOT_ALLOWED, which needs include_countries.
+    error_types = [error_code for error_code in ERROR_TYPES if error_code != IBAN_COUNTRY_NOT_ALLOWED]
+    generator = IBANGenerator(seed=1, error_rates=dict((error_code, 0.99 / len(error_types))
+                                                       for error_code in error_types))
+    ibans = [iban for iban, error_code in generator.generate(count)]
+    invalid_bics = generate_bics()[1]
+    bics = (invalid_bics * (count // len(invalid_bics) + 1))[:count]
+
+    legacy_validator = LegacyIBANValidator()
+    validator = IBANValidator()
+    print('{0} invalid IBANs and BICs'.format(count))
+    with translation.override('de'):
+        report('IBAN, codes only, before', measure(codes(legacy_validator), ibans))
+        report('IBAN, codes only, after', measure(codes(validator), ibans))
+        report('IBAN, messages, before', measure(messages(legacy_validator), ibans))
+        report('IBAN, messages, after', measure(messages(validator), ibans))
+        report('BIC, codes only, before', measure(codes(legacy_swift_bic_validator), bics))
+        report('BIC, codes only, after', measure(codes(swift_bic_validator), bics))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
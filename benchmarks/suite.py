@@ -0,0 +1,261 @@
+"""
+Benchmark suite for the django-iban validators and fields.
+
+Every benchmark runs over generated valid and invalid IBANs for all countries in IBAN_COUNTRY_CODE_LENGTH and
+NORDEA_COUNTRY_CODE_LENGTH, or over generated BICs. The suite reports operations per second and the memory allocated
+per call (the tracemalloc peak of a single call).
+
+The ``import_django_iban`` benchmark measures what importing the django-iban modules adds to the startup of a new
+process with ``python -X importtime``, reported as imports per second. Django is imported first and not counted.
+
+Usage:
+
+    python benchmarks/suite.py                      # run and print the results
+    python benchmarks/suite.py --save               # also store the results in benchmarks/baseline.json
+    python benchmarks/suite.py --compare            # compare with benchmarks/baseline.json
+    python benchmarks/suite.py --filter iban_field  # only run the benchmarks with this text in their name
+
+The baseline is only meaningful on the machine it was recorded on, record a new one before comparing a change.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from common import setup_django
+
+setup_django()
+
+from django.core.exceptions import ValidationError  # noqa: E402
+
+from django_iban.bban import get_bban_structure  # noqa: E402
+from django_iban.checksum import check_digits  # noqa: E402
+from django_iban.fields import IBANField, SWIFTBICField  # noqa: E402
+from django_iban.forms import IBANFormField, SWIFTBICFormField  # noqa: E402
+from django_iban.validators import (IBANValidator, swift_bic_validator, IBAN_COUNTRY_CODE_LENGTH,  # noqa: E402
+                                    NORDEA_COUNTRY_CODE_LENGTH)
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_MODULES = ('django_iban.validators', 'django_iban.forms', 'django_iban.fields')
+
+CHARACTERS = {'n': string.digits, 'a': string.ascii_uppercase, 'c': string.digits + string.ascii_uppercase}
+
+
+def generate_bban(country_code, seed):
+    """ A BBAN that matches the character classes of the country. """
+    bban = []
+    for count, character_class in get_bban_structure(country_code).character_classes:
+        characters = CHARACTERS[character_class]
+        for i in range(count):
+            bban.append(characters[(seed * 7 + len(bban) * 13) % len(characters)])
+    return ''.join(bban)
+
+
+def generate_ibans():
+    """ Returns a list of valid IBANs and a list of invalid IBANs for every country. """
+    valid = []
+    invalid = []
+    for seed, country_code in enumerate(sorted(IBAN_COUNTRY_CODE_LENGTH) + sorted(NORDEA_COUNTRY_CODE_LENGTH)):
+        bban = generate_bban(country_code, seed)
+        iban = country_code + check_digits(country_code, bban) + bban
+        valid.append(iban)
+        invalid.extend([
+            iban[:-1],                                            # wrong length
+            iban[:2] + '%02d' % (int(iban[2:4]) % 97 + 1) + bban,  # wrong checksum
+            iban[:-1] + '!',                                      # invalid character
+        ])
+    invalid.append('JJ00ABCD12345678')                            # unknown country
+    return valid, invalid
+
+
+def generate_bics():
+    """ Returns a list of valid BICs and a list of invalid BICs. """
+    valid = []
+    for seed, country_code in enumerate(sorted(IBAN_COUNTRY_CODE_LENGTH)):
+        institution = ''.join(string.ascii_uppercase[(seed + i * 5) % 26] for i in range(4))
+        valid.append(institution + country_code + '2X')
+        valid.append(institution + country_code + '2XXXX')
+    invalid = ['DEUTDEF', 'D3UTDEFF', 'DEUTJJFF', 'DEUTDEFFXX']
+    return valid, invalid
+
+
+def calling(func):
+    """ Calls ``func`` for every value and ignores validation errors. """
+    def run(values):
+        for value in values:
+            try:
+                func(value)
+            except ValidationError:
+                pass
+    return run
+
+
+def get_benchmarks():
+    valid_ibans, invalid_ibans = generate_ibans()
+    valid_bics, invalid_bics = generate_bics()
+    spaced_ibans = [' '.join(iban[i:i + 4] for i in range(0, len(iban), 4)) for iban in valid_ibans]
+
+    validator = IBANValidator(use_nordea_extensions=True)
+    iban_field = IBANField(use_nordea_extensions=True)
+    iban_form_field = IBANFormField(use_nordea_extensions=True)
+    bic_field = SWIFTBICField()
+    bic_form_field = SWIFTBICFormField()
+
+    return [
+        ('iban_validator_valid', calling(validator), valid_ibans),
+        ('iban_validator_invalid', calling(validator), invalid_ibans),
+        ('iban_validator_check', calling(validator.check), valid_ibans + invalid_ibans),
+        ('iban_validator_precheck', calling(validator.precheck), valid_ibans + invalid_ibans),
+        ('iban_validate_many', lambda values: list(validator.validate_many(values)), valid_ibans + invalid_ibans),
+        ('iban_field_to_python', calling(iban_field.to_python), spaced_ibans),
+        ('iban_field_clean', calling(lambda value: iban_field.clean(value, None)), spaced_ibans + invalid_ibans),
+        ('iban_form_field_to_python', calling(iban_form_field.to_python), spaced_ibans),
+        ('iban_form_field_clean', calling(iban_form_field.clean), spaced_ibans + invalid_ibans),
+        ('iban_form_field_prepare_value', calling(iban_form_field.prepare_value), valid_ibans),
+        ('bic_validator_valid', calling(swift_bic_validator), valid_bics),
+        ('bic_validator_invalid', calling(swift_bic_validator), invalid_bics),
+        ('bic_field_clean', calling(lambda value: bic_field.clean(value, None)), valid_bics + invalid_bics),
+        ('bic_form_field_clean', calling(bic_form_field.clean), valid_bics + invalid_bics),
+        ('bic_form_field_prepare_value', calling(bic_form_field.prepare_value), valid_bics),
+    ]
+
+
+def measure_speed(func, values, min_time=0.2):
+    """ Returns the operations (calls per value) per second. """
+    number = 1
+    while True:
+        elapsed = min(timeit.repeat(lambda: func(values), number=number, repeat=3))
+        if elapsed >= min_time:
+            return number * len(values) / elapsed
+        number *= 2
+
+
+def measure_allocations(func, values):
+    """ Returns the average tracemalloc peak in bytes of a single call. """
+    total = 0
+    tracemalloc.start()
+    try:
+        for value in values:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func([value])
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return float(total) / len(values)
+
+
+def parse_import_time(output, package='django_iban'):
+    """ Returns the cumulative microseconds of the top level imports of ``package`` in ``-X importtime`` output. """
+    total = 0
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented, the modules imported by the -c code are not.
+        if not name.startswith(' ') or name[1:2] == ' ':
+            continue
+        if name.strip().split('.')[0] == package and cumulative_us.strip().isdigit():
+            total += int(cumulative_us)
+    return total
+
+
+def measure_import_time(modules=IMPORT_MODULES, repeat=5):
+    """ Returns the best import time of ``modules`` in a new process in microseconds. """
+    code = 'import django.db.models, django.forms; import ' + ', '.join(modules)
+    cache_dir = tempfile.mkdtemp()
+    # Bytecode is cached like it is in an installed package, in a separate directory. The first run writes the cache.
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=cache_dir)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    try:
+        times = []
+        for i in range(repeat + 1):
+            output = subprocess.check_output([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                                             stderr=subprocess.STDOUT)
+            times.append(parse_import_time(output.decode('utf-8')))
+        return min(times[1:])
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def run(name_filter=None):
+    results = {}
+    if not name_filter or name_filter in 'import_django_iban':
+        results['import_django_iban'] = {
+            'ops_per_sec': 1e6 / measure_import_time(),
+            'bytes_per_call': None,
+        }
+    for name, func, values in get_benchmarks():
+        if name_filter and name_filter not in name:
+            continue
+        func(values)  # warm up caches and lazy translations
+        results[name] = {
+            'ops_per_sec': measure_speed(func, values),
+            'bytes_per_call': measure_allocations(func, values),
+        }
+    return results
+
+
+def print_results(results, baseline=None, threshold=0.2):
+    """ Prints the results and returns the names of the benchmarks that regressed compared with the baseline. """
+    regressions = []
+    print('{0:<32} {1:>14} {2:>14} {3:>10}'.format('benchmark', 'ops/sec', 'bytes/call', 'vs base'))
+    for name, result in sorted(results.items()):
+        comparison = ''
+        if baseline and name in baseline:
+            ratio = result['ops_per_sec'] / baseline[name]['ops_per_sec']
+            comparison = '{0:.2f}x'.format(ratio)
+            if ratio < 1 - threshold:
+                comparison += ' !'
+                regressions.append(name)
+        bytes_per_call = result['bytes_per_call']
+        print('{0:<32} {1:>14,.0f} {2:>14} {3:>10}'.format(
+            name, result['ops_per_sec'], '-' if bytes_per_call is None else '{0:,.0f}'.format(bytes_per_call),
+            comparison))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='django-iban benchmark suite')
+    parser.add_argument('--save', nargs='?', const=BASELINE, metavar='FILE',
+                        help='Store the results as the baseline (default: %(const)s).')
+    parser.add_argument('--compare', nargs='?', const=BASELINE, metavar='FILE',
+                        help='Compare with a baseline (default: %(const)s).')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Slowdown that counts as a regression when comparing (default: %(default)s).')
+    parser.add_argument('--filter', help='Only run the benchmarks with this text in their name.')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    results = run(args.filter)
+    regressions = print_results(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if regressions:
+        print('Regressions: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
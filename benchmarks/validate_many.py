@@ -0,0 +1,58 @@
+"""
+Compares IBANValidator.validate_many with calling the validator in a loop and catching ValidationError.
+
+Usage: python benchmarks/validate_many.py [number of items]
+"""
+from __future__ import print_function
+
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django.core.exceptions import ValidationError  # noqa: E402
+from django.utils import translation  # noqa: E402
+
+from django_iban.validators import IBANValidator  # noqa: E402
+
+
+SAMPLES = [
+    'GB82WEST12345698765432',
+    'GB82 WEST 1234 5698 7654 32',
+    'GR1601101250000000012300695',
+    'CH9300762011623852957',
+    'GB82WEST1234569876543',     # invalid length
+    'CA34CIBC123425345',         # invalid country
+    'SA0380000000608019167519',  # invalid checksum
+]
+
+
+def validate_loop(values):
+    validator = IBANValidator()
+    results = []
+    for value in values:
+        try:
+            validator(value)
+        except ValidationError as e:
+            # Evaluating the message is what a caller that logs or stores the error pays for.
+            results.append((value, e.messages))
+        else:
+            results.append((value, None))
+    return results
+
+
+def validate_many(values):
+    return list(IBANValidator().validate_many(values))
+
+
+def main(count):
+    values = (SAMPLES * (count // len(SAMPLES) + 1))[:count]
+    translation.activate('en')
+    print('{0} items, {1:.0%} invalid'.format(count, 3.0 / len(SAMPLES)))
+    report('IBANValidator.__call__ in a loop', measure(validate_loop, values))
+    report('IBANValidator.validate_many', measure(validate_many, values))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
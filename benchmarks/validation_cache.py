@@ -0,0 +1,62 @@
+"""
+Compares IBANValidator and swift_bic_validator without a cache and with the validation cache backends, for values that
+are all in the cache.
+
+Usage: python benchmarks/validation_cache.py [number of items]
+"""
+from __future__ import print_function
+
+import os
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django.core.exceptions import ValidationError  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+
+from django_iban.cache import get_validation_cache  # noqa: E402
+from django_iban.validators import IBANValidator, swift_bic_validator  # noqa: E402
+from suite import generate_bics, generate_ibans  # noqa: E402
+
+
+BACKENDS = [
+    ('no cache', {}),
+    ('local', {'IBAN_VALIDATION_CACHE_SIZE': 10000}),
+    ('shared_memory', {'IBAN_VALIDATION_CACHE_BACKEND': 'shared_memory', 'IBAN_VALIDATION_CACHE_SIZE': 10000,
+                       'IBAN_VALIDATION_CACHE_NAME': 'django_iban_benchmark_%d' % os.getpid()}),
+    ('django (locmem)', {'IBAN_VALIDATION_CACHE_BACKEND': 'django',
+                         'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                'OPTIONS': {'MAX_ENTRIES': 10000}}}}),
+]
+
+
+def validate_all(validator, values):
+    for value in values:
+        try:
+            validator(value)
+        except ValidationError:
+            pass
+
+
+def main(count):
+    valid, invalid = generate_ibans()
+    ibans = ((valid + invalid) * (count // (len(valid) + len(invalid)) + 1))[:count]
+    valid_bics, invalid_bics = generate_bics()
+    bics = ((valid_bics + invalid_bics) * (count // (len(valid_bics) + len(invalid_bics)) + 1))[:count]
+    validator = IBANValidator(use_nordea_extensions=True)
+    print('{0} items, all cached after the first run'.format(count))
+    for name, backend_settings in BACKENDS:
+        with override_settings(**backend_settings):
+            cache = get_validation_cache()
+            report('IBANValidator, ' + name, measure(lambda values: validate_all(validator, values), ibans))
+            report('swift_bic_validator, ' + name, measure(lambda values: validate_all(swift_bic_validator, values),
+                                                           bics))
+            if hasattr(cache, 'unlink'):
+                cache.close()
+                cache.unlink()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
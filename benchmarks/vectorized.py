@@ -0,0 +1,41 @@
+"""
+Compares django_iban.vectorized.validate_array with IBANValidator.validate_many on a column of IBANs.
+
+Usage: python benchmarks/vectorized.py [number of items]
+"""
+from __future__ import print_function
+
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+import numpy as np  # noqa: E402
+
+from django_iban.validators import IBANValidator  # noqa: E402
+from django_iban.vectorized import validate_array  # noqa: E402
+
+from validate_many import SAMPLES  # noqa: E402
+
+
+def scalar(values):
+    return list(IBANValidator().validate_many(values))
+
+
+def vectorized(values):
+    return validate_array(values)
+
+
+def main(count):
+    values = np.array((SAMPLES * (count // len(SAMPLES) + 1))[:count], dtype=object)
+    valid, error_codes = validate_array(values)
+    assert list(error_codes) == [result[2] for result in scalar(values)]
+
+    print('{0} items'.format(count))
+    report('IBANValidator.validate_many', measure(scalar, values, repeat=3))
+    report('vectorized.validate_array', measure(vectorized, values, repeat=3))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
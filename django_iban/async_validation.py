@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Validation of IBANs and BICs from asyncio code.
+
+``avalidate`` validates a single value and ``avalidate_many`` streams the results for a (sync or async) iterable of
+values. Batches of ``executor_threshold`` values or more are validated in an executor (the default thread pool of the
+loop, or any ``concurrent.futures`` executor such as a ``ProcessPoolExecutor``), smaller batches in the event loop.
+
+Enrichment hooks are async callables that are called with the normalized value of every valid result, e.g. to look up
+the bank in a directory service. A hook returns a dict that is added to the extra data of the result, or None. It can
+reject the value by raising ``ValidationError``, the code of the error (or ``'invalid'``) becomes the error code of the
+result. At most ``concurrency`` hook calls run at the same time.
+
+Example:
+
+.. code-block:: python
+
+    async def bank_directory(iban):
+        return {'bank': await directory.lookup(IBAN(iban).bank_code)}
+
+    async for value, normalized, error_code, extra in avalidate_many(request_ibans, hooks=[bank_directory]):
+        ...
+"""
+from __future__ import unicode_literals
+
+import asyncio
+from functools import partial
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+
+from .validators import IBANValidator, normalize_iban
+
+
+def _error_code(error):
+    return getattr(error, 'code', None) or 'invalid'
+
+
+def validate_batch(validator, values):
+    """
+    Returns a list of ``(value, normalized, error_code)`` tuples for ``values``.
+
+    Uses ``validator.validate_many`` if the validator has it. Other validators, e.g. ``swift_bic_validator``, are called
+    for every value; the value is returned as the normalized value and the code of the ValidationError, or
+    ``'invalid'``, as error code. None values are returned as ``(None, None, None)`` without calling the validator.
+    """
+    validate_many = getattr(validator, 'validate_many', None)
+    if validate_many is not None:
+        return list(validate_many(values))
+    results = []
+    for value in values:
+        if value is None:
+            results.append((None, None, None))
+            continue
+        try:
+            validator(value)
+        except ValidationError as e:
+            results.append((value, None, _error_code(e)))
+        else:
+            results.append((value, value, None))
+    return results
+
+
+async def _run_hooks(hooks, semaphore, normalized):
+    """ Returns the error code and the extra data of the hooks for one valid value. """
+    extra = {}
+    for hook in hooks:
+        async with semaphore:
+            try:
+                data = await hook(normalized)
+            except ValidationError as e:
+                # The data of earlier hooks is dropped, invalid values have no extra data.
+                return _error_code(e), {}
+        if data:
+            extra.update(data)
+    return None, extra
+
+
+async def _batches(values, batch_size):
+    if hasattr(values, '__aiter__'):
+        batch = []
+        async for value in values:
+            batch.append(value)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    else:
+        iterator = iter(values)
+        for batch in iter(lambda: list(islice(iterator, batch_size)), []):
+            yield batch
+
+
+async def avalidate_many(values, validator=None, hooks=(), batch_size=1000, executor_threshold=1000, executor=None,
+                         concurrency=10):
+    """
+    Yields a ``(value, normalized, error_code, extra)`` tuple for every value, in input order.
+
+    ``validator`` defaults to ``IBANValidator()``. To validate in a process pool, the validator must be picklable,
+    which ``IBANValidator`` and ``swift_bic_validator`` are. ``extra`` is the dict of data returned by the hooks, empty
+    for invalid values.
+    """
+    if validator is None:
+        validator = IBANValidator()
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async for batch in _batches(values, batch_size):
+        if len(batch) >= executor_threshold:
+            results = await loop.run_in_executor(executor, partial(validate_batch, validator, batch))
+        else:
+            results = validate_batch(validator, batch)
+            # Let the other tasks of the loop run between batches.
+            await asyncio.sleep(0)
+
+        if hooks:
+            hook_results = await asyncio.gather(*[
+                _run_hooks(hooks, semaphore, normalized) for value, normalized, error_code in results
+                if error_code is None and value is not None])
+            hook_results.reverse()
+            for value, normalized, error_code in results:
+                extra = {}
+                if error_code is None and value is not None:
+                    error_code, extra = hook_results.pop()
+                yield value, normalized, error_code, extra
+        else:
+            for value, normalized, error_code in results:
+                yield value, normalized, error_code, {}
+
+
+async def avalidate(value, validator=None, hooks=()):
+    """
+    Validates one value like the validator does, raising ``ValidationError`` with its message if it is invalid, and
+    runs the hooks. Returns the extra data of the hooks.
+    """
+    if value is None:
+        return {}
+    if validator is None:
+        validator = IBANValidator()
+    validator(value)
+    extra = {}
+    normalized = normalize_iban(value) if isinstance(validator, IBANValidator) else value
+    for hook in hooks:
+        data = await hook(normalized)
+        if data:
+            extra.update(data)
+    return extra
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+The structure of the Basic Bank Account Number (BBAN), the part of an IBAN after the country code and check digits.
+"""
+from __future__ import unicode_literals
+
+import re
+
+# Dictionary of ISO country code to BBAN character classes and BBAN layout.
+#
+# The character classes use the notation of the SWIFT IBAN registry: n = digits 0-9, a = upper case letters A-Z and
+# c = both. The layout has one letter per BBAN position: b = bank code, s = branch code, c = account number,
+# x = national check digits, t = account type, m = currency, i = account holder identification, 0 = reserved.
+#
+# References:
+# https://www.swift.com/standards/data-standards/iban
+# https://en.wikipedia.org/wiki/International_Bank_Account_Number#IBAN_formats_by_country
+
+IBAN_BBAN_FORMATS = {'AL': ('8n,16c', 'bbbssssxcccccccccccccccc'),             # Albania
+                     'AD': ('8n,12c', 'bbbbsssscccccccccccc'),                 # Andorra
+                     'AE': ('3n,16n', 'bbbcccccccccccccccc'),                  # United Arab Emirates
+                     'AT': ('16n', 'bbbbbccccccccccc'),                        # Austria
+                     'AZ': ('4a,20c', 'bbbbcccccccccccccccccccc'),             # Azerbaijan
+                     'BA': ('16n', 'bbbsssccccccccxx'),                        # Bosnia and Herzegovina
+                     'BE': ('12n', 'bbbcccccccxx'),                            # Belgium
+                     'BG': ('4a,6n,8c', 'bbbbssssttcccccccc'),                 # Bulgaria
+                     'BH': ('4a,14c', 'bbbbcccccccccccccc'),                   # Bahrain
+                     'BR': ('23n,1a,1c', 'bbbbbbbbsssssccccccccccti'),         # Brazil
+                     'CH': ('5n,12c', 'bbbbbcccccccccccc'),                    # Switzerland
+                     'CR': ('17n', 'bbbcccccccccccccc'),                       # Costa Rica
+                     'CY': ('8n,16c', 'bbbssssscccccccccccccccc'),             # Cyprus
+                     'CZ': ('20n', 'bbbbcccccccccccccccc'),                    # Czech Republic
+                     'DE': ('18n', 'bbbbbbbbcccccccccc'),                      # Germany
+                     'DK': ('14n', 'bbbbcccccccccc'),                          # Denmark
+                     'DO': ('4c,20n', 'bbbbcccccccccccccccccccc'),             # Dominican Republic
+                     'EE': ('16n', 'bbsscccccccccccx'),                        # Estonia
+                     'ES': ('20n', 'bbbbssssxxcccccccccc'),                    # Spain
+                     'FI': ('14n', 'bbbccccccccccx'),                          # Finland
+                     'FO': ('14n', 'bbbbcccccccccx'),                          # Faroe Islands
+                     'FR': ('10n,11c,2n', 'bbbbbssssscccccccccccxx'),          # France
+                     'GB': ('4a,14n', 'bbbbsssssscccccccc'),                   # United Kingdom
+                     'GE': ('2a,16n', 'bbcccccccccccccccc'),                   # Georgia
+                     'GI': ('4a,15c', 'bbbbccccccccccccccc'),                  # Gibraltar
+                     'GL': ('14n', 'bbbbcccccccccc'),                          # Greenland
+                     'GR': ('7n,16c', 'bbbsssscccccccccccccccc'),              # Greece
+                     'GT': ('24c', 'bbbbmmttcccccccccccccccc'),                # Guatemala
+                     'HR': ('17n', 'bbbbbbbcccccccccc'),                       # Croatia
+                     'HU': ('24n', 'bbbssssxcccccccccccccccx'),                # Hungary
+                     'IE': ('4c,14n', 'bbbbsssssscccccccc'),                   # Ireland
+                     'IL': ('19n', 'bbbsssccccccccccccc'),                     # Israel
+                     'IS': ('22n', 'bbssttcccccciiiiiiiiii'),                  # Iceland
+                     'IT': ('1a,10n,12c', 'xbbbbbssssscccccccccccc'),          # Italy
+                     'JO': ('4a,4n,18c', 'bbbbsssscccccccccccccccccc'),        # Jordan
+                     'KZ': ('3n,13c', 'bbbccccccccccccc'),                     # Kazakhstan
+                     'KW': ('4a,22c', 'bbbbcccccccccccccccccccccc'),           # Kuwait
+                     'LB': ('4n,20c', 'bbbbcccccccccccccccccccc'),             # Lebanon
+                     'LI': ('5n,12c', 'bbbbbcccccccccccc'),                    # Liechtenstein
+                     'LT': ('16n', 'bbbbbccccccccccc'),                        # Lithuania
+                     'LU': ('3n,13c', 'bbbccccccccccccc'),                     # Luxembourg
+                     'LV': ('4a,13c', 'bbbbccccccccccccc'),                    # Latvia
+                     'MC': ('10n,11c,2n', 'bbbbbssssscccccccccccxx'),          # Monaco
+                     'MD': ('2c,18c', 'bbcccccccccccccccccc'),                 # Moldova
+                     'ME': ('18n', 'bbbcccccccccccccxx'),                      # Montenegro
+                     'MK': ('3n,10c,2n', 'bbbccccccccccxx'),                   # Macedonia
+                     'MT': ('4a,5n,18c', 'bbbbssssscccccccccccccccccc'),       # Malta
+                     'MR': ('23n', 'bbbbbssssscccccccccccxx'),                 # Mauritania
+                     'MU': ('4a,19n,3a', 'bbbbbbsscccccccccccc000mmm'),        # Mauritius
+                     'NL': ('4a,10n', 'bbbbcccccccccc'),                       # Netherlands
+                     'NO': ('11n', 'bbbbccccccx'),                             # Norway
+                     'PS': ('4a,21c', 'bbbbccccccccccccccccccccc'),            # Palestine
+                     'PK': ('4a,16c', 'bbbbcccccccccccccccc'),                 # Pakistan
+                     'PL': ('24n', 'bbbssssxcccccccccccccccc'),                # Poland
+                     'PT': ('21n', 'bbbbsssscccccccccccxx'),                   # Portugal
+                     'QA': ('4a,21c', 'bbbbccccccccccccccccccccc'),            # Qatar
+                     'RO': ('4a,16c', 'bbbbcccccccccccccccc'),                 # Romania
+                     'RS': ('18n', 'bbbcccccccccccccxx'),                      # Serbia
+                     'SA': ('2n,18c', 'bbcccccccccccccccccc'),                 # Saudi Arabia
+                     'SE': ('20n', 'bbbccccccccccccccccc'),                    # Sweden
+                     'SI': ('15n', 'bbsssccccccccxx'),                         # Slovenia
+                     'SK': ('20n', 'bbbbcccccccccccccccc'),                    # Slovakia
+                     'SM': ('1a,10n,12c', 'xbbbbbssssscccccccccccc'),          # San Marino
+                     'TN': ('20n', 'bbssscccccccccccccxx'),                    # Tunisia
+                     'TR': ('5n,17c', 'bbbbb0cccccccccccccccc'),               # Turkey
+                     'VG': ('4a,16n', 'bbbbcccccccccccccccc')}                 # British Virgin Islands
+
+
+# BBAN structures of the IBANs catalogued by Nordea, see NORDEA_COUNTRY_CODE_LENGTH.
+
+NORDEA_BBAN_FORMATS = {'AO': ('21n', 'bbbbsssscccccccccccxx'),                   # Angola
+                       'BJ': ('2c,22n', 'bbbbbsssssccccccccccccxx'),             # Benin
+                       'BF': ('2c,21n', 'bbbbbssssscccccccccccxx'),              # Burkina Faso
+                       'BI': ('12n', 'bbbbbccccccc'),                            # Burundi
+                       'CI': ('2c,22n', 'bbbbbsssssccccccccccccxx'),             # Ivory Coast
+                       'CG': ('23n', 'bbbbbssssscccccccccccxx'),                 # Congo
+                       'CM': ('23n', 'bbbbbssssscccccccccccxx'),                 # Cameroon
+                       'CV': ('21n', 'bbbbsssscccccccccccxx'),                   # Cape Verde
+                       'DZ': ('20n', 'bbbccccccccccccccccc'),                    # Algeria
+                       'EG': ('23n', 'bbbbssssccccccccccccccc'),                 # Egypt
+                       'GA': ('23n', 'bbbbbssssscccccccccccxx'),                 # Gabon
+                       'IR': ('22n', 'bbbccccccccccccccccccc'),                  # Iran
+                       'MG': ('23n', 'bbbbbssssscccccccccccxx'),                 # Madagascar
+                       'ML': ('2c,22n', 'bbbbbsssssccccccccccccxx'),             # Mali
+                       'MZ': ('21n', 'bbbbsssscccccccccccxx'),                   # Mozambique
+                       'UA': ('6n,19c', 'bbbbbbccccccccccccccccccc'),            # Ukraine
+                       'SN': ('2c,22n', 'bbbbbsssssccccccccccccxx')}             # Senegal
+
+
+# Regular expressions of the character classes.
+CHARACTER_CLASS_PATTERNS = {'n': '[0-9]', 'a': '[A-Z]', 'c': '[0-9A-Z]'}
+
+
+def parse_format(format):
+    """ Returns the ``(length, character class)`` pairs of a BBAN format like ``'4a,10n'``. """
+    return tuple((int(part[:-1]), part[-1]) for part in format.split(','))
+
+
+def format_pattern(format):
+    """ Returns the regular expression of a BBAN format like ``'4a,10n'``. """
+    return ''.join('%s{%d}' % (CHARACTER_CLASS_PATTERNS[character_class], count)
+                   for count, character_class in parse_format(format))
+
+
+class BBANStructure(object):
+    """
+    The BBAN structure of one country.
+
+    ``character_classes`` is a tuple of ``(length, character class)`` pairs and ``pattern`` is the regular expression
+    of the BBAN with these character classes. ``bank_code``, ``branch_code`` and ``account_number`` are slices of the
+    BBAN, or None if the country doesn't have that component.
+    """
+    __slots__ = ('country_code', 'format', 'layout', 'length', 'character_classes', 'pattern', 'bank_code',
+                 'branch_code', 'account_number', '_segments')
+
+    def __init__(self, country_code, format, layout):
+        self.country_code = country_code
+        self.format = format
+        self.layout = layout
+        self.length = len(layout)
+        self.character_classes = parse_format(format)
+        self.pattern = format_pattern(format)
+        self.bank_code = self._component_slice('b')
+        self.branch_code = self._component_slice('s')
+        self.account_number = self._component_slice('c')
+
+        segments = []
+        start = 0
+        for count, character_class in self.character_classes:
+            if character_class != 'c':
+                segments.append((start, start + count, character_class == 'n'))
+            start += count
+        self._segments = tuple(segments)
+
+    def _component_slice(self, letter):
+        start = self.layout.find(letter)
+        if start == -1:
+            return None
+        return slice(start, self.layout.rfind(letter) + 1)
+
+    def matches(self, bban):
+        """
+        Checks the character classes of ``bban``, which must be an ASCII alphanumeric BBAN of the right length.
+        """
+        for start, stop, digits in self._segments:
+            if digits:
+                if not bban[start:stop].isdigit():
+                    return False
+            elif not bban[start:stop].isalpha():
+                return False
+        return True
+
+    def __repr__(self):
+        return '<BBANStructure: %s %s>' % (self.country_code, self.format)
+
+
+_bban_structures = None
+
+
+def get_bban_structures():
+    """
+    Returns the dictionary of ISO country code to BBANStructure for all official and Nordea IBAN countries.
+
+    The structures are built on first use, which keeps importing this module cheap.
+    """
+    global _bban_structures
+    if _bban_structures is None:
+        _bban_structures = dict((country_code, BBANStructure(country_code, format, layout))
+                                for formats in (IBAN_BBAN_FORMATS, NORDEA_BBAN_FORMATS)
+                                for country_code, (format, layout) in formats.items())
+    return _bban_structures
+
+
+def get_bban_structure(country_code):
+    """ Returns the BBANStructure for the country, or None if the country doesn't use IBANs. """
+    return (_bban_structures or get_bban_structures()).get(country_code)
+
+
+_iban_format = None
+
+
+def get_iban_format():
+    """
+    Returns the compiled regular expression of the electronic format of the IBANs of all countries.
+
+    It is a single expression with one alternative per country: the country code, two check digits and the BBAN with
+    the character classes of the country. ``fullmatch`` checks the country code, the length and every character of a
+    normalized IBAN in one pass. The alternatives are grouped by the first letter of the country code, so the regular
+    expression engine only tries the countries with that letter.
+
+    The expression is compiled on first use and shared by all validators.
+    """
+    global _iban_format
+    if _iban_format is None:
+        _iban_format = compile_iban_format(dict((country_code, structure.format)
+                                                for country_code, structure in get_bban_structures().items()))
+    return _iban_format
+
+
+def compile_iban_format(formats):
+    """ Compiles the IBAN format of ``get_iban_format`` for a dictionary of country code to BBAN format. """
+    alternatives = {}
+    for country_code, format in sorted(formats.items()):
+        alternatives.setdefault(country_code[0], []).append('%s[0-9]{2}%s' % (country_code[1], format_pattern(format)))
+    return re.compile('|'.join('%s(?:%s)' % (letter, '|'.join(patterns))
+                               for letter, patterns in sorted(alternatives.items())))
+
+
+def __getattr__(name):
+    # BBAN_STRUCTURES is the result of get_bban_structures(), built when it is first accessed.
+    if name == 'BBAN_STRUCTURES':
+        return get_bban_structures()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
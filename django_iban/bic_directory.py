@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+A local BIC directory for checking that BICs exist and for finding the BIC of an IBAN.
+
+A bank directory CSV file, with a header row and at least a BIC column and optionally country code and bank code
+columns, is converted once into a binary index file. The index holds two sorted tables of fixed width records, one
+of BICs and one of (country code, bank code, BIC), and is memory-mapped by ``BICDirectory``, so lookups are binary
+searches over the mapped file and the directory is shared by all processes that use the same index file.
+
+.. code-block:: python
+
+    build_bic_index('banks.csv', 'banks.idx')
+    directory = BICDirectory('banks.idx')
+    directory.exists('DEUTDEFF')
+    directory.bic_for_iban('DE89370400440532013000')
+
+Set ``IBAN_BIC_DIRECTORY`` to the path of an index file to use it in ``bic_exists_validator`` and in
+``SWIFTBICField(require_existence=True)``.
+
+BICs are stored with 11 characters, an 8 character BIC is the same as the BIC with the ``XXX`` branch code.
+"""
+from __future__ import unicode_literals
+
+import csv
+import io
+import mmap
+import struct
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.utils.translation import ugettext_lazy as _
+
+from .bban import get_bban_structures
+from .iban import IBAN
+from .validators import swift_bic_validator
+
+try:
+    # Importing django.test.signals imports the whole test framework, which is slow.
+    from django.core.signals import setting_changed
+except ImportError:
+    try:
+        from django.test.signals import setting_changed
+    except ImportError:
+        setting_changed = None
+
+
+# Error code of the ValidationError raised by bic_exists_validator.
+BIC_NOT_IN_DIRECTORY = 'not_in_directory'
+
+_MAGIC = b'DJIBANBIC1'
+# Magic, number of BIC records, number of bank code records and the width of the bank codes.
+_HEADER = struct.Struct('<10sIIH')
+
+_BIC_WIDTH = 11
+
+
+def _bank_code_width():
+    """ The longest bank code of all countries. Bank codes are padded with spaces to this width in the index. """
+    return max(structure.bank_code.stop - structure.bank_code.start
+               for structure in get_bban_structures().values() if structure.bank_code is not None)
+
+
+def normalize_bic(value):
+    """ Returns the 11 character upper case form of a BIC. """
+    value = value.strip().upper()
+    if len(value) == 8:
+        value += 'XXX'
+    return value
+
+
+def _is_ascii_alphanumeric(value):
+    return value.isascii() and value.isalnum()
+
+
+def build_bic_index(csv_path, index_path, bic_column='bic', country_column='country_code',
+                    bank_code_column='bank_code', encoding='utf-8'):
+    """
+    Builds the index file of a bank directory CSV file. Returns the number of BICs in the index.
+
+    The column arguments are the names of the columns in the header row. Rows without a country code or bank code (or
+    files without those columns) only add the BIC. When a bank code has several BICs, the lowest BIC is used for it.
+    Rows with a BIC that isn't 8 or 11 ASCII letters and digits are skipped, as are country codes and bank codes that
+    aren't ASCII letters and digits.
+    """
+    bank_code_width = _bank_code_width()
+    bics = set()
+    bank_codes = set()
+    with io.open(csv_path, newline='', encoding=encoding) as f:
+        reader = csv.DictReader(f)
+        if bic_column not in (reader.fieldnames or []):
+            raise ValueError('Column %s is not in the header of %s.' % (bic_column, csv_path))
+        for row in reader:
+            bic = normalize_bic(row[bic_column] or '')
+            if len(bic) != _BIC_WIDTH or not _is_ascii_alphanumeric(bic):
+                # The index is ASCII, a row with other characters is skipped instead of stopping the build.
+                continue
+            bics.add(bic)
+            country_code = (row.get(country_column) or '').strip().upper()
+            bank_code = (row.get(bank_code_column) or '').strip().upper()
+            if (len(country_code) == 2 and bank_code and len(bank_code) <= bank_code_width and
+                    _is_ascii_alphanumeric(country_code + bank_code)):
+                bank_codes.add((country_code + bank_code.ljust(bank_code_width), bic))
+
+    with open(index_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(bics), len(bank_codes), bank_code_width))
+        f.write(''.join(sorted(bics)).encode('ascii'))
+        f.write(''.join(key + bic for key, bic in sorted(bank_codes)).encode('ascii'))
+    return len(bics)
+
+
+class _Records(object):
+    """ A sequence view of the fixed width ``key_width`` keys of a table in the index, for bisect. """
+
+    def __init__(self, data, offset, count, width, key_width):
+        self.data = data
+        self.offset = offset
+        self.count = count
+        self.width = width
+        self.key_width = key_width
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        start = self.offset + index * self.width
+        return self.data[start:start + self.key_width]
+
+    def record(self, index):
+        start = self.offset + index * self.width
+        return self.data[start:start + self.width]
+
+    def find(self, key):
+        """ Returns the first record with ``key``, or None. """
+        index = bisect_left(self, key)
+        if index < self.count and self[index] == key:
+            return self.record(index)
+        return None
+
+
+class BICDirectory(object):
+    """ A memory-mapped BIC index file built by ``build_bic_index``. """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, bic_count, bank_code_count, bank_code_width = _HEADER.unpack_from(self._data)
+        if magic != _MAGIC:
+            raise ValueError('%s is not a BIC index file.' % index_path)
+        self._bank_code_width = bank_code_width
+        self._bics = _Records(self._data, _HEADER.size, bic_count, _BIC_WIDTH, _BIC_WIDTH)
+        self._bank_codes = _Records(self._data, _HEADER.size + bic_count * _BIC_WIDTH, bank_code_count,
+                                    2 + bank_code_width + _BIC_WIDTH, 2 + bank_code_width)
+
+    def __len__(self):
+        return len(self._bics)
+
+    def close(self):
+        self._data.close()
+
+    def exists(self, bic):
+        """ Checks if the BIC (8 or 11 characters, any case) is in the directory. """
+        bic = normalize_bic(bic)
+        if len(bic) != _BIC_WIDTH:
+            return False
+        try:
+            key = bic.encode('ascii')
+        except UnicodeError:
+            return False
+        return self._bics.find(key) is not None
+
+    def bic_for_bank_code(self, country_code, bank_code):
+        """ Returns the 11 character BIC of a bank code in a country, or None. """
+        if len(bank_code) > self._bank_code_width:
+            return None
+        try:
+            key = (country_code.upper() + bank_code.upper().ljust(self._bank_code_width)).encode('ascii')
+        except UnicodeError:
+            return None
+        record = self._bank_codes.find(key)
+        if record is None:
+            return None
+        return record[-_BIC_WIDTH:].decode('ascii')
+
+    def bic_for_iban(self, iban):
+        """ Returns the BIC of the bank of an IBAN (a string or an IBAN object), or None. """
+        if not isinstance(iban, IBAN):
+            iban = IBAN(iban)
+        bank_code = iban.bank_code
+        if bank_code is None:
+            return None
+        return self.bic_for_bank_code(iban.country_code, bank_code)
+
+
+_bic_directory = None
+_configured = False
+
+
+def get_bic_directory():
+    """ Returns the BICDirectory of the ``IBAN_BIC_DIRECTORY`` setting, or None if it is not set. """
+    global _bic_directory, _configured
+    if not _configured:
+        index_path = getattr(settings, 'IBAN_BIC_DIRECTORY', None)
+        _bic_directory = BICDirectory(index_path) if index_path else None
+        _configured = True
+    return _bic_directory
+
+
+def _reset_bic_directory(**kwargs):
+    global _configured
+    if kwargs['setting'] == 'IBAN_BIC_DIRECTORY':
+        _configured = False
+
+
+if setting_changed is not None:
+    setting_changed.connect(_reset_bic_directory)
+
+
+def bic_exists_validator(value):
+    """ Validates the BIC like ``swift_bic_validator`` and checks that it is in the directory of the settings. """
+    directory = get_bic_directory()
+    if directory is None:
+        raise ImproperlyConfigured('Set IBAN_BIC_DIRECTORY to check that BICs exist.')
+    swift_bic_validator(value)
+    if not directory.exists(value):
+        raise ValidationError(_('%(bic)s is not in the SWIFT-BIC directory.'), code=BIC_NOT_IN_DIRECTORY,
+                              params={'bic': value})
@@ -0,0 +1,419 @@
+"""
+Opt-in cache of IBAN and BIC validation results.
+
+The cache is enabled by setting ``IBAN_VALIDATION_CACHE_SIZE`` to the maximum number of cached results. Entries expire
+after ``IBAN_VALIDATION_CACHE_TTL`` seconds if that setting is given. Both valid and invalid results are cached, keyed
+on the normalized IBAN and the validator configuration, or on the BIC.
+
+``IBAN_VALIDATION_CACHE_BACKEND`` selects where the results are stored:
+
+* ``'local'`` (the default): an LRU cache in the memory of each process.
+* ``'shared_memory'``: a fixed-size table in the shared memory segment ``IBAN_VALIDATION_CACHE_NAME`` (default
+  ``'django_iban_validation'``), shared by all processes on the host, e.g. the workers of gunicorn. The first process
+  creates the segment and later ones attach to it. It stays in place when the processes exit, remove it with
+  ``SharedMemoryValidationCache.unlink`` when the cache size changes.
+* ``'django'``: the Django cache ``IBAN_VALIDATION_CACHE_ALIAS`` (default ``'default'``), e.g. memcached or Redis
+  shared by several hosts. ``IBAN_VALIDATION_CACHE_SIZE`` is not needed, the cache server evicts the entries.
+
+The shared backends store compact entries: the key as an ASCII string of at most 53 characters and the error code and
+parameter of the result packed into 10 bytes. Values that are not ASCII alphanumeric or longer than 36 characters are
+not stored, they are invalid and fail early in the validators anyway.
+"""
+from __future__ import unicode_literals
+
+import functools
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    # Importing django.test.signals imports the whole test framework, which is slow.
+    from django.core.signals import setting_changed
+except ImportError:
+    try:
+        from django.test.signals import setting_changed
+    except ImportError:
+        setting_changed = None
+
+_now = getattr(time, 'monotonic', time.time)
+# The shared backends need a clock that is the same in all processes.
+_wall_clock = time.time
+
+BACKEND_LOCAL = 'local'
+BACKEND_SHARED_MEMORY = 'shared_memory'
+BACKEND_DJANGO = 'django'
+
+# The first item of the keys of BIC results, followed by a digest of the country codes (see swift_bic_validator). The
+# keys of IBAN results start with the IBANCountryRules.
+BIC_NAMESPACE = 'bic'
+
+
+class ValidationCache(object):
+    """ A thread safe LRU cache with an optional time to live and hit/miss counters. """
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """ Returns the cached result for ``key`` or None. """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires is None or expires > _now():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, result):
+        expires = _now() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """ Returns the counters of the cache, e.g. for a metrics exporter. """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+
+def compact_key(key):
+    """
+    Returns a ``(IBANCountryRules or BIC namespace, value)`` cache key as an ASCII string that is the same in all
+    processes, or None if the value isn't stored in the shared caches.
+    """
+    namespace, value = key
+    if len(value) > 36 or not (value.isalnum() and value.isascii()):
+        return None
+    return getattr(namespace, 'cache_key', namespace) + ':' + value
+
+
+_RESULT = struct.Struct('<BB8s')
+_error_codes = None
+
+
+def _get_error_codes():
+    # The index of an error code in the tuple is stored in the shared caches, only append to it. BIC_INVALID_LENGTH is
+    # the same code as IBAN_INVALID_LENGTH.
+    global _error_codes
+    if _error_codes is None:
+        from .validators import (BIC_INVALID_COUNTRY_CODE, BIC_INVALID_INSTITUTION_CODE, IBAN_COUNTRY_NOT_ALLOWED,
+                                 IBAN_INVALID_CHARACTER, IBAN_INVALID_CHECKSUM, IBAN_INVALID_COUNTRY,
+                                 IBAN_INVALID_FORMAT, IBAN_INVALID_LENGTH)
+        codes = (None, IBAN_INVALID_COUNTRY, IBAN_INVALID_LENGTH, IBAN_COUNTRY_NOT_ALLOWED, IBAN_INVALID_CHARACTER,
+                 IBAN_INVALID_CHECKSUM, IBAN_INVALID_FORMAT, BIC_INVALID_INSTITUTION_CODE, BIC_INVALID_COUNTRY_CODE)
+        _error_codes = (codes, dict((code, index) for index, code in enumerate(codes)), IBAN_INVALID_LENGTH)
+    return _error_codes
+
+
+def pack_result(result):
+    """
+    Packs the error code and parameter of a ``(normalized, error_code, error_param)`` result into 10 bytes. Returns
+    None if the parameter doesn't fit, such results are not stored in the shared caches.
+    """
+    normalized, error_code, error_param = result
+    index = _get_error_codes()[1][error_code]
+    param = b'' if error_param is None else str(error_param).encode('utf-8')
+    if len(param) > 8:
+        return None
+    return _RESULT.pack(index, len(param), param)
+
+
+def unpack_result(value, packed):
+    """ Returns the ``(value, error_code, error_param)`` result of a packed result. """
+    index, length, param = _RESULT.unpack(packed)
+    codes, indexes, invalid_length = _get_error_codes()
+    error_code = codes[index]
+    if not length:
+        return value, error_code, None
+    param = param[:length].decode('utf-8')
+    # The parameter of IBAN_INVALID_LENGTH is the expected length, the others are strings.
+    return value, error_code, int(param) if error_code == invalid_length else param
+
+
+def _open_shared_memory(name, create=False, size=0):
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name, create=create, size=size, track=False)
+    except TypeError:
+        # Before Python 3.13, the resource tracker unlinks the segment when the process that opened it exits, but the
+        # segment has to outlive the worker processes.
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name, create=create, size=size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        shm.unlink = functools.partial(_unlink_untracked, shm, shm.unlink)
+        return shm
+
+
+def _unlink_untracked(shm, unlink):
+    # SharedMemory.unlink unregisters the segment from the resource tracker, which expects it to be registered.
+    from multiprocessing import resource_tracker
+
+    resource_tracker.register(shm._name, 'shared_memory')
+    unlink()
+
+
+class SharedMemoryValidationCache(object):
+    """
+    A validation cache in a shared memory segment, used by all processes that open it with the same name.
+
+    The segment holds a set associative table with 4 entries per set of 80 bytes each. A new result replaces an empty
+    or expired entry of its set, otherwise the least recently used one. Entries are written without locks, every
+    entry has a CRC of its content and entries that are being written by another process are seen as missing.
+    The hit, miss and eviction counters are those of the current process.
+    """
+    MAGIC = b'DJIBANVC'
+    VERSION = 1
+    WAYS = 4
+    _HEADER = struct.Struct('<8sII')
+    # CRC, key, packed result, expiry time (0 for none) and last use, as seconds since the epoch.
+    _ENTRY = struct.Struct('<I53s10sII5x')
+    _USED = struct.Struct('<I')
+    _USED_OFFSET = 71
+
+    def __init__(self, name, maxsize, ttl=None):
+        self.name = name
+        self.ttl = ttl
+        sets = max(1, -(-maxsize // self.WAYS))
+        try:
+            self._shm = _open_shared_memory(name, create=True,
+                                            size=self._HEADER.size + sets * self.WAYS * self._ENTRY.size)
+            self._HEADER.pack_into(self._shm.buf, 0, self.MAGIC, self.VERSION, sets)
+        except FileExistsError:
+            self._shm = _open_shared_memory(name)
+            sets = self._read_header()
+        self.sets = sets
+        self.maxsize = sets * self.WAYS
+        self._buf = self._shm.buf
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _read_header(self):
+        for attempt in range(100):
+            magic, version, sets = self._HEADER.unpack_from(self._shm.buf, 0)
+            if magic != bytes(len(self.MAGIC)):
+                break
+            # The process that created the segment hasn't written the header yet.
+            time.sleep(0.01)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ImproperlyConfigured('The shared memory segment %s is not a validation cache of this version of '
+                                       'django-iban.' % self.name)
+        return sets
+
+    def _set_offset(self, entry_key):
+        return self._HEADER.size + zlib.crc32(entry_key) % self.sets * self.WAYS * self._ENTRY.size
+
+    @staticmethod
+    def _entry_key(key):
+        key = compact_key(key)
+        return None if key is None else key.encode('ascii').ljust(53, b'\0')
+
+    def _read(self, offset):
+        """ Returns the entry at ``offset``, or None if it is empty or being written. """
+        entry = self._ENTRY.unpack_from(self._buf, offset)
+        if entry[0] != zlib.crc32(self._buf[offset + 4:offset + self._USED_OFFSET]):
+            return None
+        return entry
+
+    def get(self, key):
+        """ Returns the cached result for ``key`` or None. """
+        entry_key = self._entry_key(key)
+        if entry_key is not None:
+            start = self._set_offset(entry_key)
+            # Search the key in a copy of the set, only a key at the start of an entry counts. The CRC is checked on
+            # the same copy, so an entry that another process writes at the same time is seen as missing.
+            data = bytes(self._buf[start:start + self.WAYS * self._ENTRY.size])
+            position = data.find(entry_key)
+            if position % self._ENTRY.size == 4:
+                crc, entry_key, packed, expires, used = self._ENTRY.unpack_from(data, position - 4)
+                now = int(_wall_clock())
+                valid = crc == zlib.crc32(data[position:position + self._USED_OFFSET - 4])
+                if valid and not (expires and expires <= now):
+                    if used != now:
+                        self._USED.pack_into(self._buf, start + position - 4 + self._USED_OFFSET, now)
+                    self.hits += 1
+                    return unpack_result(key[1], packed)
+        self.misses += 1
+        return None
+
+    def set(self, key, result):
+        packed = pack_result(result)
+        entry_key = self._entry_key(key)
+        if packed is None or entry_key is None:
+            return
+        now = int(_wall_clock())
+        expires = int(now + self.ttl) if self.ttl is not None else 0
+
+        start = self._set_offset(entry_key)
+        target = None
+        oldest = None
+        for offset in range(start, start + self.WAYS * self._ENTRY.size, self._ENTRY.size):
+            entry = self._read(offset)
+            if entry is None or entry[1] == entry_key or (entry[3] and entry[3] <= now):
+                target = offset
+                break
+            if oldest is None or entry[4] < oldest[1]:
+                oldest = (offset, entry[4])
+        if target is None:
+            target = oldest[0]
+            self.evictions += 1
+
+        content = self._ENTRY.pack(0, entry_key, packed, expires, now)
+        self._ENTRY.pack_into(self._buf, target, zlib.crc32(content[4:self._USED_OFFSET]), entry_key, packed, expires,
+                              now)
+
+    def clear(self):
+        """ Removes all entries, for all processes. """
+        self._buf[self._HEADER.size:] = bytes(len(self._buf) - self._HEADER.size)
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """ Returns the counters of the cache, ``size`` is the number of entries of all processes. """
+        now = int(_wall_clock())
+        size = 0
+        for offset in range(self._HEADER.size, len(self._buf), self._ENTRY.size):
+            entry = self._read(offset)
+            if entry is not None and not (entry[3] and entry[3] <= now):
+                size += 1
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': size,
+            'maxsize': self.maxsize,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """ Closes the segment in this process. """
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+        """ Removes the segment, processes that have it open keep using it until they close it. """
+        self._shm.unlink()
+
+
+class DjangoValidationCache(object):
+    """
+    A validation cache in a cache of the Django cache framework.
+
+    Entries expire after ``ttl`` seconds, or after the default timeout of the cache if ``ttl`` is None. The counters are
+    those of the current process, the size and evictions are up to the cache server.
+    """
+    KEY_PREFIX = 'django_iban:'
+
+    def __init__(self, alias='default', ttl=None):
+        from django.core.cache import caches
+        from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+        if alias not in settings.CACHES:
+            raise ImproperlyConfigured('IBAN_VALIDATION_CACHE_ALIAS %r is not in the CACHES setting.' % alias)
+        self.alias = alias
+        self.ttl = ttl
+        self._caches = caches
+        self._timeout = DEFAULT_TIMEOUT if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Returns the cached result for ``key`` or None. """
+        cache_key = compact_key(key)
+        # caches[alias] returns the connection of the current thread.
+        packed = None if cache_key is None else self._caches[self.alias].get(self.KEY_PREFIX + cache_key)
+        if packed is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return unpack_result(key[1], packed)
+
+    def set(self, key, result):
+        packed = pack_result(result)
+        cache_key = compact_key(key)
+        if packed is not None and cache_key is not None:
+            self._caches[self.alias].set(self.KEY_PREFIX + cache_key, packed, self._timeout)
+
+    def clear(self):
+        """ Resets the counters. The entries stay in the Django cache until they expire. """
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': None,
+            'size': None,
+            'maxsize': None,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+
+_validation_cache = None
+_configured = False
+
+
+def get_validation_cache():
+    """ Returns the validation cache of the configured backend, or None if it is not enabled in the settings. """
+    global _validation_cache, _configured
+    if not _configured:
+        backend = getattr(settings, 'IBAN_VALIDATION_CACHE_BACKEND', BACKEND_LOCAL)
+        maxsize = getattr(settings, 'IBAN_VALIDATION_CACHE_SIZE', 0)
+        ttl = getattr(settings, 'IBAN_VALIDATION_CACHE_TTL', None)
+        if backend == BACKEND_DJANGO:
+            _validation_cache = DjangoValidationCache(getattr(settings, 'IBAN_VALIDATION_CACHE_ALIAS', 'default'), ttl)
+        elif backend not in (BACKEND_LOCAL, BACKEND_SHARED_MEMORY):
+            raise ImproperlyConfigured('Unknown IBAN_VALIDATION_CACHE_BACKEND %r.' % backend)
+        elif not maxsize:
+            _validation_cache = None
+        elif backend == BACKEND_SHARED_MEMORY:
+            _validation_cache = SharedMemoryValidationCache(
+                getattr(settings, 'IBAN_VALIDATION_CACHE_NAME', 'django_iban_validation'), maxsize, ttl)
+        else:
+            _validation_cache = ValidationCache(maxsize, ttl)
+        _configured = True
+    return _validation_cache
+
+
+def _reset_validation_cache(**kwargs):
+    global _configured
+    if kwargs['setting'] in ('IBAN_VALIDATION_CACHE_SIZE', 'IBAN_VALIDATION_CACHE_TTL', 'IBAN_VALIDATION_CACHE_BACKEND',
+                             'IBAN_VALIDATION_CACHE_NAME', 'IBAN_VALIDATION_CACHE_ALIAS'):
+        _configured = False
+
+
+if setting_changed is not None:
+    setting_changed.connect(_reset_validation_cache)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+ISO 7064 mod 97-10 checksum used by IBANs.
+
+The textbook algorithm replaces every letter with two digits (A = 10, B = 11, ..., Z = 35), interprets the result as a
+decimal integer and takes the remainder on division by 97. Here the letter expansion is done by a single
+``str.translate`` pass over a precomputed table, so the digit string is built in one step instead of by repeated
+concatenation.
+"""
+from __future__ import unicode_literals
+
+import string
+
+
+#: The characters allowed in an IBAN once it has been normalized.
+IBAN_CHARACTERS = frozenset(string.digits + string.ascii_uppercase)
+
+_INVALID = 'x'
+
+
+class _DigitTable(dict):
+    """ Translation table for ``str.translate`` that maps characters outside 0-9 and A-Z to a non-digit. """
+
+    def __missing__(self, key):
+        return _INVALID
+
+
+_DIGIT_TABLE = _DigitTable((ord(x), '%d' % int(x, 36)) for x in IBAN_CHARACTERS)
+
+
+def mod97(value):
+    """
+    Returns the remainder of ``value`` on division by 97, with letters expanded to two digits.
+
+    Returns None if ``value`` is empty or contains a character outside 0-9 and A-Z.
+    """
+    try:
+        return int(value.translate(_DIGIT_TABLE)) % 97
+    except ValueError:
+        return None
+
+
+def is_valid_checksum(iban):
+    """ Checks the check digits of a normalized IBAN. """
+    return mod97(iban[4:] + iban[:4]) == 1
+
+
+def check_digits(country_code, bban):
+    """ Computes the two check digits for ``bban`` in ``country_code``. Both need to be normalized. """
+    remainder = mod97(bban + country_code + '00')
+    if remainder is None:
+        raise ValueError('%s%s contains characters that are not valid for IBAN.' % (country_code, bban))
+    return '%02d' % (98 - remainder)
+
+
+def first_invalid_character(value):
+    """ Returns the first character of ``value`` that is not allowed in a normalized IBAN, or None. """
+    for x in value:
+        if x not in IBAN_CHARACTERS:
+            return x
+    return None
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Sets of ISO 3166-1 alpha-2 country codes for ``include_countries``.
+
+A ``CountrySet`` is a frozenset of country codes whose set operations return CountrySets again, so policies can be
+built from ``IBAN_SEPA_COUNTRIES`` and other sets:
+
+.. code-block:: python
+
+    from django_iban.countries import CountrySet
+    from django_iban.sepa_countries import IBAN_SEPA_COUNTRIES
+
+    EUROZONE_SEPA = IBAN_SEPA_COUNTRIES - CountrySet(['BG', 'CH', 'CZ', 'DK', 'GB', 'GI', 'HU', 'IS', 'LI', 'NO', 'PL',
+                                                      'RO', 'SE'])
+
+    class Payment(models.Model):
+        iban = IBANField(include_countries=EUROZONE_SEPA)
+
+IBANField, IBANFormField and IBANValidator accept any iterable of country codes and convert it to a CountrySet. The
+CountrySet is shared by all validators with the same configuration, see ``django_iban.validators.iban_rules_registry``.
+"""
+from __future__ import unicode_literals
+
+import string
+
+
+class CountrySet(frozenset):
+    """
+    An immutable set of country codes, with constant time membership tests.
+
+    Raises ValueError for anything that isn't a two letter upper case country code. Creating a CountrySet from a
+    CountrySet returns the same object.
+    """
+    __slots__ = ()
+
+    def __new__(cls, country_codes=()):
+        if type(country_codes) is cls:
+            return country_codes
+        country_set = super(CountrySet, cls).__new__(cls, country_codes)
+        for country_code in country_set:
+            if not (isinstance(country_code, str) and len(country_code) == 2 and
+                    country_code[0] in string.ascii_uppercase and country_code[1] in string.ascii_uppercase):
+                raise ValueError('%r is not a two letter upper case country code.' % (country_code,))
+        return country_set
+
+    def __repr__(self):
+        return 'CountrySet([%s])' % ', '.join("'%s'" % country_code for country_code in sorted(self))
+
+    def __reduce__(self):
+        return CountrySet, (sorted(self),)
+
+    def copy(self):
+        return self
+
+
+def _returning_country_set(method):
+    def wrapper(self, *args):
+        result = method(self, *args)
+        return result if result is NotImplemented else CountrySet(result)
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+# The set operations of frozenset return frozensets, even for subclasses.
+for _name in ('__and__', '__or__', '__sub__', '__xor__', '__rand__', '__ror__', '__rsub__', '__rxor__',
+              'intersection', 'union', 'difference', 'symmetric_difference'):
+    setattr(CountrySet, _name, _returning_country_set(getattr(frozenset, _name)))
+del _name
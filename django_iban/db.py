@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Database side IBAN validation.
+
+``IBANField(db_check_constraint=True)`` adds a CHECK constraint to the column that enforces the country length table
+and the mod-97 checksum in the database, and ``IsValidIBAN`` is an expression for queries and indexes on IBAN columns
+that don't have the constraint, e.g. to find the invalid rows of an existing table.
+
+Both use the ``django_iban_is_valid(value, use_nordea_extensions)`` SQL function. On SQLite the function is registered
+on every new connection. On PostgreSQL it is created by the ``CreateIBANFunctions`` migration operation, which has to
+run before the first migration that uses it. Other databases don't have the function, ``IBANField`` doesn't add the
+constraint there:
+
+.. code-block:: python
+
+    from django_iban.operations import CreateIBANFunctions
+
+    class Migration(migrations.Migration):
+        operations = [
+            CreateIBANFunctions(),
+            migrations.CreateModel(...),
+        ]
+
+The function checks the values as they are stored by ``IBANField``, so it expects normalized IBANs. It doesn't check
+the BBAN format of the country, which ``IBANValidator`` does.
+"""
+from __future__ import unicode_literals
+
+from django.db import models
+from django.db.backends.signals import connection_created
+
+from .checksum import mod97
+from .validators import IBAN_COUNTRY_CODE_LENGTH, NORDEA_COUNTRY_CODE_LENGTH, iban_rules_registry
+
+
+#: The name of the SQL function that checks a stored IBAN.
+IBAN_VALIDITY_FUNCTION = 'django_iban_is_valid'
+
+#: The database vendors on which the SQL function exists.
+IBAN_VALIDITY_FUNCTION_VENDORS = ('sqlite', 'postgresql')
+
+
+def is_valid_stored_iban(value, use_nordea_extensions=False):
+    """
+    The Python version of the SQL function: checks the country, length, check digits and checksum of a normalized IBAN.
+
+    Returns None for None, like SQL functions do for NULL.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        return False
+    lengths = iban_rules_registry.get(use_nordea_extensions).lengths
+    return (len(value) == lengths.get(value[:2]) and value[2:4].isdigit() and '02' <= value[2:4] <= '98' and
+            mod97(value[4:] + value[:4]) == 1)
+
+
+def _length_cases(country_code_length):
+    return '\n'.join("            WHEN '%s' THEN %d" % item for item in sorted(country_code_length.items()))
+
+
+def postgresql_function_sql():
+    """ Returns the SQL that creates the ``django_iban_is_valid`` function on PostgreSQL. """
+    return """
+CREATE OR REPLACE FUNCTION %(name)s(value text, use_nordea_extensions boolean) RETURNS boolean AS $$
+DECLARE
+    expected integer;
+    remainder integer := 0;
+    rearranged text;
+    code integer;
+BEGIN
+    IF value IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF value !~ '^[A-Z]{2}[0-9]{2}[0-9A-Z]+$' OR substr(value, 3, 2) NOT BETWEEN '02' AND '98' THEN
+        RETURN false;
+    END IF;
+    expected := CASE substr(value, 1, 2)
+%(lengths)s
+        END;
+    IF expected IS NULL AND use_nordea_extensions THEN
+        expected := CASE substr(value, 1, 2)
+%(nordea_lengths)s
+            END;
+    END IF;
+    IF expected IS NULL OR length(value) <> expected THEN
+        RETURN false;
+    END IF;
+    rearranged := substr(value, 5) || substr(value, 1, 4);
+    FOR i IN 1..length(rearranged) LOOP
+        code := ascii(substr(rearranged, i, 1));
+        IF code >= 65 THEN
+            remainder := (remainder * 100 + code - 55) %% 97;
+        ELSE
+            remainder := (remainder * 10 + code - 48) %% 97;
+        END IF;
+    END LOOP;
+    RETURN remainder = 1;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE""" % {
+        'name': IBAN_VALIDITY_FUNCTION,
+        'lengths': _length_cases(IBAN_COUNTRY_CODE_LENGTH),
+        'nordea_lengths': _length_cases(NORDEA_COUNTRY_CODE_LENGTH),
+    }
+
+
+def postgresql_drop_function_sql():
+    return 'DROP FUNCTION IF EXISTS %s(text, boolean)' % IBAN_VALIDITY_FUNCTION
+
+
+def check_constraint_sql(column, use_nordea_extensions=False, include_countries=None, allow_blank=False):
+    """ Returns the CHECK constraint SQL for the quoted ``column``. """
+    sql = '%s(%s, %s)' % (IBAN_VALIDITY_FUNCTION, column, 'true' if use_nordea_extensions else 'false')
+    if include_countries:
+        country_codes = ', '.join("'%s'" % code for code in sorted(set(include_countries)))
+        sql += ' AND substr(%s, 1, 2) IN (%s)' % (column, country_codes)
+    if allow_blank:
+        sql = "%s = '' OR (%s)" % (column, sql)
+    return sql
+
+
+class IsValidIBAN(models.Func):
+    """
+    True if the IBAN in ``expression`` has a valid country, length and checksum.
+
+    Example:
+
+    .. code-block:: python
+
+        Payment.objects.exclude(IsValidIBAN('iban'))   # the invalid rows
+        models.Index(IsValidIBAN('iban'), name='payment_iban_valid')
+    """
+    function = IBAN_VALIDITY_FUNCTION
+    output_field = models.BooleanField()
+
+    def __init__(self, expression, use_nordea_extensions=False, **extra):
+        super(IsValidIBAN, self).__init__(expression, models.Value(bool(use_nordea_extensions)), **extra)
+
+
+def register_sqlite_functions(connection):
+    """ Registers the IBAN SQL function on a SQLite database connection. """
+    try:
+        connection.create_function(IBAN_VALIDITY_FUNCTION, 2, is_valid_stored_iban, deterministic=True)
+    except TypeError:
+        # Python < 3.8 doesn't know deterministic functions.
+        connection.create_function(IBAN_VALIDITY_FUNCTION, 2, is_valid_stored_iban)
+
+
+def _connection_created(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_sqlite_functions(connection.connection)
+
+
+connection_created.connect(_connection_created)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Finds IBANs in streams of text, e.g. remittance information, emails or text extracted from PDF files.
+
+``extract_ibans`` reads the text in chunks and yields the IBANs it finds, also when an IBAN is split over two chunks.
+IBANs may be written compact or in groups separated by single spaces or dashes, with an upper case country code.
+Candidates are first checked against the IBAN length of their country and only the plausible ones are validated.
+
+.. code-block:: python
+
+    with open('remittances.txt', 'rb') as f:
+        for start, end, iban in extract_ibans(f, include_countries=IBAN_SEPA_COUNTRIES):
+            ...
+
+The positions are offsets in the input: characters for text input and bytes for binary input (file objects opened in
+binary mode, ``bytes`` or ``mmap`` objects). Binary input is decoded as Latin-1, which keeps the offsets of IBANs
+intact in UTF-8 and other ASCII compatible encodings.
+"""
+from __future__ import unicode_literals
+
+import re
+
+from .validators import IBANValidator
+
+
+# A country code, two check digits and up to 30 characters, optionally separated by one space or dash. The candidate
+# must not follow directly on a letter or digit. The look-behind comes after the first letter, which fails faster on
+# most characters and almost doubles the speed of the search.
+_CANDIDATE = re.compile(r'[A-Z](?<![0-9A-Za-z][A-Z])[A-Z][0-9][0-9](?:[ \-]?[0-9A-Za-z]){11,30}')
+
+# The longest possible candidate: 34 characters with a separator between all of them, plus the character after it.
+_MAX_SPAN = 34 * 2
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def _read_chunks(source, chunk_size):
+    """ Yields the text chunks of a file object, ``bytes``, ``str``, ``mmap`` or iterable of chunks. """
+    if isinstance(source, (bytes, bytearray, str)):
+        source = [source]
+    read = getattr(source, 'read', None)
+    if read is not None:
+        chunks = iter(lambda: read(chunk_size), source.read(0))
+    else:
+        chunks = source
+    for chunk in chunks:
+        if not isinstance(chunk, str):
+            chunk = bytes(chunk).decode('latin-1')
+        yield chunk
+
+
+def _end_of_iban(text, start, stop, length):
+    """ Returns the end of the IBAN with ``length`` characters in ``text[start:stop]``, skipping separators, or -1. """
+    end = start + length
+    if end <= stop and ' ' not in text[start:end] and '-' not in text[start:end]:
+        return end
+    count = 0
+    for index in range(start, stop):
+        if text[index] not in ' -':
+            count += 1
+            if count == length:
+                return index + 1
+    return -1
+
+
+def extract_ibans(source, use_nordea_extensions=False, include_countries=None, validate=True,
+                  chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields a ``(start, end, iban)`` tuple for every IBAN in ``source``, in the order they appear.
+
+    ``source`` is a file object (text or binary), a string, ``bytes``, an ``mmap`` object or an iterable of string or
+    bytes chunks. ``iban`` is the normalized IBAN and ``start`` and ``end`` are its offsets in the input, including
+    separators. The validator options have the same meaning as for ``IBANValidator``. With ``validate=False`` all
+    candidates with the right length for their country are returned without checking them any further.
+    """
+    validator = IBANValidator(use_nordea_extensions, include_countries)
+    lengths = validator.validation_countries
+    allowed = validator.include_countries
+    check = validator.check
+
+    search = _CANDIDATE.search
+    buffer = ''
+    base = 0  # The offset of buffer in the input.
+    context = 0  # 1 when the first character of buffer is only kept for the look-behind of the pattern.
+    chunks = _read_chunks(source, chunk_size)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+        else:
+            buffer += chunk
+            if len(buffer) < _MAX_SPAN * 2:
+                continue
+
+        # Until the last chunk, only the candidates that start before the last _MAX_SPAN characters are complete.
+        limit = len(buffer) if final else len(buffer) - _MAX_SPAN
+        position = context
+        while True:
+            match = search(buffer, position)
+            if match is None or match.start() >= limit:
+                break
+            start = match.start()
+            country_code = buffer[start:start + 2]
+            length = lengths.get(country_code)
+            end = _end_of_iban(buffer, start, match.end(), length) if length else -1
+            if end == -1 or (allowed and country_code not in allowed) or (end < len(buffer) and buffer[end].isalnum()):
+                # Not an IBAN, but one can start later in the candidate.
+                position = start + 1
+                continue
+            position = end
+            iban = buffer[start:end]
+            if validate:
+                normalized, error_code, error_param = check(iban)
+                if error_code is not None:
+                    continue
+            else:
+                normalized = iban.replace(' ', '').replace('-', '').upper()
+            yield base + start, base + end, normalized
+
+        if not final:
+            keep = max(position, limit) - 1
+            base += keep
+            buffer = buffer[keep:]
+            context = 1
@@ -1,8 +1,12 @@
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from .db import IBAN_VALIDITY_FUNCTION_VENDORS, check_constraint_sql
 from .forms import IBANFormField
-from .validators import IBANValidator, swift_bic_validator
+from .iban import IBAN
+from .lookups import IBAN_TRANSFORMS
+from .metrics import get_validation_metrics
+from .validators import IBANValidator, normalize_iban, swift_bic_validator
 
 
 class IBANField(models.CharField):
@@ -12,8 +16,9 @@ class IBANField(models.CharField):
     To limit validation to specific countries, set the 'include_countries' argument with a tuple or list of ISO 3166-1
     alpha-2 codes. For example, `include_countries=('NL', 'BE, 'LU')`.
 
-    A list of countries that use IBANs as part of SEPA is included for convenience. To use this feature, set
-    `include_countries=IBAN_SEPA_COUNTRIES` as an argument to the field.
+    A set of countries that use IBANs as part of SEPA is included for convenience. To use this feature, set
+    `include_countries=IBAN_SEPA_COUNTRIES` as an argument to the field. It is a `django_iban.countries.CountrySet`,
+    so policies like `IBAN_SEPA_COUNTRIES - {'GB'}` can be built with set operations.
 
     Example:
 
@@ -29,38 +34,180 @@ class IBANField(models.CharField):
     In addition to validating official IBANs, this field can optionally validate unofficial IBANs that have been
     catalogued by Nordea by setting the `use_nordea_extensions` argument to True.
 
+    Set the `use_iban_object` argument to True to get `django_iban.iban.IBAN` objects instead of strings from the
+    database. These give access to the bank code, branch code and account number without parsing the value again.
+
+    Set the `db_check_constraint` argument to True to add a CHECK constraint to the column that enforces the country,
+    length and checksum in the database, see `django_iban.db`. The constraint is only added on SQLite and PostgreSQL.
+
+    The parts of the IBANs can be used in queries and functional indexes with the `country`, `check_digits`, `bban`,
+    `bank_code`, `branch_code` and `account_number` transforms, see `django_iban.lookups`.
+
     https://en.wikipedia.org/wiki/International_Bank_Account_Number
     """
     description = _('An International Bank Account Number')
 
     def __init__(self, use_nordea_extensions=False, include_countries=None, *args, **kwargs):
         kwargs.setdefault('max_length', 34)
+        self.use_nordea_extensions = use_nordea_extensions
+        # Keyword only, the positional arguments after include_countries are passed on to CharField.
+        self.use_iban_object = kwargs.pop('use_iban_object', False)
+        self.db_check_constraint = kwargs.pop('db_check_constraint', False)
         super(IBANField, self).__init__(*args, **kwargs)
-        self.validators.append(IBANValidator(use_nordea_extensions, include_countries))
+        validator = IBANValidator(use_nordea_extensions, include_countries)
+        self.validators.append(validator)
+        # The CountrySet shared with the validator, or None.
+        self.include_countries = validator.include_countries
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(IBANField, self).deconstruct()
+        if kwargs.get('max_length') == 34:
+            del kwargs['max_length']
+        if self.use_nordea_extensions:
+            kwargs['use_nordea_extensions'] = True
+        if self.include_countries:
+            kwargs['include_countries'] = tuple(sorted(self.include_countries))
+        if self.use_iban_object:
+            kwargs['use_iban_object'] = True
+        if self.db_check_constraint:
+            kwargs['db_check_constraint'] = True
+        return name, path, args, kwargs
+
+    def db_check(self, connection):
+        if not self.db_check_constraint or connection.vendor not in IBAN_VALIDITY_FUNCTION_VENDORS:
+            return super(IBANField, self).db_check(connection)
+        return check_constraint_sql(connection.ops.quote_name(self.column), self.use_nordea_extensions,
+                                    self.include_countries, self.blank)
 
     def to_python(self, value):
+        if self.use_iban_object and isinstance(value, IBAN):
+            return value
         value = super(IBANField, self).to_python(value)
         if value is not None:
-            return value.upper().replace(' ', '').replace('-', '')
+            value = normalize_iban(value)
+            if self.use_iban_object:
+                return IBAN(value)
         return value
 
+    def get_db_converters(self, connection):
+        converters = super(IBANField, self).get_db_converters(connection)
+        if self.use_iban_object:
+            # Only these fields have a converter, the others don't add a call for every row.
+            converters.append(self._to_iban)
+        return converters
+
+    def _to_iban(self, value, expression, connection):
+        return IBAN(value) if value is not None else value
+
+    def get_prep_value(self, value):
+        value = super(IBANField, self).get_prep_value(value)
+        if value is not None:
+            # Database adapters get a plain string instead of an IBAN object or the NormalizedIBAN marker type.
+            return str(normalize_iban(value))
+        return value
+
+    def clean(self, value, model_instance):
+        metrics = get_validation_metrics()
+        if metrics is None:
+            return super(IBANField, self).clean(value, model_instance)
+        with metrics.timer('iban', 'model_field'):
+            return super(IBANField, self).clean(value, model_instance)
+
     def formfield(self, **kwargs):
         defaults = {'form_class': IBANFormField}
         defaults.update(kwargs)
         return super(IBANField, self).formfield(**defaults)
 
 
+for transform in IBAN_TRANSFORMS:
+    IBANField.register_lookup(transform)
+
+
+class IBANCountryCodeField(models.CharField):
+    """
+    Stores the country code of the IBANField named by `iban_field`, in an indexed column by default.
+
+    The value is set when the instance is saved, so queries like "all Dutch accounts" can use the index instead of
+    scanning the IBANs.
+
+    Example:
+
+    .. code-block:: python
+
+        class Payment(models.Model):
+            iban = IBANField()
+            iban_country_code = IBANCountryCodeField('iban')
+
+        Payment.objects.filter(iban_country_code='NL')
+
+    `bulk_update` doesn't call `pre_save`, use `IBANQuerySet.validated_bulk_update` to keep the column up to date.
+    """
+
+    # The options that default to other values than for CharField.
+    _defaults = {'max_length': 2, 'db_index': True, 'editable': False, 'blank': True}
+
+    def __init__(self, iban_field, *args, **kwargs):
+        for key, default in self._defaults.items():
+            kwargs.setdefault(key, default)
+        self.iban_field = iban_field
+        super(IBANCountryCodeField, self).__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(IBANCountryCodeField, self).deconstruct()
+        kwargs['iban_field'] = self.iban_field
+        # CharField leaves out the options with its own defaults, e.g. db_index=False.
+        for key, default in self._defaults.items():
+            value = getattr(self, key)
+            if value == default:
+                kwargs.pop(key, None)
+            else:
+                kwargs[key] = value
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        iban = getattr(model_instance, model_instance._meta.get_field(self.iban_field).attname)
+        value = normalize_iban(iban)[:2] if iban else ''
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class SWIFTBICField(models.CharField):
     """
     A SWIFT-BIC consists of up to 11 alphanumeric characters.
 
+    Set the `require_existence` argument to True to also check that the BIC is in the BIC directory of the
+    `IBAN_BIC_DIRECTORY` setting, see `django_iban.bic_directory`.
+
     https://en.wikipedia.org/wiki/ISO_9362
     """
 
     def __init__(self, *args, **kwargs):
+        # Keyword only, the first positional argument is verbose_name like for other fields.
+        require_existence = kwargs.pop('require_existence', False)
         kwargs.setdefault('max_length', 11)
+        self.require_existence = require_existence
         super(SWIFTBICField, self).__init__(*args, **kwargs)
-        self.validators.append(swift_bic_validator)
+        if require_existence:
+            # The BIC directory module is only imported when it is used.
+            from .bic_directory import bic_exists_validator
+            self.validators.append(bic_exists_validator)
+        else:
+            self.validators.append(swift_bic_validator)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super(SWIFTBICField, self).deconstruct()
+        if kwargs.get('max_length') == 11:
+            del kwargs['max_length']
+        if self.require_existence:
+            kwargs['require_existence'] = True
+        return name, path, args, kwargs
+
+    def clean(self, value, model_instance):
+        metrics = get_validation_metrics()
+        if metrics is None:
+            return super(SWIFTBICField, self).clean(value, model_instance)
+        with metrics.timer('bic', 'model_field'):
+            return super(SWIFTBICField, self).clean(value, model_instance)
 
 
 # If south is installed, ensure that IBANField will be introspected just
@@ -70,5 +217,6 @@ try:
 
     add_introspection_rules([], ["^django_iban\.fields\.IBANField"])
     add_introspection_rules([], ["^django_iban\.fields\.SWIFTBICField"])
+    add_introspection_rules([], ["^django_iban\.fields\.IBANCountryCodeField"])
 except ImportError:
     pass
@@ -1,8 +1,7 @@
 from django import forms
-from .validators import IBANValidator, swift_bic_validator, IBAN_COUNTRY_CODE_LENGTH
 
-
-IBAN_MIN_LENGTH = min(IBAN_COUNTRY_CODE_LENGTH.values())
+from .metrics import get_validation_metrics
+from .validators import IBANValidator, format_iban, normalize_iban, swift_bic_validator, IBAN_MIN_LENGTH
 
 
 class IBANFormField(forms.CharField):
@@ -12,8 +11,9 @@ class IBANFormField(forms.CharField):
     To limit validation to specific countries, set the 'include_countries' argument with a tuple or list of ISO 3166-1
     alpha-2 codes. For example, `include_countries=('NL', 'BE, 'LU')`.
 
-    A list of countries that use IBANs as part of SEPA is included for convenience. To use this feature, set
-    `include_countries=IBAN_SEPA_COUNTRIES` as an argument to the field.
+    A set of countries that use IBANs as part of SEPA is included for convenience. To use this feature, set
+    `include_countries=IBAN_SEPA_COUNTRIES` as an argument to the field. It is a `django_iban.countries.CountrySet`,
+    so policies like `IBAN_SEPA_COUNTRIES - {'GB'}` can be built with set operations.
 
     Example:
 
@@ -40,16 +40,21 @@ class IBANFormField(forms.CharField):
     def to_python(self, value):
         value = super(IBANFormField, self).to_python(value)
         if value is not None:
-            return value.upper().replace(' ', '').replace('-', '')
+            return normalize_iban(value)
         return value
 
     def prepare_value(self, value):
         """ The display format for IBAN has a space every 4 characters. """
         if value is None:
             return value
-        grouping = 4
-        value = value.upper().replace(' ', '').replace('-', '')
-        return ' '.join(value[i:i + grouping] for i in range(0, len(value), grouping))
+        return format_iban(value)
+
+    def clean(self, value):
+        metrics = get_validation_metrics()
+        if metrics is None:
+            return super(IBANFormField, self).clean(value)
+        with metrics.timer('iban', 'form_field'):
+            return super(IBANFormField, self).clean(value)
 
 
 class SWIFTBICFormField(forms.CharField):
@@ -77,3 +82,10 @@ class SWIFTBICFormField(forms.CharField):
         if value is None:
             return value
         return value.upper()
+
+    def clean(self, value):
+        metrics = get_validation_metrics()
+        if metrics is None:
+            return super(SWIFTBICFormField, self).clean(value)
+        with metrics.timer('bic', 'form_field'):
+            return super(SWIFTBICFormField, self).clean(value)
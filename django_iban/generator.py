@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Generates valid and invalid IBANs for load tests, benchmarks and fuzz tests.
+
+``IBANGenerator`` yields a deterministic stream of IBANs for a seed, with a mix of error types given as the fraction of
+the IBANs that get each error. Every IBAN comes with the error code that ``IBANValidator`` with the same
+``use_nordea_extensions`` and ``include_countries`` reports for it, or None for valid IBANs:
+
+.. code-block:: python
+
+    generator = IBANGenerator(seed=42, include_countries=IBAN_SEPA_COUNTRIES,
+                              error_rates={IBAN_INVALID_CHECKSUM: 0.1, IBAN_COUNTRY_NOT_ALLOWED: 0.05})
+    write_corpus('ibans.csv', generator.generate(10 ** 6))
+
+    for iban, error_code in read_corpus('ibans.csv'):
+        ...
+
+The corpus files are CSV files with an ``iban,error`` header, which the ``validate_ibans`` management command reads
+with ``--csv --column iban``.
+"""
+from __future__ import unicode_literals
+
+import io
+import itertools
+import random
+import string
+
+from .bban import get_bban_structure
+from .checksum import check_digits
+from .validators import (IBAN_COUNTRY_NOT_ALLOWED, IBAN_INVALID_CHARACTER, IBAN_INVALID_CHECKSUM, IBAN_INVALID_COUNTRY,
+                         IBAN_INVALID_FORMAT, IBAN_INVALID_LENGTH, IBANValidator)
+
+
+#: The error codes of the IBANs the generator can produce.
+ERROR_TYPES = (IBAN_INVALID_LENGTH, IBAN_INVALID_CHECKSUM, IBAN_INVALID_CHARACTER, IBAN_INVALID_FORMAT,
+               IBAN_COUNTRY_NOT_ALLOWED, IBAN_INVALID_COUNTRY)
+
+_CHARACTERS = {'n': string.digits, 'a': string.ascii_uppercase, 'c': string.digits + string.ascii_uppercase}
+
+# Tables for bytes.translate that turn random bytes into the characters of a class. The small bias towards the first
+# characters doesn't matter for test data.
+_TABLES = dict((character_class, bytes(bytearray(ord(characters[i % len(characters)]) for i in range(256))))
+               for character_class, characters in _CHARACTERS.items())
+
+# Characters that normalize_iban keeps but IBANs don't allow. No commas or quotes, which would need quoting in CSV.
+_INVALID_CHARACTERS = '!#$%&*+./:;=?@_'
+
+# Country codes of countries that don't use IBANs.
+_NON_IBAN_COUNTRIES = ('AR', 'AU', 'CA', 'CN', 'IN', 'JP', 'MX', 'NZ', 'US', 'ZA')
+
+
+class IBANGenerator(object):
+    """
+    A seeded generator of IBANs.
+
+    ``countries`` are the country codes of the valid IBANs and of the IBANs with an error in the BBAN or check digits,
+    by default all countries that ``include_countries`` and ``use_nordea_extensions`` allow. ``error_rates`` maps
+    error codes of ``ERROR_TYPES`` to the fraction of the IBANs that get the error, the other IBANs are valid.
+    ``IBAN_COUNTRY_NOT_ALLOWED`` IBANs are valid IBANs of the countries outside ``include_countries``.
+    """
+
+    def __init__(self, seed=None, use_nordea_extensions=False, include_countries=None, countries=None,
+                 error_rates=None):
+        self.random = random.Random(seed)
+        validator = IBANValidator(use_nordea_extensions, include_countries)
+        lengths = validator.validation_countries
+        allowed = validator.include_countries or frozenset(lengths)
+        self.countries = tuple(sorted(countries or allowed))
+        for country_code in self.countries:
+            if country_code not in allowed:
+                raise ValueError('%s IBANs are not valid with the configured countries.' % country_code)
+        self.disallowed_countries = tuple(sorted(set(lengths) - allowed))
+        self.non_iban_countries = tuple(country_code for country_code in _NON_IBAN_COUNTRIES
+                                        if country_code not in lengths)
+
+        # The BBAN length and the slices and translation tables of the BBAN segments of every country, and the offsets
+        # of the segments with letters or digits only.
+        self._segments = {}
+        self._strict_offsets = {}
+        for country_code in set(self.countries) | set(self.disallowed_countries):
+            segments = []
+            offset = 0
+            for count, character_class in get_bban_structure(country_code).character_classes:
+                segments.append((offset, offset + count, _TABLES[character_class]))
+                if character_class != 'c':
+                    self._strict_offsets.setdefault(country_code, []).extend(range(offset, offset + count))
+                offset += count
+            self._segments[country_code] = (offset, tuple(segments))
+        self.format_countries = tuple(country_code for country_code in self.countries
+                                      if country_code in self._strict_offsets)
+
+        self.error_rates = dict(error_rates or {})
+        unknown = set(self.error_rates) - set(ERROR_TYPES)
+        if unknown:
+            raise ValueError('Unknown error types: %s.' % ', '.join(sorted(unknown)))
+        # Cumulative rates, a random number below a threshold gets its error.
+        self._thresholds = []
+        total = 0.0
+        for error_code in ERROR_TYPES:
+            rate = self.error_rates.get(error_code)
+            if not rate:
+                continue
+            if (error_code == IBAN_COUNTRY_NOT_ALLOWED and not self.disallowed_countries or
+                    error_code == IBAN_INVALID_FORMAT and not self.format_countries):
+                raise ValueError('The configured countries have no %s IBANs.' % error_code)
+            total += rate
+            self._thresholds.append((total, error_code))
+        if total > 1:
+            raise ValueError('The error rates add up to more than 1.')
+
+    def bban(self, country_code):
+        """ Returns a random BBAN with the character classes of the country. """
+        length, segments = self._segments[country_code]
+        data = self.random.getrandbits(length * 8).to_bytes(length, 'little')
+        return b''.join([data[start:stop].translate(table) for start, stop, table in segments]).decode('ascii')
+
+    def iban(self, country_code):
+        """ Returns a random valid IBAN of the country. """
+        bban = self.bban(country_code)
+        return country_code + check_digits(country_code, bban) + bban
+
+    def generate(self, count=None):
+        """ Yields ``count`` ``(iban, error_code)`` tuples, or an endless stream if ``count`` is None. """
+        next_random = self.random.random
+        choice = self.random.choice
+        countries = self.countries
+        thresholds = self._thresholds
+        for _ in (itertools.repeat(None, count) if count is not None else itertools.repeat(None)):
+            error_code = None
+            if thresholds:
+                value = next_random()
+                for threshold, threshold_error_code in thresholds:
+                    if value < threshold:
+                        error_code = threshold_error_code
+                        break
+            if error_code is None:
+                yield self.iban(choice(countries)), None
+            else:
+                yield self.invalid_iban(error_code), error_code
+
+    def invalid_iban(self, error_code):
+        """ Returns a random IBAN with the error. """
+        choice = self.random.choice
+        if error_code == IBAN_INVALID_LENGTH:
+            iban = self.iban(choice(self.countries))
+            return iban[:-1] if self.random.random() < 0.5 else iban + choice(string.digits)
+        elif error_code == IBAN_INVALID_CHECKSUM:
+            country_code = choice(self.countries)
+            bban = self.bban(country_code)
+            wrong = (int(check_digits(country_code, bban)) + self.random.randrange(1, 97)) % 97
+            return '%s%02d%s' % (country_code, wrong, bban)
+        elif error_code == IBAN_INVALID_CHARACTER:
+            iban = self.iban(choice(self.countries))
+            position = self.random.randrange(4, len(iban))
+            return iban[:position] + choice(_INVALID_CHARACTERS) + iban[position + 1:]
+        elif error_code == IBAN_INVALID_FORMAT:
+            # A digit where the country has letters or a letter where it has digits, with the right check digits.
+            country_code = choice(self.format_countries)
+            bban = self.bban(country_code)
+            position = choice(self._strict_offsets[country_code])
+            replacement = choice(string.ascii_uppercase if bban[position].isdigit() else string.digits)
+            bban = bban[:position] + replacement + bban[position + 1:]
+            return country_code + check_digits(country_code, bban) + bban
+        elif error_code == IBAN_COUNTRY_NOT_ALLOWED:
+            return self.iban(choice(self.disallowed_countries))
+        elif error_code == IBAN_INVALID_COUNTRY:
+            length = self.random.randrange(15, 35)
+            return (choice(self.non_iban_countries) + '%02d' % self.random.randrange(2, 99) +
+                    ''.join(self.random.choices(_CHARACTERS['c'], k=length - 4)))
+        raise ValueError('Unknown error type: %s.' % error_code)
+
+
+def write_corpus(path, items, chunk_size=10000):
+    """ Writes ``(iban, error_code)`` tuples to a corpus file and returns the number of IBANs written. """
+    items = iter(items)
+    count = 0
+    with io.open(path, 'w', newline='') as f:
+        f.write('iban,error\n')
+        for chunk in iter(lambda: list(itertools.islice(items, chunk_size)), []):
+            f.write(''.join(['%s,%s\n' % (iban, error_code or '') for iban, error_code in chunk]))
+            count += len(chunk)
+    return count
+
+
+def read_corpus(path):
+    """ Yields the ``(iban, error_code)`` tuples of a corpus file, ``error_code`` is None for valid IBANs. """
+    with io.open(path, newline='') as f:
+        next(f, None)
+        for line in f:
+            iban, error_code = line.rstrip('\n').split(',')
+            yield iban, error_code or None
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from .bban import get_bban_structure
+from .validators import format_iban, normalize_iban
+
+
+class IBAN(object):
+    """
+    A parsed IBAN.
+
+    The value is normalized once when the object is created. The BBAN components (``bank_code``, ``branch_code`` and
+    ``account_number``) are sliced out on first access and then cached. They are None when the country doesn't have
+    that component or isn't an IBAN country. An IBAN object does not validate its value, use ``IBANValidator`` for that.
+
+    ``str()`` of an IBAN returns the normalized value, so IBAN objects can be used wherever an IBAN string is expected.
+    ``formatted`` is the display format that ``IBANFormField`` shows.
+
+    An IBAN is equal to the string of its normalized value and has the same hash, so IBANs and normalized strings can be
+    mixed in sets and as dictionary keys. Strings are not normalized for the comparison, normalize them with
+    ``normalize_iban`` or compare IBAN objects.
+    """
+    __slots__ = ('value', '_components')
+
+    def __init__(self, value):
+        self.value = normalize_iban(value)
+        self._components = None
+
+    @property
+    def country_code(self):
+        return self.value[:2]
+
+    @property
+    def check_digits(self):
+        return self.value[2:4]
+
+    @property
+    def bban(self):
+        return self.value[4:]
+
+    @property
+    def formatted(self):
+        """ The display format, with a space every 4 characters. """
+        return format_iban(self.value)
+
+    @property
+    def structure(self):
+        """ The BBANStructure of the country, or None. """
+        return get_bban_structure(self.country_code)
+
+    def _parse(self):
+        bban = self.value[4:]
+        structure = get_bban_structure(self.value[:2])
+        if structure is None or structure.length != len(bban):
+            self._components = (None, None, None)
+        else:
+            self._components = tuple(bban[component] if component is not None else None for component in
+                                     (structure.bank_code, structure.branch_code, structure.account_number))
+        return self._components
+
+    @property
+    def bank_code(self):
+        return (self._components or self._parse())[0]
+
+    @property
+    def branch_code(self):
+        return (self._components or self._parse())[1]
+
+    @property
+    def account_number(self):
+        return (self._components or self._parse())[2]
+
+    def __str__(self):
+        return self.value
+
+    def __repr__(self):
+        return '<IBAN: %s>' % self.value
+
+    def __eq__(self, other):
+        if isinstance(other, IBAN):
+            return self.value == other.value
+        if isinstance(other, str):
+            # Not normalized, an IBAN is only equal to the strings that have its hash.
+            return self.value == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __len__(self):
+        return len(self.value)
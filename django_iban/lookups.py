@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Transforms for the components of the IBANs in an IBANField.
+
+They are registered on IBANField as ``country``, ``check_digits``, ``bban``, ``bank_code``, ``branch_code`` and
+``account_number``. The bank code, branch code and account number offsets come from the BBAN structure of each
+country, see ``django_iban.bban``. All transforms compile to plain ``SUBSTR`` and ``CASE`` expressions, so they can be
+used in functional indexes, which the database then uses for the lookups:
+
+.. code-block:: python
+
+    class Payment(models.Model):
+        iban = IBANField()
+
+        class Meta:
+            indexes = [models.Index(IBANBankCode('iban'), name='payment_iban_bank_code')]
+
+    Payment.objects.filter(iban__bank_code='ABNA')
+    Payment.objects.values('iban__country').annotate(count=Count('id'))
+
+Lookup values are compared as they are, so use uppercase country and bank codes.
+"""
+from __future__ import unicode_literals
+
+from django.db.models import CharField, Transform
+
+from .bban import get_bban_structures
+
+
+class IBANSubstring(Transform):
+    """ A fixed part of the IBAN, from the 1-based position ``start`` with ``length`` characters. """
+    start = None
+    length = None
+    output_field = CharField()
+
+    def as_sql(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        return 'SUBSTR(%s, %d, %d)' % (lhs, self.start, self.length), params
+
+
+class IBANCountry(IBANSubstring):
+    lookup_name = 'country'
+    start = 1
+    length = 2
+
+
+class IBANCheckDigits(IBANSubstring):
+    lookup_name = 'check_digits'
+    start = 3
+    length = 2
+
+
+class IBANBBAN(IBANSubstring):
+    lookup_name = 'bban'
+    start = 5
+    length = 30
+
+
+def _component_offsets(component):
+    """
+    Returns a list of ``(start, length, country codes)`` of a BBAN component in the IBAN, with the countries that
+    have the same offsets grouped together.
+    """
+    countries = {}
+    for country_code, structure in get_bban_structures().items():
+        component_slice = getattr(structure, component)
+        if component_slice is not None:
+            # The BBAN starts at the 5th character of the IBAN and SQL positions are 1-based.
+            offsets = (component_slice.start + 5, component_slice.stop - component_slice.start)
+            countries.setdefault(offsets, []).append(country_code)
+    return [(start, length, tuple(sorted(country_codes)))
+            for (start, length), country_codes in sorted(countries.items())]
+
+
+class IBANComponent(Transform):
+    """ A BBAN component with per country offsets. NULL for countries that don't have the component. """
+    component = None
+    output_field = CharField()
+    _offsets = None
+
+    @classmethod
+    def get_offsets(cls):
+        if cls._offsets is None:
+            cls._offsets = _component_offsets(cls.component)
+        return cls._offsets
+
+    def as_sql(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        offsets = self.get_offsets()
+        cases = ' '.join("WHEN SUBSTR(%s, 1, 2) IN (%s) THEN SUBSTR(%s, %d, %d)" % (
+            lhs, ', '.join("'%s'" % country_code for country_code in country_codes), lhs, start, length)
+            for start, length, country_codes in offsets)
+        return 'CASE %s END' % cases, list(params) * (2 * len(offsets))
+
+
+class IBANBankCode(IBANComponent):
+    lookup_name = 'bank_code'
+    component = 'bank_code'
+
+
+class IBANBranchCode(IBANComponent):
+    lookup_name = 'branch_code'
+    component = 'branch_code'
+
+
+class IBANAccountNumber(IBANComponent):
+    lookup_name = 'account_number'
+    component = 'account_number'
+
+
+IBAN_TRANSFORMS = (IBANCountry, IBANCheckDigits, IBANBBAN, IBANBankCode, IBANBranchCode, IBANAccountNumber)
@@ -0,0 +1,173 @@
+from __future__ import unicode_literals
+
+import csv
+import io
+import json
+import os
+import time
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from ...countries import CountrySet
+from ...rules import CountryRuleSet, get_current_rule_set
+from ...validators import IBAN_COUNTRY_NOT_ALLOWED, IBANValidator
+
+
+def _write_json(path, data):
+    """ Replaces the file at ``path`` with the JSON of ``data`` at once, an interruption never leaves half a file. """
+    temporary_path = path + '.tmp'
+    with io.open(temporary_path, 'w') as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+class Command(BaseCommand):
+    help = ('Revalidates the IBANs stored in a model field after the country rules changed. Only the rows with a '
+            'country code whose rules differ from the previous rules are read, in chunks ordered by primary key. The '
+            'rows that became valid or invalid are written to a CSV file. The progress is saved in a checkpoint file '
+            'after every chunk and an interrupted run continues from there.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='The model, as app_label.ModelName.')
+        parser.add_argument('field', help='The name of the IBAN field.')
+        parser.add_argument('--rules', required=True,
+                            help="JSON file with the country rules the stored IBANs were validated with. If it doesn't "
+                                 "exist, the current rules are saved to it and nothing is revalidated. The file is "
+                                 "updated to the current rules when the revalidation completes.")
+        parser.add_argument('--countries',
+                            help='Comma separated list of country codes to revalidate instead of the changed ones.')
+        parser.add_argument('-o', '--output',
+                            help='The CSV file for the changed rows. Defaults to the rules file name with '
+                                 '.changes.csv appended.')
+        parser.add_argument('--checkpoint',
+                            help='The checkpoint file. Defaults to the output file name with .checkpoint appended.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Number of rows read at a time.')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+            field = model._meta.get_field(options['field'])
+        except (LookupError, ValueError, FieldDoesNotExist) as e:
+            raise CommandError(e)
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        current = get_current_rule_set()
+        rules_path = options['rules']
+        if not os.path.exists(rules_path):
+            _write_json(rules_path, current.to_dict())
+            self.stdout.write('Saved the current country rules (version %s) to %s. Run the command again after '
+                              'upgrading django-iban to revalidate the IBANs of the changed countries.'
+                              % (current.version, rules_path))
+            return
+        try:
+            with io.open(rules_path) as f:
+                previous = CountryRuleSet.from_dict(json.load(f))
+        except (ValueError, KeyError) as e:
+            raise CommandError('%s is not a country rules file: %s' % (rules_path, e))
+
+        if options['countries']:
+            countries = frozenset(code.strip().upper() for code in options['countries'].split(','))
+        else:
+            countries = previous.diff(current)
+        if not countries:
+            self.stdout.write('The country rules are the same as in %s, nothing to revalidate.' % rules_path)
+            return
+
+        # The stored IBANs were validated with the options of the field.
+        use_nordea_extensions = getattr(field, 'use_nordea_extensions', False)
+        include_countries = getattr(field, 'include_countries', None)
+        try:
+            validator = IBANValidator(use_nordea_extensions, include_countries)
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+        # The countries of the field may not all exist in the previous rules, so they are checked separately.
+        previous_validator = IBANValidator(use_nordea_extensions, rule_set=previous)
+        previous_allowed = CountrySet(include_countries) if include_countries else None
+        if previous_allowed == current.sepa_countries:
+            # A field restricted to IBAN_SEPA_COUNTRIES allowed the SEPA countries of the previous rules.
+            previous_allowed = CountrySet(previous.sepa_countries)
+
+        output = options['output'] or rules_path + '.changes.csv'
+        checkpoint_path = options['checkpoint'] or output + '.checkpoint'
+        job = {
+            'model': model._meta.label,
+            'field': field.name,
+            'previous': previous.version,
+            'current': current.version,
+            'countries': sorted(countries),
+            'output': os.path.abspath(output),
+        }
+        checkpoint = self.read_checkpoint(checkpoint_path, job)
+        if checkpoint is None:
+            checkpoint = dict(job, last_pk=None, output_size=0, total=0, changed=0)
+        else:
+            self.stdout.write('Continuing after primary key %s from %s.' % (checkpoint['last_pk'], checkpoint_path))
+
+        queryset = self.get_queryset(model, field, countries)
+        pk_field = model._meta.pk
+        start = time.time()
+        with io.open(output, 'a+' if checkpoint['last_pk'] is not None else 'w', newline='') as output_file:
+            # Rows written after the last checkpoint are written again.
+            output_file.seek(checkpoint['output_size'])
+            output_file.truncate()
+            writer = csv.writer(output_file)
+            if checkpoint['last_pk'] is None:
+                writer.writerow(['pk', 'iban', 'previous_error', 'error'])
+
+            while True:
+                chunk = queryset
+                if checkpoint['last_pk'] is not None:
+                    chunk = chunk.filter(pk__gt=pk_field.to_python(checkpoint['last_pk']))
+                rows = list(chunk.values_list('pk', field.attname)[:options['chunk_size']])
+                if not rows:
+                    break
+
+                for pk, value in rows:
+                    if not value:
+                        continue
+                    normalized, error_code, error_param = validator.check(value)
+                    previous_error_code = previous_validator.check(normalized)[1]
+                    if previous_error_code is None and previous_allowed and normalized[:2] not in previous_allowed:
+                        previous_error_code = IBAN_COUNTRY_NOT_ALLOWED
+                    if (error_code is None) != (previous_error_code is None):
+                        writer.writerow([pk, normalized, previous_error_code or '', error_code or ''])
+                        checkpoint['changed'] += 1
+                checkpoint['total'] += len(rows)
+
+                output_file.flush()
+                checkpoint['last_pk'] = str(rows[-1][0])
+                checkpoint['output_size'] = output_file.tell()
+                _write_json(checkpoint_path, checkpoint)
+
+        _write_json(rules_path, current.to_dict())
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write('Revalidated %d IBANs of %s (%d changed) in %.2f seconds. Changed rows written to %s, %s '
+                          'updated to the current country rules.'
+                          % (checkpoint['total'], ', '.join(sorted(countries)), checkpoint['changed'],
+                             time.time() - start, output, rules_path))
+
+    def get_queryset(self, model, field, countries):
+        """ Returns the rows with the country codes, ordered by primary key. """
+        queryset = model._default_manager.order_by('pk')
+        if field.get_transform('country') is not None:
+            # The country transform of IBANField, which can use a functional index.
+            return queryset.filter(**{'%s__country__in' % field.name: sorted(countries)})
+        condition = Q()
+        for country_code in sorted(countries):
+            condition |= Q(**{'%s__startswith' % field.name: country_code})
+        return queryset.filter(condition)
+
+    def read_checkpoint(self, path, job):
+        """ Returns the checkpoint of an interrupted run of the same job, or None. """
+        if not os.path.exists(path):
+            return None
+        with io.open(path) as f:
+            checkpoint = json.load(f)
+        if any(checkpoint.get(key) != value for key, value in job.items()):
+            raise CommandError('The checkpoint %s is for another revalidation, remove it to start again.' % path)
+        return checkpoint
@@ -0,0 +1,143 @@
+from __future__ import unicode_literals
+
+import csv
+import io
+import multiprocessing
+import time
+from collections import deque
+from itertools import islice
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from ...sepa_countries import IBAN_SEPA_COUNTRIES
+from ...validators import IBANValidator
+
+
+# The validator of a worker process, set up by _init_worker.
+_worker_validator = None
+
+
+def _init_worker(use_nordea_extensions, include_countries):
+    global _worker_validator
+    _worker_validator = IBANValidator(use_nordea_extensions, include_countries)
+
+
+def _validate_chunk(values):
+    """ Validates a chunk of IBANs and returns the CSV rows for the results file with the number of invalid IBANs. """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    invalid = 0
+    for value, normalized, error_code in _worker_validator.validate_many(values):
+        if error_code is None:
+            error_code = ''
+        else:
+            invalid += 1
+        writer.writerow([value, normalized, error_code])
+    return output.getvalue(), len(values), invalid
+
+
+class Command(BaseCommand):
+    help = ('Validates the IBANs in a plain text file (one IBAN per line) or a CSV file and writes a CSV file with the '
+            'normalized value and error code of every IBAN.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='The file with the IBANs.')
+        parser.add_argument('-o', '--output',
+                            help='The results file. Defaults to the input file name with .results.csv appended.')
+        parser.add_argument('--csv', action='store_true', help='Read the input as a CSV file.')
+        parser.add_argument('--column', default='0',
+                            help='The CSV column with the IBANs, either a 0-based index or the name of a column in '
+                                 'the header row. Defaults to the first column.')
+        parser.add_argument('--use-nordea-extensions', action='store_true',
+                            help='Also accept the IBANs catalogued by Nordea.')
+        parser.add_argument('--include-countries',
+                            help='Comma separated list of country codes to accept, or "SEPA" for the SEPA countries.')
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                            help='Number of worker processes. Use 1 to validate in this process.')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+                            help='Number of IBANs sent to a worker at a time.')
+
+    def handle(self, *args, **options):
+        include_countries = options['include_countries']
+        if include_countries == 'SEPA':
+            include_countries = IBAN_SEPA_COUNTRIES
+        elif include_countries:
+            include_countries = tuple(code.strip().upper() for code in include_countries.split(','))
+        use_nordea_extensions = options['use_nordea_extensions']
+
+        try:
+            IBANValidator(use_nordea_extensions, include_countries)
+        except ImproperlyConfigured as e:
+            raise CommandError(e)
+
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+        if chunk_size < 1 or workers < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1.')
+
+        output = options['output'] or options['input'] + '.results.csv'
+        total = invalid = 0
+        start = time.time()
+        with io.open(options['input'], newline='') as input_file:
+            with io.open(output, 'w', newline='') as output_file:
+                writer = csv.writer(output_file)
+                writer.writerow(['iban', 'normalized', 'error'])
+
+                values = self.read_values(input_file, options['csv'], options['column'])
+                chunks = iter(lambda: list(islice(values, chunk_size)), [])
+                if workers == 1:
+                    _init_worker(use_nordea_extensions, include_countries)
+                    results = (_validate_chunk(chunk) for chunk in chunks)
+                    pool = None
+                else:
+                    pool = multiprocessing.Pool(workers, _init_worker, (use_nordea_extensions, include_countries))
+                    results = self.map_bounded(pool, chunks, workers * 2)
+
+                try:
+                    for rows, chunk_total, chunk_invalid in results:
+                        output_file.write(rows)
+                        total += chunk_total
+                        invalid += chunk_invalid
+                finally:
+                    if pool is not None:
+                        pool.terminate()
+                        pool.join()
+
+        elapsed = time.time() - start
+        self.stdout.write('Validated %d IBANs (%d invalid) in %.2f seconds, %.0f IBANs/second. Results written to %s.'
+                          % (total, invalid, elapsed, total / elapsed if elapsed else 0, output))
+
+    def read_values(self, input_file, is_csv, column):
+        """ Yields the IBANs of the input file one by one. """
+        if not is_csv:
+            for line in input_file:
+                line = line.strip()
+                if line:
+                    yield line
+            return
+
+        reader = csv.reader(input_file)
+        if column.isdigit():
+            index = int(column)
+        else:
+            header = next(reader, [])
+            if column not in header:
+                raise CommandError('Column %s is not in the CSV header.' % column)
+            index = header.index(column)
+        for row in reader:
+            if len(row) > index and row[index].strip():
+                yield row[index].strip()
+
+    def map_bounded(self, pool, chunks, max_pending):
+        """
+        Like ``pool.imap`` but never reads more than ``max_pending`` chunks ahead of the results, which keeps memory use
+        bounded for input files of any size. Results are yielded in input order.
+        """
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_validate_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
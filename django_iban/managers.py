@@ -0,0 +1,157 @@
+from __future__ import unicode_literals
+
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import models
+
+from .fields import IBANCountryCodeField, IBANField, SWIFTBICField
+from .validators import IBANValidator
+
+
+#: What to do with instances that have invalid IBAN or BIC values.
+ON_INVALID_RAISE = 'raise'
+ON_INVALID_DROP = 'drop'
+ON_INVALID_COLLECT = 'collect'
+
+
+class BulkValidationResult(object):
+    """
+    The result of ``IBANQuerySet.validated_bulk_create`` and ``validated_bulk_update``.
+
+    ``objs`` are the instances that were saved. ``invalid`` is a list of ``(instance, errors)`` tuples, where errors
+    maps field names to error codes; it is only filled when invalid instances are collected. ``batches`` has the size,
+    the number of invalid instances and the validation and database time in seconds of every batch.
+    """
+
+    def __init__(self):
+        self.objs = []
+        self.invalid = []
+        self.batches = []
+
+
+def _get_iban_validator(field):
+    for validator in field.validators:
+        if isinstance(validator, IBANValidator):
+            return validator
+    return IBANValidator()
+
+
+def validate_instances(model, objs):
+    """
+    Validates and normalizes the IBANField and SWIFTBICField values of model instances in one pass per field.
+
+    Valid values are replaced by their normalized form. Returns a dict that maps the index of every invalid instance to
+    a dict of field names to error codes.
+    """
+    errors = {}
+    for field in model._meta.concrete_fields:
+        if isinstance(field, IBANField):
+            values = []
+            indexes = []
+            for index, obj in enumerate(objs):
+                value = getattr(obj, field.attname)
+                if value in field.empty_values:
+                    if not field.blank:
+                        errors.setdefault(index, {})[field.name] = 'blank'
+                    continue
+                values.append(value)
+                indexes.append(index)
+
+            # All rows share the field's validator and its interned country rules.
+            results = _get_iban_validator(field).validate_many(values)
+            for index, (value, normalized, error_code) in zip(indexes, results):
+                if error_code is None:
+                    setattr(objs[index], field.attname, field.to_python(normalized))
+                else:
+                    errors.setdefault(index, {})[field.name] = error_code
+
+        elif isinstance(field, SWIFTBICField):
+            for index, obj in enumerate(objs):
+                value = getattr(obj, field.attname)
+                if value in field.empty_values and field.blank:
+                    continue
+                try:
+                    setattr(obj, field.attname, field.clean(value, obj))
+                except ValidationError as e:
+                    # Field.clean collects the errors of the validators in a list.
+                    errors.setdefault(index, {})[field.name] = e.error_list[0].code or 'invalid'
+
+    # The country codes are set after all IBANs have been normalized.
+    for field in model._meta.concrete_fields:
+        if isinstance(field, IBANCountryCodeField):
+            for obj in objs:
+                field.pre_save(obj, False)
+    return errors
+
+
+class IBANQuerySet(models.QuerySet):
+    """
+    A QuerySet with bulk operations that validate and normalize the IBANField and SWIFTBICField values first.
+
+    ``on_invalid`` decides what happens with invalid instances: ``'raise'`` raises a ValidationError for the first
+    invalid instance before anything is saved, ``'drop'`` skips them and ``'collect'`` skips them and returns them in
+    ``BulkValidationResult.invalid``.
+
+    Example:
+
+    .. code-block:: python
+
+        class Payment(models.Model):
+            iban = IBANField()
+
+            objects = IBANQuerySet.as_manager()
+
+        result = Payment.objects.validated_bulk_create(payments, on_invalid='collect', batch_size=1000)
+    """
+
+    def validated_bulk_create(self, objs, on_invalid=ON_INVALID_RAISE, batch_size=None, **kwargs):
+        return self._validated_bulk(objs, on_invalid, batch_size,
+                                    lambda batch: self.bulk_create(batch, **kwargs))
+
+    def validated_bulk_update(self, objs, fields, on_invalid=ON_INVALID_RAISE, batch_size=None):
+        # bulk_update doesn't call pre_save, the country codes of the updated IBANs are added to the updated fields.
+        fields = list(fields)
+        fields.extend(field.name for field in self.model._meta.concrete_fields
+                      if isinstance(field, IBANCountryCodeField) and field.iban_field in fields and
+                      field.name not in fields)
+
+        def update(batch):
+            self.bulk_update(batch, fields)
+            return batch
+        return self._validated_bulk(objs, on_invalid, batch_size, update)
+
+    def _validated_bulk(self, objs, on_invalid, batch_size, save):
+        if on_invalid not in (ON_INVALID_RAISE, ON_INVALID_DROP, ON_INVALID_COLLECT):
+            raise ValueError('on_invalid must be one of raise, drop or collect, not %r.' % on_invalid)
+        objs = list(objs)
+        batch_size = batch_size or len(objs) or 1
+        result = BulkValidationResult()
+
+        batches = []
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            validation_start = time.time()
+            errors = validate_instances(self.model, batch)
+            batches.append((batch, errors, time.time() - validation_start))
+            if errors and on_invalid == ON_INVALID_RAISE:
+                # Run the field validation again to get the messages of the first invalid instance.
+                obj_errors = errors[min(errors)]
+                batch[min(errors)].clean_fields(exclude=[field.name for field in self.model._meta.concrete_fields
+                                                         if field.name not in obj_errors])
+                raise ValidationError(obj_errors)
+
+        for batch, errors, validation_time in batches:
+            valid = [obj for index, obj in enumerate(batch) if index not in errors]
+            if on_invalid == ON_INVALID_COLLECT:
+                result.invalid.extend((batch[index], errors[index]) for index in sorted(errors))
+            save_start = time.time()
+            if valid:
+                result.objs.extend(save(valid))
+            result.batches.append({
+                'size': len(batch),
+                'invalid': len(errors),
+                'validation_seconds': validation_time,
+                'save_seconds': time.time() - save_start,
+            })
+        return result
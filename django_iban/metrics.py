@@ -0,0 +1,150 @@
+"""
+Opt-in metrics of IBAN and BIC validation.
+
+Set ``IBAN_VALIDATION_METRICS = True`` to count the validations by kind (``'iban'`` or ``'bic'``), country code
+(``'invalid'`` for unknown country codes) and result (``'valid'`` or the error code) and to record latency histograms
+of the validators and of the ``clean`` methods of the model and form fields. When the setting is off, the validators
+and fields only check that the metrics are disabled.
+
+Every measurement is also sent with the ``validation_measured`` signal, so exporters can subscribe to it:
+
+.. code-block:: python
+
+    from django_iban.metrics import validation_measured
+
+    def export(sender, kind, operation, country_code, result, duration, **kwargs):
+        if result is not None:
+            VALIDATIONS.labels(kind, country_code, result).inc()   # e.g. a prometheus_client Counter
+        LATENCY.labels(kind, operation).observe(duration)
+
+    validation_measured.connect(export)
+
+``get_validation_metrics().counters()`` and ``histograms()`` return the collected data.
+"""
+from __future__ import unicode_literals
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.dispatch import Signal
+
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    try:
+        from django.test.signals import setting_changed
+    except ImportError:
+        setting_changed = None
+
+
+#: Sent for every measurement with the ``kind``, ``operation``, ``country_code``, ``result`` and ``duration`` (in
+#: seconds) arguments. ``country_code`` and ``result`` are None for the latency of the field ``clean`` methods.
+validation_measured = Signal()
+
+#: Upper bounds in seconds of the latency histogram buckets, the last bucket has no upper bound.
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2)
+
+RESULT_VALID = 'valid'
+
+#: Country code of the values that don't start with a known country code, so that arbitrary input doesn't create a
+#: counter (and exporter label) per distinct prefix.
+COUNTRY_INVALID = 'invalid'
+
+now = time.perf_counter
+
+
+class ValidationMetrics(object):
+    """ Thread safe validation counters and latency histograms. """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record_validation(self, kind, country_code, error_code, duration):
+        """ Records the result of one validation by a validator. """
+        result = RESULT_VALID if error_code is None else error_code
+        with self._lock:
+            key = (kind, country_code, result)
+            self._counters[key] = self._counters.get(key, 0) + 1
+            self._observe((kind, 'validator'), duration)
+        if validation_measured.receivers:
+            validation_measured.send(sender=ValidationMetrics, kind=kind, operation='validator',
+                                     country_code=country_code, result=result, duration=duration)
+
+    def record_latency(self, kind, operation, duration):
+        """ Records the duration of an operation, e.g. ``'model_field'`` for ``IBANField.clean``. """
+        with self._lock:
+            self._observe((kind, operation), duration)
+        if validation_measured.receivers:
+            validation_measured.send(sender=ValidationMetrics, kind=kind, operation=operation, country_code=None,
+                                     result=None, duration=duration)
+
+    @contextmanager
+    def timer(self, kind, operation):
+        """ Records the latency of the ``with`` block, also when it raises. """
+        start = now()
+        try:
+            yield
+        finally:
+            self.record_latency(kind, operation, now() - start)
+
+    def _observe(self, key, duration):
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        histogram[0][bisect_left(self.buckets, duration)] += 1
+        histogram[1] += duration
+
+    def counters(self):
+        """ Returns a dict of ``(kind, country_code, result)`` to the number of validations. """
+        with self._lock:
+            return dict(self._counters)
+
+    def histograms(self):
+        """
+        Returns a dict of ``(kind, operation)`` to a dict with the cumulative ``buckets`` as a list of ``(upper
+        bound, count)`` tuples (the last bound is infinity), the total ``count`` and the ``sum`` of the durations.
+        """
+        result = {}
+        with self._lock:
+            for key, (counts, total) in self._histograms.items():
+                buckets = []
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    buckets.append((bound, cumulative))
+                result[key] = {'buckets': buckets, 'count': cumulative, 'sum': total}
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+_validation_metrics = None
+_configured = False
+
+
+def get_validation_metrics():
+    """ Returns the ValidationMetrics, or None if ``IBAN_VALIDATION_METRICS`` is not enabled in the settings. """
+    global _validation_metrics, _configured
+    if not _configured:
+        _validation_metrics = ValidationMetrics() if getattr(settings, 'IBAN_VALIDATION_METRICS', False) else None
+        _configured = True
+    return _validation_metrics
+
+
+def _reset_validation_metrics(**kwargs):
+    global _configured
+    if kwargs['setting'] == 'IBAN_VALIDATION_METRICS':
+        _configured = False
+
+
+if setting_changed is not None:
+    setting_changed.connect(_reset_validation_metrics)
@@ -0,0 +1,28 @@
+from __future__ import unicode_literals
+
+from django.db.migrations.operations.base import Operation
+
+from .db import postgresql_drop_function_sql, postgresql_function_sql
+
+
+class CreateIBANFunctions(Operation):
+    """
+    Creates the IBAN SQL functions of ``django_iban.db`` on PostgreSQL. On SQLite they are registered on every
+    connection, so this does nothing.
+    """
+    reversible = True
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            # Without params the SQL isn't %-interpolated, the function body contains % operators.
+            schema_editor.execute(postgresql_function_sql(), params=None)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(postgresql_drop_function_sql(), params=None)
+
+    def describe(self):
+        return 'Creates the IBAN SQL functions'
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Versioned snapshots of the country rules that decide whether an IBAN is valid.
+
+A ``CountryRuleSet`` holds the IBAN lengths (``IBAN_COUNTRY_CODE_LENGTH`` and ``NORDEA_COUNTRY_CODE_LENGTH``), the BBAN
+formats and ``IBAN_SEPA_COUNTRIES``. Its ``version`` is a digest of these rules, so a rule set saved with ``to_dict``
+can be compared with the rules of a later django-iban release. ``diff`` returns the country codes whose rules changed,
+only the stored IBANs of these countries can have become valid or invalid.
+
+.. code-block:: python
+
+    previous = CountryRuleSet.from_dict(json.load(f))
+    changed_countries = previous.diff(get_current_rule_set())
+
+The ``revalidate_ibans`` management command uses this to revalidate the IBANs of a model field after an upgrade.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import json
+
+from .bban import IBAN_BBAN_FORMATS, NORDEA_BBAN_FORMATS
+from .sepa_countries import IBAN_SEPA_COUNTRIES
+from .validators import IBAN_COUNTRY_CODE_LENGTH, NORDEA_COUNTRY_CODE_LENGTH
+
+
+class CountryRuleSet(object):
+    """
+    A version of the country rules.
+
+    ``lengths`` and ``nordea_lengths`` map country codes to the IBAN length, ``formats`` maps country codes to the
+    BBAN character classes (e.g. ``'4a,10n'``) and ``sepa_countries`` is a frozenset of country codes.
+    """
+
+    def __init__(self, lengths, nordea_lengths, formats, sepa_countries):
+        self.lengths = dict(lengths)
+        self.nordea_lengths = dict(nordea_lengths)
+        self.formats = dict(formats)
+        self.sepa_countries = frozenset(sepa_countries)
+        content = json.dumps(self._content(), sort_keys=True)
+        self.version = hashlib.blake2b(content.encode('ascii'), digest_size=8).hexdigest()
+
+    def _content(self):
+        return {
+            'lengths': dict(self.lengths),
+            'nordea_lengths': dict(self.nordea_lengths),
+            'formats': dict(self.formats),
+            'sepa_countries': sorted(self.sepa_countries),
+        }
+
+    def to_dict(self):
+        """ Returns the rules and the version as a JSON serializable dictionary. """
+        data = self._content()
+        data['version'] = self.version
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Returns the rule set of a ``to_dict`` dictionary. Raises ValueError if the version doesn't match. """
+        rule_set = cls(data['lengths'], data['nordea_lengths'], data['formats'], data['sepa_countries'])
+        if data.get('version', rule_set.version) != rule_set.version:
+            raise ValueError('The country rules of version %s have been modified.' % data['version'])
+        return rule_set
+
+    def diff(self, other):
+        """ Returns a frozenset of the country codes with different rules in this rule set and ``other``. """
+        changed = set(self.sepa_countries ^ other.sepa_countries)
+        for mine, theirs in ((self.lengths, other.lengths), (self.nordea_lengths, other.nordea_lengths),
+                             (self.formats, other.formats)):
+            changed.update(country_code for country_code in set(mine) | set(theirs)
+                           if mine.get(country_code) != theirs.get(country_code))
+        return frozenset(changed)
+
+    def __eq__(self, other):
+        return isinstance(other, CountryRuleSet) and self.version == other.version
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.version)
+
+    def __repr__(self):
+        return '<CountryRuleSet: %s>' % self.version
+
+
+_current_rule_set = None
+
+
+def get_current_rule_set():
+    """ Returns the CountryRuleSet of the rules in this version of django-iban. """
+    global _current_rule_set
+    if _current_rule_set is None:
+        formats = dict((country_code, format)
+                       for bban_formats in (IBAN_BBAN_FORMATS, NORDEA_BBAN_FORMATS)
+                       for country_code, (format, layout) in bban_formats.items())
+        _current_rule_set = CountryRuleSet(IBAN_COUNTRY_CODE_LENGTH, NORDEA_COUNTRY_CODE_LENGTH, formats,
+                                           IBAN_SEPA_COUNTRIES)
+    return _current_rule_set
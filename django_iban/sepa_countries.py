@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
+from .countries import CountrySet
 
 #: European Payments Council list of SEPA scheme countries as of 23 Jan 2014.
 #: http://www.europeanpaymentscouncil.eu/index.cfm/knowledge-bank/epc-documents/epc-list-of-sepa-scheme-countries/
-IBAN_SEPA_COUNTRIES = (
+IBAN_SEPA_COUNTRIES = CountrySet((
     'AT',  # Austria
     'BE',  # Belgium
     'BG',  # Bulgaria
-    'ES',  # Canary Islands
     'HR',  # Croatia
     'CH',  # Switzerland
     'CY',  # Cyprus
@@ -14,7 +14,7 @@ IBAN_SEPA_COUNTRIES = (
     'DE',  # Germany
     'DK',  # Denmark
     'EE',  # Estonia
-    'ES',  # Spain
+    'ES',  # Spain + Canary Islands
     'FI',  # Finland + Åland Islands
     'FR',  # France +  French Guiana, Guadeloupe, Martinique, Mayotte, Réunion, Saint Barthélemy,
            #           Saint Martin (French part), Saint Pierre and Miquelon
@@ -41,4 +41,4 @@ IBAN_SEPA_COUNTRIES = (
     'SI',  # Slovenia
     'SK',  # Slovakia
     'SM',  # San Marino
-)
+))
@@ -1,12 +1,61 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import asyncio
+import csv
+import io
+import json
+import mmap
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import skipUnless
+
+from django import forms
 from django.core.exceptions import ValidationError, ImproperlyConfigured
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, models, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import translation
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-from .fields import IBANField, SWIFTBICField
+from .async_validation import avalidate, avalidate_many
+from .bic_directory import BIC_NOT_IN_DIRECTORY, BICDirectory, bic_exists_validator, build_bic_index, get_bic_directory
+from .bban import BBAN_STRUCTURES, get_bban_structure, get_iban_format
+from . import cache as validation_cache
+from .cache import (BIC_NAMESPACE, DjangoValidationCache, SharedMemoryValidationCache, ValidationCache,
+                    get_validation_cache)
+from .checksum import check_digits, is_valid_checksum, mod97
+from .countries import CountrySet
+from .db import (IsValidIBAN, check_constraint_sql, is_valid_stored_iban, postgresql_drop_function_sql,
+                 postgresql_function_sql)
+from .extraction import extract_ibans
+from .fields import IBANCountryCodeField, IBANField, SWIFTBICField
 from .forms import IBANFormField, SWIFTBICFormField
-from .validators import IBANValidator, swift_bic_validator
+from .generator import ERROR_TYPES, IBANGenerator, read_corpus, write_corpus
+from .iban import IBAN
+from .lookups import IBANBankCode, IBANCountry
+from .managers import IBANQuerySet
+from .metrics import COUNTRY_INVALID, get_validation_metrics, validation_measured
+from .operations import CreateIBANFunctions
+from . import rules as country_rules
+from .rules import CountryRuleSet, get_current_rule_set
+from .sepa_countries import IBAN_SEPA_COUNTRIES
+from .validators import (IBANCountryRules, IBANValidator, NormalizedIBAN, _format_iban, _get_bic_namespace,
+                         format_iban, iban_rules_registry, normalize_iban, swift_bic_validator, IBAN_ERROR_MESSAGES,
+                         BIC_INVALID_COUNTRY_CODE, BIC_INVALID_INSTITUTION_CODE, BIC_INVALID_LENGTH,
+                         IBAN_COUNTRY_CODE_LENGTH, IBAN_COUNTRY_NOT_ALLOWED, IBAN_INVALID_CHARACTER, IBAN_MIN_LENGTH,
+                         IBAN_INVALID_CHECKSUM, IBAN_INVALID_COUNTRY, IBAN_INVALID_FORMAT, IBAN_INVALID_LENGTH,
+                         NORDEA_COUNTRY_CODE_LENGTH)
 
 
 class IBANTests(TestCase):
@@ -41,6 +90,29 @@ class IBANTests(TestCase):
         for iban in invalid:
             self.assertRaisesMessage(ValidationError,  invalid[iban], IBANValidator(), iban)
 
+    def test_validate_many(self):
+        values = [
+            'GB82 WEST 1234 5698 7654 32',
+            'GB82WEST1234569876543',
+            'CA34CIBC123425345',
+            'GB29ÉWBK60161331926819',
+            'SA0380000000608019167519',
+            None,
+        ]
+        results = list(IBANValidator().validate_many(values))
+        self.assertEqual(results, [
+            ('GB82 WEST 1234 5698 7654 32', 'GB82WEST12345698765432', None),
+            ('GB82WEST1234569876543', 'GB82WEST1234569876543', IBAN_INVALID_LENGTH),
+            ('CA34CIBC123425345', 'CA34CIBC123425345', IBAN_INVALID_COUNTRY),
+            ('GB29ÉWBK60161331926819', 'GB29ÉWBK60161331926819', IBAN_INVALID_CHARACTER),
+            ('SA0380000000608019167519', 'SA0380000000608019167519', IBAN_INVALID_CHECKSUM),
+            (None, None, None),
+        ])
+
+        # The include_countries rules are applied just like in __call__.
+        results = list(IBANValidator(include_countries=('NL',)).validate_many(['GB82WEST12345698765432']))
+        self.assertEqual(results, [('GB82WEST12345698765432', 'GB82WEST12345698765432', IBAN_COUNTRY_NOT_ALLOWED)])
+
     def test_iban_fields(self):
         """ Test the IBAN model and form field. """
         valid = {
@@ -96,6 +168,178 @@ class IBANTests(TestCase):
             errors.reverse()
             self.assertEqual(context_manager.exception.messages, errors)
 
+    def test_rules_registry(self):
+        """ Validators with the same configuration share their country rules. """
+        iban_rules_registry.clear()
+        first = IBANValidator(include_countries=('NL', 'BE'))
+        second = IBANValidator(include_countries=['BE', 'NL'])
+        third = IBANValidator(use_nordea_extensions=True, include_countries=('NL', 'BE'))
+        self.assertIs(first.rules, second.rules)
+        self.assertIsNot(first.rules, third.rules)
+        self.assertEqual(iban_rules_registry.stats(), {'hits': 1, 'misses': 2, 'size': 2})
+        self.assertEqual(first.include_countries, frozenset(['NL', 'BE']))
+        self.assertIn('EG', third.validation_countries)
+        self.assertNotIn('EG', first.validation_countries)
+
+        self.assertRaises(AttributeError, setattr, first.rules, 'include_countries', None)
+        with self.assertRaises(TypeError):
+            first.validation_countries['XX'] = 18
+        self.assertEqual(pickle.loads(pickle.dumps(first)).validation_countries, first.validation_countries)
+
+        # IBANField and IBANFormField validators use the shared rules too.
+        self.assertIs(IBANField(include_countries=('BE', 'NL')).validators[-1].rules, first.rules)
+        self.assertIs(IBANFormField(include_countries=('BE', 'NL')).validators[0].rules, first.rules)
+
+    def test_country_set(self):
+        self.assertEqual(len(IBAN_SEPA_COUNTRIES), 35)
+        self.assertIn('ES', IBAN_SEPA_COUNTRIES)
+        self.assertEqual(CountrySet(['NL', 'BE', 'NL']), frozenset(['NL', 'BE']))
+        self.assertIs(CountrySet(IBAN_SEPA_COUNTRIES), IBAN_SEPA_COUNTRIES)
+        self.assertEqual(repr(CountrySet(['NL', 'BE'])), "CountrySet(['BE', 'NL'])")
+        for value in (['nl'], ['NLD'], ['N1'], [None]):
+            self.assertRaises(ValueError, CountrySet, value)
+
+        # Set operations return CountrySets.
+        without_gb = IBAN_SEPA_COUNTRIES - {'GB'}
+        self.assertIsInstance(without_gb, CountrySet)
+        self.assertEqual(len(without_gb), 34)
+        self.assertIsInstance(IBAN_SEPA_COUNTRIES & CountrySet(['NL', 'US']), CountrySet)
+        self.assertIsInstance(IBAN_SEPA_COUNTRIES | {'AD'}, CountrySet)
+        self.assertIsInstance(frozenset(['NL', 'US']) - IBAN_SEPA_COUNTRIES, CountrySet)
+        self.assertEqual(IBAN_SEPA_COUNTRIES.union(['AD'], ['TR']) - IBAN_SEPA_COUNTRIES, CountrySet(['AD', 'TR']))
+        self.assertRaises(ValueError, IBAN_SEPA_COUNTRIES.union, ['us'])
+        self.assertEqual(pickle.loads(pickle.dumps(without_gb)), without_gb)
+
+        # The fields and the validators share the CountrySet of the rules.
+        validator = IBANValidator(include_countries=without_gb)
+        self.assertIs(validator.include_countries, without_gb)
+        field = IBANField(include_countries=sorted(without_gb))
+        self.assertIs(field.include_countries, validator.include_countries)
+        self.assertIs(IBANFormField(include_countries=list(without_gb)).validators[0].include_countries, without_gb)
+        self.assertRaisesMessage(ValidationError, 'GB IBANs are not allowed in this field.', validator,
+                                 'GB82WEST12345698765432')
+        self.assertRaises(ImproperlyConfigured, IBANValidator, include_countries=('nl',))
+
+    def test_lazy_imports(self):
+        """ Importing the fields doesn't import django_countries, the test framework or build the BBAN structures. """
+        self.assertEqual(IBAN_MIN_LENGTH, min(IBAN_COUNTRY_CODE_LENGTH.values()))
+        code = ('import sys, django_iban.fields, django_iban.bban; '
+                'print(" ".join(str(name in sys.modules) for name in ("django_countries", "django.test"))); '
+                'print(django_iban.bban._bban_structures)')
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(output.decode().split(), ['False', 'False', 'None'])
+
+    def test_validation_cache(self):
+        self.assertIsNone(get_validation_cache())
+
+        with self.settings(IBAN_VALIDATION_CACHE_SIZE=2):
+            cache = get_validation_cache()
+            validator = IBANValidator()
+            validator('NL91 ABNA 0417 1643 00')
+            validator('nl91abna0417164300')
+            for i in range(2):
+                self.assertRaisesMessage(ValidationError, 'Not a valid IBAN.', validator, 'NL91ABNB0417164300')
+            self.assertEqual(cache.get((validator.rules, 'NL91ABNB0417164300')),
+                             ('NL91ABNB0417164300', IBAN_INVALID_CHECKSUM, None))
+
+            # A different configuration does not share the cached results.
+            IBANValidator(include_countries=('NL',))('NL91ABNA0417164300')
+
+            stats = cache.stats()
+            self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['size']), (3, 3, 1, 2))
+            self.assertEqual(stats['hit_rate'], 0.5)
+
+        self.assertIsNone(get_validation_cache())
+
+    def test_validation_cache_ttl(self):
+        cache = ValidationCache(10, ttl=-1)
+        cache.set('key', 'result')
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_normalize_iban(self):
+        normalized = normalize_iban('nl91 abna-0417 1643 00')
+        self.assertEqual(normalized, 'NL91ABNA0417164300')
+        self.assertIs(type(normalized), NormalizedIBAN)
+        self.assertIs(normalize_iban(normalized), normalized)
+
+        self.assertIs(type(IBANFormField().clean('NL91 ABNA 0417 1643 00')), NormalizedIBAN)
+        self.assertIs(type(IBANField().clean('NL91 ABNA 0417 1643 00', None)), NormalizedIBAN)
+
+        # The database gets a plain string.
+        prep_value = IBANField().get_prep_value(normalized)
+        self.assertEqual(prep_value, 'NL91ABNA0417164300')
+        self.assertIs(type(prep_value), str)
+        self.assertIsNone(IBANField().get_prep_value(None))
+
+    def test_precheck(self):
+        validator = IBANValidator(include_countries=('NL', 'GB', 'GR'))
+        self.assertIsNone(validator.precheck('NL91 ABNA 0417 1643 00'))
+        # The checksum is not part of the precheck.
+        self.assertIsNone(validator.precheck('NL91ABNB0417164300'))
+
+        rejects = {
+            'CA34CIBC123425345': IBAN_INVALID_COUNTRY,
+            'NL91ABNA041716430': IBAN_INVALID_LENGTH,
+            'BE68539007547034': IBAN_COUNTRY_NOT_ALLOWED,
+            'BE6853900754703X': IBAN_COUNTRY_NOT_ALLOWED,
+            'NL91ABNA04171643_0': IBAN_INVALID_CHARACTER,
+            'GB29ÉWBK60161331926819': IBAN_INVALID_CHARACTER,
+            'NL01ABNA0417164300': IBAN_INVALID_CHECKSUM,
+            'NL99ABNA0417164300': IBAN_INVALID_CHECKSUM,
+            'NLX1ABNA0417164300': IBAN_INVALID_CHECKSUM,
+            'NL91ABN10417164300': IBAN_INVALID_FORMAT,
+            'NL91ABNA04171643O0': IBAN_INVALID_FORMAT,
+            'GB82WEST1234569876543Z': IBAN_INVALID_FORMAT,
+            'GR16-0110-1250-0000-0001-2300-6950': IBAN_INVALID_LENGTH,
+        }
+        for iban, error_code in rejects.items():
+            self.assertEqual(validator.precheck(iban), error_code, iban)
+            # The full validator reports the same error.
+            self.assertEqual(validator.check(iban)[1], error_code, iban)
+
+        self.assertRaisesMessage(ValidationError, 'Not a valid IBAN.', validator, 'NL91ABN10417164300')
+
+    def test_error_codes(self):
+        """ The ValidationErrors have the error code and the values of the message as params. """
+        validator = IBANValidator(include_countries=('NL', 'DE'))
+        errors = {
+            'NL91ABNA041716430': (IBAN_INVALID_LENGTH, {'country_code': 'NL', 'number': 18}),
+            'XX91ABNA0417164300': (IBAN_INVALID_COUNTRY, {'country_code': 'XX'}),
+            'GB82WEST12345698765432': (IBAN_COUNTRY_NOT_ALLOWED, {'country_code': 'GB'}),
+            'NL91ABNA04171643!0': (IBAN_INVALID_CHARACTER, {'character': '!'}),
+            'NL92ABNA0417164300': (IBAN_INVALID_CHECKSUM, None),
+        }
+        for iban, (error_code, params) in errors.items():
+            with self.assertRaises(ValidationError) as context_manager:
+                validator(iban)
+            error = context_manager.exception
+            self.assertEqual((error.code, error.params), (error_code, params), iban)
+            # The message is formatted when it is read.
+            self.assertIs(error.message, IBAN_ERROR_MESSAGES[error_code])
+            self.assertEqual(error.messages, [IBAN_ERROR_MESSAGES[error_code] % (params or {})])
+            self.assertEqual(validator.check(iban)[1], error_code)
+
+        with self.assertRaises(ValidationError) as context_manager:
+            swift_bic_validator('DEUTXXFF')
+        error = context_manager.exception
+        self.assertEqual((error.code, error.params), (BIC_INVALID_COUNTRY_CODE, {'country_code': 'XX'}))
+
+        # The messages are translated when they are rendered, the form errors have the codes.
+        with translation.override('de'):
+            self.assertEqual(error.messages, ['XX ist kein gültiger SWIFT-BIC Ländercode.'])
+            form_field = IBANFormField(include_countries=('NL', 'DE'))
+            self.assertRaisesMessage(ValidationError, 'GB IBANs werden nicht unterstützt.', form_field.clean,
+                                     'GB82WEST12345698765432')
+        form_class = type(str('PaymentForm'), (forms.Form,), {'iban': IBANFormField(), 'bic': SWIFTBICFormField()})
+        form = form_class({'iban': 'NL92ABNA0417164300', 'bic': 'D3UTDEFF'})
+        self.assertEqual(form.errors.get_json_data(), {
+            'iban': [{'message': 'Not a valid IBAN.', 'code': IBAN_INVALID_CHECKSUM}],
+            'bic': [{'message': 'D3UT is not a valid SWIFT-BIC Institution Code.',
+                     'code': BIC_INVALID_INSTITUTION_CODE}],
+        })
+
     def test_nordea_extensions(self):
         """ Test a valid IBAN in the Nordea extensions. """
         iban_validator = IBANValidator(use_nordea_extensions=True)
@@ -108,6 +352,20 @@ class IBANTests(TestCase):
         self.assertEqual(iban_form_field.prepare_value('NL02 ABNA 0123 4567 89'), 'NL02 ABNA 0123 4567 89')
         self.assertIsNone(iban_form_field.prepare_value(None))
 
+        # The form field, IBAN objects and format_iban share the cached display format.
+        self.assertEqual(format_iban('nl91-abna-0417-1643-00'), 'NL91 ABNA 0417 1643 00')
+        self.assertEqual(format_iban('MT84MALT011000012345MTLCAST001S'), 'MT84 MALT 0110 0001 2345 MTLC AST0 01S')
+        self.assertEqual(IBAN('NL91ABNA0417164300').formatted, 'NL91 ABNA 0417 1643 00')
+        hits = _format_iban.cache_info().hits
+        self.assertEqual(iban_form_field.prepare_value(IBAN('NL91 ABNA 0417 1643 00')), 'NL91 ABNA 0417 1643 00')
+        self.assertEqual(_format_iban.cache_info().hits, hits + 1)
+
+        # Values that are too long to be IBANs are formatted without the cache.
+        currsize = _format_iban.cache_info().currsize
+        self.assertEqual(format_iban('nl' * 35), ' '.join(['NLNL'] * 17 + ['NL']))
+        self.assertEqual(format_iban('NL91 ABNA 0417 1643 00' + ' ' * 47), 'NL91 ABNA 0417 1643 00')
+        self.assertEqual(_format_iban.cache_info().currsize, currsize)
+
     def test_include_countries(self):
         """ Test the IBAN model and form include_countries feature. """
         include_countries = ('NL', 'BE', 'LU')
@@ -151,6 +409,992 @@ class IBANTests(TestCase):
 
 
 
+class SharedValidationCacheTests(TestCase):
+    def setUp(self):
+        self.name = 'django_iban_test_%d' % os.getpid()
+        self.cache = SharedMemoryValidationCache(self.name, 8)
+        self.addCleanup(self.cache.unlink)
+        self.addCleanup(self.cache.close)
+        self.rules = IBANValidator().rules
+
+    def set_clock(self, seconds):
+        self.addCleanup(setattr, validation_cache, '_wall_clock', validation_cache._wall_clock)
+        validation_cache._wall_clock = lambda: seconds
+
+    def test_shared_memory(self):
+        results = [('NL91ABNA0417164300', None, None),
+                   ('NL91ABNA041716430', IBAN_INVALID_LENGTH, 18),
+                   ('12345', IBAN_INVALID_COUNTRY, '12'),
+                   ('NL91ABNA04171643Z0', IBAN_INVALID_FORMAT, None)]
+        for result in results:
+            self.cache.set((self.rules, result[0]), result)
+        # Only ASCII alphanumeric values are stored.
+        self.cache.set((self.rules, 'NL91ABNA04171643Ä0'), ('NL91ABNA04171643Ä0', IBAN_INVALID_CHARACTER, 'Ä'))
+        self.assertIsNone(self.cache.get((self.rules, 'NL91ABNA04171643Ä0')))
+        self.cache.set((BIC_NAMESPACE, 'DEUTDEF'), ('DEUTDEF', BIC_INVALID_LENGTH, None))
+
+        other = SharedMemoryValidationCache(self.name, 100)
+        self.addCleanup(other.close)
+        self.assertEqual(other.maxsize, 8)
+        for result in results:
+            self.assertEqual(other.get((self.rules, result[0])), result)
+        self.assertEqual(other.get((BIC_NAMESPACE, 'DEUTDEF')), ('DEUTDEF', BIC_INVALID_LENGTH, None))
+        # Another configuration has other keys.
+        self.assertIsNone(other.get((IBANValidator(include_countries=('NL',)).rules, 'NL91ABNA0417164300')))
+        self.assertEqual(other.stats()['size'], 5)
+
+        # Other processes see the entries too.
+        code = ('from django_iban.cache import SharedMemoryValidationCache; '
+                'from django_iban.validators import IBANValidator; '
+                'cache = SharedMemoryValidationCache(%r, 8); '
+                'print(cache.get((IBANValidator().rules, "NL91ABNA041716430"))); cache.close()' % self.name)
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                         env=dict(os.environ, DJANGO_SETTINGS_MODULE='testsettings'))
+        self.assertEqual(output.decode().strip(), "('NL91ABNA041716430', 'invalid_length', 18)")
+
+        # Entries that are being written are missing.
+        offset = self.cache._set_offset(self.cache._entry_key((self.rules, 'NL91ABNA0417164300')))
+        for offset in range(offset, offset + 4 * 80, 80):
+            self.cache._buf[offset + 60] ^= 0xff
+        self.assertIsNone(self.cache.get((self.rules, 'NL91ABNA0417164300')))
+
+        self.cache.clear()
+        self.assertEqual(other.stats()['size'], 0)
+
+    def test_eviction_and_ttl(self):
+        cache = SharedMemoryValidationCache(self.name + '_small', 4, ttl=10)
+        self.addCleanup(cache.unlink)
+        self.addCleanup(cache.close)
+        keys = [(self.rules, 'NL%02dABNA0417164300' % i) for i in range(5)]
+        for i, key in enumerate(keys[:4]):
+            self.set_clock(100 + i)
+            cache.set(key, (key[1], None, None))
+        self.set_clock(104)
+        self.assertIsNotNone(cache.get(keys[0]))
+
+        # The least recently used entry is replaced.
+        cache.set(keys[4], (keys[4][1], None, None))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual([cache.get(key) is not None for key in keys], [True, False, True, True, True])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        self.set_clock(112)
+        self.assertEqual([cache.get(key) is not None for key in keys], [False, False, False, True, True])
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_validators(self):
+        with self.settings(IBAN_VALIDATION_CACHE_BACKEND='shared_memory', IBAN_VALIDATION_CACHE_SIZE=100,
+                           IBAN_VALIDATION_CACHE_NAME=self.name):
+            cache = get_validation_cache()
+            self.addCleanup(cache.close)
+            self.assertIsInstance(cache, SharedMemoryValidationCache)
+            self.assertEqual(cache.maxsize, 8)
+            for i in range(2):
+                IBANValidator()('NL91ABNA0417164300')
+                self.assertRaisesMessage(ValidationError, 'NL IBANs must contain 18 characters.',
+                                         IBANValidator(), 'NL91ABNA041716430')
+                self.assertRaisesMessage(ValidationError, 'DE1T is not a valid SWIFT-BIC Institution Code.',
+                                         swift_bic_validator, 'DE1TDEFF')
+            self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (3, 3))
+
+    @override_settings(IBAN_VALIDATION_CACHE_BACKEND='django',
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                               'validation': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                              'LOCATION': 'django_iban_tests'}})
+    def test_django_cache(self):
+        self.assertIsInstance(get_validation_cache(), DjangoValidationCache)
+        with self.settings(IBAN_VALIDATION_CACHE_ALIAS='validation', IBAN_VALIDATION_CACHE_TTL=60):
+            cache = get_validation_cache()
+            self.assertEqual(cache.alias, 'validation')
+            for i in range(2):
+                self.assertRaisesMessage(ValidationError, 'Not a valid IBAN.', IBANValidator(), 'NL91ABNB0417164300')
+                self.assertRaisesMessage(ValidationError, 'XX is not a valid SWIFT-BIC Country Code.',
+                                         swift_bic_validator, 'DEUTXXFF')
+            self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (2, 2))
+            self.assertEqual(cache.get((IBANValidator().rules, 'NL91ABNB0417164300')),
+                             ('NL91ABNB0417164300', IBAN_INVALID_CHECKSUM, None))
+            # BIC results are keyed on a digest of the country codes.
+            self.assertIsNone(cache.get((BIC_NAMESPACE, 'DEUTXXFF')))
+            self.assertEqual(cache.get((_get_bic_namespace(), 'DEUTXXFF')),
+                             ('DEUTXXFF', BIC_INVALID_COUNTRY_CODE, None))
+
+        with self.settings(IBAN_VALIDATION_CACHE_ALIAS='missing'):
+            self.assertRaises(ImproperlyConfigured, get_validation_cache)
+        with self.settings(IBAN_VALIDATION_CACHE_BACKEND='redis'):
+            self.assertRaises(ImproperlyConfigured, get_validation_cache)
+
+
+class ChecksumTests(TestCase):
+    def test_mod97(self):
+        self.assertEqual(mod97('WEST12345698765432GB82'), 1)
+        self.assertEqual(mod97('0'), 0)
+        self.assertEqual(mod97('A'), 10)
+        self.assertEqual(mod97('Z'), 35)
+        for value in ['', 'GB82 WEST', 'GB82-WEST', 'gb82', 'GB29ÉWBK', '١٢٣', '1_000']:
+            self.assertIsNone(mod97(value))
+
+    def test_check_digits(self):
+        self.assertEqual(check_digits('GB', 'WEST12345698765432'), '82')
+        self.assertEqual(check_digits('NL', 'ABNA0417164300'), '91')
+        self.assertTrue(is_valid_checksum('NL91ABNA0417164300'))
+        self.assertFalse(is_valid_checksum('NL91ABNB0417164300'))
+        self.assertRaises(ValueError, check_digits, 'NL', 'ABNA 0417164300')
+
+
+@skipUnless(numpy, 'NumPy is not installed.')
+class VectorizedTests(TestCase):
+    def test_matches_scalar_validator(self):
+        from .vectorized import validate_array
+
+        values = [
+            'GB82WEST12345698765432',
+            'gb82 west 1234 5698 7654 32',
+            'GR16-0110-1250-0000-0001-2300-695',
+            'MU17BOMM0101101030300200000MUR',
+            'EG1100006001880800100014553',
+            'GB82WEST1234569876543',
+            'CA34CIBC123425345',
+            'GB29ÉWBK60161331926819',
+            'GB29NWBK6016133192681!',
+            'GB29NWBK6016133192681\x00',
+            'SA0380000000608019167519',
+            'NL91ABNB0417164300',
+            'NL00ABNA0417164300',
+            'NL99ABNA0417164300',
+            'NLA1ABNA0417164300',
+            'NL91ABN00417164300',
+            'NL91ABNA041716430A',
+            'GB',
+            'G',
+            '',
+            '- -',
+            None,
+        ]
+        for kwargs in [{}, {'use_nordea_extensions': True}, {'include_countries': ('NL', 'GR', 'MU')}]:
+            valid, error_codes = validate_array(values, **kwargs)
+            validator = IBANValidator(**kwargs)
+            expected = [validator.check(value)[1] if value is not None else None for value in values]
+            self.assertEqual(list(error_codes), expected)
+            self.assertEqual(list(valid), [code is None for code in expected])
+
+    def test_oversized_value(self):
+        """ A very long value doesn't make every row of the code point matrix as wide as itself. """
+        from . import vectorized
+
+        values = ['NL91ABNA0417164300', 'NL91' + 'A' * 20000, 'gb82 west 1234 5698 7654 32', 'GB82 ' * 2000]
+        to_code_points = vectorized._to_code_points
+        widths = []
+
+        def _to_code_points(values):
+            codes, non_ascii = to_code_points(values)
+            widths.append(codes.shape[1])
+            return codes, non_ascii
+
+        vectorized._to_code_points = _to_code_points
+        try:
+            valid, error_codes = vectorized.validate_array(values)
+        finally:
+            vectorized._to_code_points = to_code_points
+        self.assertEqual(list(error_codes), [None, IBAN_INVALID_LENGTH, None, IBAN_INVALID_LENGTH])
+        self.assertLessEqual(max(widths), vectorized._MAX_VECTORIZED_LENGTH)
+
+    def test_short_and_oversized_columns(self):
+        """ Columns without a value that fills the country code and check digits columns of the matrix. """
+        from .vectorized import validate_array
+
+        validator = IBANValidator()
+        for values in [[''], ['NL'], ['NL9'], ['NL9', 'G', '- -'], ['X' * 100], ['NL91' + 'A' * 100, 'GB82 ' * 20]]:
+            valid, error_codes = validate_array(values)
+            self.assertEqual(list(error_codes), [validator.check(value)[1] for value in values])
+            self.assertFalse(valid.any())
+
+    def test_blocks(self):
+        """ The column is converted to code point matrices one block of rows at a time. """
+        from . import vectorized
+
+        values = ['NL91ABNA0417164300', 'NL91ABNB0417164300', None, 'gb82 west 1234 5698 7654 32', 'GB'] * 5
+        expected = vectorized.validate_array(values)
+        block_size = vectorized.BLOCK_SIZE
+        to_code_points = vectorized._to_code_points
+        rows = []
+
+        def _to_code_points(values):
+            rows.append(len(values))
+            return to_code_points(values)
+
+        vectorized.BLOCK_SIZE = 4
+        vectorized._to_code_points = _to_code_points
+        try:
+            valid, error_codes = vectorized.validate_array(values)
+        finally:
+            vectorized.BLOCK_SIZE = block_size
+            vectorized._to_code_points = to_code_points
+        self.assertEqual(list(valid), list(expected[0]))
+        self.assertEqual(list(error_codes), list(expected[1]))
+        self.assertEqual(len(rows), 7)
+        self.assertLessEqual(max(rows), 4)
+
+    def test_missing_values(self):
+        """ NaN, as in pandas columns, is a missing value like None. Other objects are converted with str(). """
+        from .vectorized import validate_array
+
+        values = numpy.array([float('nan'), 'NL91ABNB0417164300', None, numpy.nan, IBAN('NL91ABNA0417164300'), 12],
+                             dtype=object)
+        valid, error_codes = validate_array(values)
+        self.assertEqual(list(valid), [True, False, True, True, True, False])
+        self.assertEqual(list(error_codes), [None, IBAN_INVALID_CHECKSUM, None, None, None, IBAN_INVALID_COUNTRY])
+        # The input isn't modified.
+        self.assertIsInstance(values[4], IBAN)
+
+        valid, error_codes = validate_array([float('nan')] * 3)
+        self.assertTrue(valid.all())
+
+    def test_numpy_input(self):
+        from .vectorized import validate_array
+
+        valid, error_codes = validate_array(numpy.array(['NL91ABNA0417164300', 'NL91ABNB0417164300']))
+        self.assertEqual(list(valid), [True, False])
+        self.assertEqual(list(error_codes), [None, IBAN_INVALID_CHECKSUM])
+
+        valid, error_codes = validate_array([])
+        self.assertEqual(len(valid), 0)
+
+
+class ValidateIBANsCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def run_command(self, content, *args, **options):
+        path = os.path.join(self.directory, 'ibans.txt')
+        with io.open(path, 'w') as input_file:
+            input_file.write(content)
+        stdout = io.StringIO()
+        call_command('validate_ibans', path, *args, stdout=stdout, **options)
+        with io.open(path + '.results.csv', newline='') as output_file:
+            return list(csv.reader(output_file)), stdout.getvalue()
+
+    def test_plain_text(self):
+        content = 'GB82 WEST 1234 5698 7654 32\nCA34CIBC123425345\n\nEG1100006001880800100014553\n'
+        for workers in (1, 2):
+            rows, stdout = self.run_command(content, workers=workers, chunk_size=1)
+            self.assertEqual(rows, [
+                ['iban', 'normalized', 'error'],
+                ['GB82 WEST 1234 5698 7654 32', 'GB82WEST12345698765432', ''],
+                ['CA34CIBC123425345', 'CA34CIBC123425345', IBAN_INVALID_COUNTRY],
+                ['EG1100006001880800100014553', 'EG1100006001880800100014553', IBAN_INVALID_COUNTRY],
+            ])
+            self.assertIn('Validated 3 IBANs (2 invalid)', stdout)
+
+        rows, stdout = self.run_command(content, '--use-nordea-extensions', '--include-countries=EG', workers=1)
+        self.assertEqual([row[2] for row in rows[1:]], [IBAN_COUNTRY_NOT_ALLOWED, IBAN_INVALID_COUNTRY, ''])
+
+    def test_csv(self):
+        content = 'name,iban\nA,NL91ABNA0417164300\nB,NL91ABNB0417164300\n'
+        rows, stdout = self.run_command(content, '--csv', column='iban', workers=1)
+        self.assertEqual([row[2] for row in rows[1:]], ['', IBAN_INVALID_CHECKSUM])
+
+        self.assertRaises(CommandError, self.run_command, content, '--csv', column='account', workers=1)
+        self.assertRaises(CommandError, self.run_command, content, include_countries='JJ', workers=1)
+
+
+class SEPAModel(models.Model):
+    iban = IBANField(include_countries=IBAN_SEPA_COUNTRIES)
+
+
+class RevalidationTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.rules_path = os.path.join(self.directory, 'rules.json')
+
+        # The previous rules had Kosovo, a wrong length for the Netherlands and Belgium wasn't in SEPA.
+        current = get_current_rule_set().to_dict()
+        current['lengths'].update({'XK': 20, 'NL': 19})
+        current['formats']['XK'] = '16n'
+        current['sepa_countries'].remove('BE')
+        self.previous = CountryRuleSet(current['lengths'], current['nordea_lengths'], current['formats'],
+                                       current['sepa_countries'])
+
+    def write_previous_rules(self):
+        with io.open(self.rules_path, 'w') as f:
+            json.dump(self.previous.to_dict(), f)
+
+    def run_command(self, *args, **options):
+        stdout = io.StringIO()
+        call_command('revalidate_ibans', 'django_iban.BulkModel', 'iban', rules=self.rules_path, stdout=stdout,
+                     *args, **options)
+        return stdout.getvalue()
+
+    def read_output(self):
+        with io.open(self.rules_path + '.changes.csv', newline='') as f:
+            return f.read()
+
+    def test_rule_sets(self):
+        current = get_current_rule_set()
+        self.assertEqual(current, CountryRuleSet.from_dict(json.loads(json.dumps(current.to_dict()))))
+        self.assertEqual(len(current.sepa_countries), len(set(IBAN_SEPA_COUNTRIES)))
+        self.assertEqual(self.previous.diff(current), frozenset(['BE', 'NL', 'XK']))
+        self.assertEqual(current.diff(current), frozenset())
+
+        data = self.previous.to_dict()
+        data['lengths']['NL'] = 18
+        self.assertRaises(ValueError, CountryRuleSet.from_dict, data)
+
+        validator = IBANValidator(rule_set=self.previous)
+        self.assertIsNot(validator.rules, IBANValidator().rules)
+        self.assertNotEqual(validator.rules.cache_key, IBANValidator().rules.cache_key)
+        # The cache key of the shared IBAN format changes with the current rule set of a django-iban release.
+        rules = IBANValidator().rules
+        self.assertEqual(IBANCountryRules(rules.lengths, None).cache_key, rules.cache_key)
+        try:
+            country_rules._current_rule_set = self.previous
+            self.assertNotEqual(IBANCountryRules(rules.lengths, None).cache_key, rules.cache_key)
+        finally:
+            country_rules._current_rule_set = None
+        self.assertEqual(validator.check('XK051212012345678906')[1], None)
+        self.assertEqual(validator.check('XK05121201234567890A')[1], IBAN_INVALID_FORMAT)
+        self.assertEqual(validator.check('NL91ABNA0417164300')[1], IBAN_INVALID_LENGTH)
+        self.assertEqual(IBANValidator().check('XK051212012345678906')[1], IBAN_INVALID_COUNTRY)
+
+    def test_revalidate(self):
+        for iban in ['NL91ABNA0417164300', 'GB82WEST12345698765432', 'BE68539007547034', 'NL91ABNB0417164300',
+                     'XK051212012345678906']:
+            BulkModel.objects.create(iban=iban)
+        nl, gb, be, invalid_nl, xk = BulkModel.objects.order_by('pk').values_list('pk', flat=True)
+
+        # The first run saves the current rules.
+        self.assertIn('Saved the current country rules', self.run_command())
+        self.assertIn('nothing to revalidate', self.run_command())
+
+        self.write_previous_rules()
+        stdout = self.run_command(chunk_size=1)
+        self.assertIn('Revalidated 4 IBANs of BE, NL, XK (2 changed)', stdout)
+        expected = ('pk,iban,previous_error,error\r\n%d,NL91ABNA0417164300,invalid_length,\r\n'
+                    '%d,XK051212012345678906,,invalid_country\r\n' % (nl, xk))
+        self.assertEqual(self.read_output(), expected)
+        self.assertEqual(CountryRuleSet.from_dict(json.load(io.open(self.rules_path))), get_current_rule_set())
+        self.assertFalse(os.path.exists(self.rules_path + '.changes.csv.checkpoint'))
+
+        # An interrupted run continues after the checkpoint and writes the rows after it again.
+        self.write_previous_rules()
+        header_and_nl = expected[:expected.index('%d,XK' % xk)]
+        with io.open(self.rules_path + '.changes.csv', 'w', newline='') as f:
+            f.write(header_and_nl + 'half a row')
+        checkpoint = {
+            'model': 'django_iban.BulkModel', 'field': 'iban', 'previous': self.previous.version,
+            'current': get_current_rule_set().version, 'countries': ['BE', 'NL', 'XK'],
+            'output': os.path.abspath(self.rules_path + '.changes.csv'), 'last_pk': str(invalid_nl),
+            'output_size': len(header_and_nl), 'total': 3, 'changed': 1,
+        }
+        with io.open(self.rules_path + '.changes.csv.checkpoint', 'w') as f:
+            json.dump(checkpoint, f)
+        stdout = self.run_command()
+        self.assertIn('Continuing after primary key %d' % invalid_nl, stdout)
+        self.assertIn('Revalidated 4 IBANs of BE, NL, XK (2 changed)', stdout)
+        self.assertEqual(self.read_output(), expected)
+
+        # Only the given countries, with a checkpoint of another revalidation.
+        self.write_previous_rules()
+        with io.open(self.rules_path + '.changes.csv.checkpoint', 'w') as f:
+            json.dump(checkpoint, f)
+        self.assertRaises(CommandError, self.run_command, countries='nl')
+        os.remove(self.rules_path + '.changes.csv.checkpoint')
+        self.assertIn('Revalidated 2 IBANs of NL (1 changed)', self.run_command(countries='nl'))
+
+        self.assertRaises(CommandError, call_command, 'revalidate_ibans', 'django_iban.Missing', 'iban',
+                          rules=self.rules_path)
+
+    def test_revalidate_sepa_countries(self):
+        """ The IBANs of a SEPA field are revalidated with the SEPA countries of the previous rules. """
+        be = SEPAModel.objects.create(iban='BE68539007547034').pk
+        nl = SEPAModel.objects.create(iban='NL91ABNA0417164300').pk
+        self.write_previous_rules()
+        call_command('revalidate_ibans', 'django_iban.SEPAModel', 'iban', rules=self.rules_path, stdout=io.StringIO())
+        self.assertEqual(self.read_output(), 'pk,iban,previous_error,error\r\n%d,BE68539007547034,%s,\r\n'
+                                             '%d,NL91ABNA0417164300,invalid_length,\r\n'
+                                             % (be, IBAN_COUNTRY_NOT_ALLOWED, nl))
+
+
+class GeneratorTests(TestCase):
+    def test_generate(self):
+        error_rates = dict((error_code, 0.1) for error_code in ERROR_TYPES)
+        for kwargs in [{}, {'use_nordea_extensions': True}, {'include_countries': IBAN_SEPA_COUNTRIES}]:
+            rates = dict(error_rates)
+            if 'include_countries' not in kwargs:
+                del rates[IBAN_COUNTRY_NOT_ALLOWED]
+            items = list(IBANGenerator(seed=7, error_rates=rates, **kwargs).generate(3000))
+            # The same seed gives the same stream.
+            self.assertEqual(items, list(IBANGenerator(seed=7, error_rates=rates, **kwargs).generate(3000)))
+
+            validator = IBANValidator(**kwargs)
+            for iban, error_code in items:
+                self.assertEqual(validator.check(iban)[1], error_code, iban)
+            error_codes = [error_code for iban, error_code in items]
+            self.assertEqual(set(error_codes), set(rates) | set([None]))
+            self.assertTrue(1000 < error_codes.count(None) < 1600)
+
+        generator = IBANGenerator(seed=1, countries=('NL',))
+        self.assertEqual(set(iban[:2] for iban, error_code in generator.generate(20)), set(['NL']))
+        self.assertRaises(ValueError, IBANGenerator, countries=('EG',))
+        self.assertRaises(ValueError, IBANGenerator, error_rates={IBAN_COUNTRY_NOT_ALLOWED: 0.1})
+        self.assertRaises(ValueError, IBANGenerator, error_rates={IBAN_INVALID_CHECKSUM: 0.6, IBAN_INVALID_LENGTH: 0.6})
+        self.assertRaises(ValueError, IBANGenerator, error_rates={'invalid': 0.1})
+
+    def test_corpus(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'ibans.csv')
+        items = list(IBANGenerator(seed=3, error_rates={IBAN_INVALID_CHARACTER: 0.5}).generate(100))
+        self.assertEqual(write_corpus(path, iter(items), chunk_size=30), 100)
+        self.assertEqual(list(read_corpus(path)), items)
+
+        stdout = io.StringIO()
+        call_command('validate_ibans', path, '--csv', column='iban', workers=1, stdout=stdout)
+        with io.open(path + '.results.csv', newline='') as f:
+            rows = list(csv.reader(f))[1:]
+        self.assertEqual([row[2] or None for row in rows], [error_code for iban, error_code in items])
+
+
+class IBANObjectModel(models.Model):
+    iban = IBANField(use_iban_object=True, null=True)
+
+
+class IBANObjectTests(TestCase):
+    def test_bban_structures(self):
+        for country_code, length in list(IBAN_COUNTRY_CODE_LENGTH.items()) + list(NORDEA_COUNTRY_CODE_LENGTH.items()):
+            structure = get_bban_structure(country_code)
+            self.assertEqual(structure.length + 4, length, country_code)
+            self.assertEqual(sum(count for count, character_class in structure.character_classes), structure.length)
+            for letter, component in (('b', structure.bank_code), ('s', structure.branch_code),
+                                      ('c', structure.account_number)):
+                if component is not None:
+                    # Components are contiguous.
+                    self.assertEqual(structure.layout[component], letter * (component.stop - component.start))
+        self.assertEqual(set(BBAN_STRUCTURES), set(IBAN_COUNTRY_CODE_LENGTH) | set(NORDEA_COUNTRY_CODE_LENGTH))
+        self.assertIsNone(get_bban_structure('JJ'))
+
+    def test_iban_format(self):
+        iban_format = get_iban_format()
+        self.assertIs(get_iban_format(), iban_format)
+        for country_code, structure in BBAN_STRUCTURES.items():
+            bban = ''.join({'n': '1', 'a': 'A', 'c': 'C'}[character_class] * count
+                           for count, character_class in structure.character_classes)
+            self.assertTrue(iban_format.fullmatch(country_code + '00' + bban), country_code)
+            self.assertTrue(structure.matches(bban), country_code)
+            for invalid in (country_code + '0X' + bban, country_code + '00' + bban[:-1],
+                            country_code + '00' + bban + '1', country_code.lower() + '00' + bban):
+                self.assertIsNone(iban_format.fullmatch(invalid), invalid)
+            if 'n' in structure.format:
+                self.assertIsNone(iban_format.fullmatch(country_code + '00' + bban.replace('1', 'A')), country_code)
+            if 'a' in structure.format:
+                self.assertIsNone(iban_format.fullmatch(country_code + '00' + bban.replace('A', '1')), country_code)
+        self.assertIsNone(iban_format.fullmatch('JJ00ABCD12345678'))
+
+    def test_iban_components(self):
+        iban = IBAN('GB29 NWBK 6016 1331 9268 19')
+        self.assertEqual(str(iban), 'GB29NWBK60161331926819')
+        self.assertEqual((iban.country_code, iban.check_digits, iban.bban),
+                         ('GB', '29', 'NWBK60161331926819'))
+        self.assertEqual((iban.bank_code, iban.branch_code, iban.account_number), ('NWBK', '601613', '31926819'))
+        self.assertEqual(iban.structure, get_bban_structure('GB'))
+
+        iban = IBAN('DE89370400440532013000')
+        self.assertEqual((iban.bank_code, iban.branch_code, iban.account_number), ('37040044', None, '0532013000'))
+
+        # Unknown countries and wrong lengths have no components.
+        for value in ('CA34CIBC123425345', 'GB29NWBK6016133192681'):
+            self.assertEqual((IBAN(value).bank_code, IBAN(value).account_number), (None, None))
+
+        self.assertEqual(IBAN('NL91ABNA0417164300'), IBAN('nl91 abna 0417 1643 00'))
+        self.assertEqual(IBAN('NL91ABNA0417164300'), 'NL91ABNA0417164300')
+        self.assertEqual(IBAN('nl91 abna 0417 1643 00'), normalize_iban('nl91 abna 0417 1643 00'))
+        self.assertNotEqual(IBAN('NL91ABNA0417164300'), 'NL91 ABNA 0417 1643 00')
+        # Equal IBANs and strings have the same hash.
+        self.assertEqual(hash(IBAN('nl91 abna 0417 1643 00')), hash('NL91ABNA0417164300'))
+        self.assertIn('NL91ABNA0417164300', set([IBAN('NL91 ABNA 0417 1643 00')]))
+        self.assertEqual({'NL91ABNA0417164300': 1}[IBAN('NL91ABNA0417164300')], 1)
+        self.assertNotEqual(IBAN('NL91ABNA0417164300'), IBAN('NL02ABNA0123456789'))
+        self.assertEqual(len(set([IBAN('NL91ABNA0417164300'), IBAN('NL91 ABNA 0417 1643 00')])), 1)
+
+    def test_model_field(self):
+        IBANObjectModel.objects.create(iban='NL91 ABNA 0417 1643 00')
+        IBANObjectModel.objects.create(iban=None)
+        instance = IBANObjectModel.objects.get(iban__isnull=False)
+        self.assertIsInstance(instance.iban, IBAN)
+        self.assertEqual(instance.iban.bank_code, 'ABNA')
+        self.assertIsNone(IBANObjectModel.objects.get(iban__isnull=True).iban)
+        # Fields that return strings don't convert the values read from the database.
+        self.assertEqual(IBANField().get_db_converters(connection), [])
+        self.assertEqual(len(IBANField(use_iban_object=True).get_db_converters(connection)), 1)
+
+        # IBAN objects can be saved, validated and used in queries.
+        instance.full_clean()
+        instance.save()
+        self.assertEqual(IBANObjectModel.objects.filter(iban=IBAN('NL91ABNA0417164300')).count(), 1)
+        self.assertEqual(IBANFormField().prepare_value(instance.iban), 'NL91 ABNA 0417 1643 00')
+        self.assertRaises(ValidationError, IBANObjectModel(iban=IBAN('NL91ABNB0417164300')).full_clean)
+
+        # The arguments after include_countries are passed on to CharField, the first one is the verbose name.
+        field = IBANField(False, None, 'Account')
+        self.assertEqual(field.verbose_name, 'Account')
+        self.assertFalse(field.use_iban_object)
+        self.assertFalse(field.db_check_constraint)
+        self.assertEqual(field.to_python('NL91ABNA0417164300'), 'NL91ABNA0417164300')
+
+
+class BulkModel(models.Model):
+    iban = IBANField()
+    bic = SWIFTBICField(blank=True)
+
+    objects = IBANQuerySet.as_manager()
+
+
+class BulkValidationTests(TestCase):
+    def get_objs(self):
+        return [
+            BulkModel(iban='nl91 abna 0417 1643 00', bic='DEUTDEFF'),
+            BulkModel(iban='NL91ABNB0417164300'),
+            BulkModel(iban='GB82 WEST 1234 5698 7654 32', bic='D3UTDEFF'),
+            BulkModel(iban=''),
+            BulkModel(iban='BE68539007547034'),
+        ]
+
+    def test_collect(self):
+        result = BulkModel.objects.validated_bulk_create(self.get_objs(), on_invalid='collect', batch_size=2)
+        self.assertEqual(sorted(BulkModel.objects.values_list('iban', flat=True)),
+                         ['BE68539007547034', 'NL91ABNA0417164300'])
+        self.assertEqual([obj.iban for obj in result.objs], ['NL91ABNA0417164300', 'BE68539007547034'])
+        self.assertEqual([errors for obj, errors in result.invalid], [
+            {'iban': IBAN_INVALID_CHECKSUM},
+            {'bic': BIC_INVALID_INSTITUTION_CODE},
+            {'iban': 'blank'},
+        ])
+        self.assertEqual([(batch['size'], batch['invalid']) for batch in result.batches], [(2, 1), (2, 2), (1, 0)])
+
+    def test_drop(self):
+        result = BulkModel.objects.validated_bulk_create(self.get_objs(), on_invalid='drop')
+        self.assertEqual(len(result.objs), 2)
+        self.assertEqual(result.invalid, [])
+        self.assertEqual(BulkModel.objects.count(), 2)
+
+    def test_raise(self):
+        with self.assertRaises(ValidationError) as context_manager:
+            BulkModel.objects.validated_bulk_create(self.get_objs())
+        self.assertEqual(context_manager.exception.message_dict, {'iban': ['Not a valid IBAN.']})
+        self.assertEqual(BulkModel.objects.count(), 0)
+        self.assertRaises(ValueError, BulkModel.objects.validated_bulk_create, [], on_invalid='ignore')
+
+    def test_bulk_update(self):
+        obj = BulkModel.objects.create(iban='NL91ABNA0417164300')
+        obj.iban = 'be68 5390 0754 7034'
+        result = BulkModel.objects.validated_bulk_update([obj], ['iban'])
+        self.assertEqual(result.objs, [obj])
+        self.assertEqual(BulkModel.objects.get().iban, 'BE68539007547034')
+
+
+class CheckedModel(models.Model):
+    iban = IBANField(db_check_constraint=True, blank=True)
+    iban_country_code = IBANCountryCodeField('iban')
+
+    objects = IBANQuerySet.as_manager()
+
+
+class DatabaseValidationTests(TestCase):
+    def test_is_valid_stored_iban(self):
+        self.assertTrue(is_valid_stored_iban('NL91ABNA0417164300'))
+        self.assertTrue(is_valid_stored_iban('AO06000600000100037131174', use_nordea_extensions=True))
+        self.assertIsNone(is_valid_stored_iban(None))
+        for value in ['NL91ABNA0417164301', 'NL91ABNA041716430', 'nl91abna0417164300', 'NL91 ABNA 0417 1643 00',
+                      'AO06000600000100037131174', 'JJ00ABCD12345678', '', 42]:
+            self.assertFalse(is_valid_stored_iban(value), value)
+
+    def test_check_constraint_sql(self):
+        self.assertEqual(check_constraint_sql('"iban"'), 'django_iban_is_valid("iban", false)')
+        self.assertEqual(check_constraint_sql('"iban"', True, ['NL', 'BE', 'NL'], True),
+                         '"iban" = \'\' OR (django_iban_is_valid("iban", true) AND substr("iban", 1, 2) IN (\'BE\', '
+                         '\'NL\'))')
+        self.assertIn("WHEN 'NL' THEN 18", postgresql_function_sql())
+        self.assertIn("WHEN 'AO' THEN 25", postgresql_function_sql())
+        self.assertIsNone(IBANField().db_check(connection))
+
+        # Other databases don't have the SQL function.
+        other_connection = type(str('MySQLConnection'), (), {'vendor': 'mysql', 'ops': connection.ops,
+                                                              'data_type_check_constraints': {}})()
+        field = IBANField(db_check_constraint=True)
+        field.set_attributes_from_name('iban')
+        self.assertEqual(field.db_check(connection), 'django_iban_is_valid("iban", false)')
+        self.assertIsNone(field.db_check(other_connection))
+
+    def test_create_functions_operation(self):
+        """ The migration operation executes the PostgreSQL function SQL as it is, e.g. for sqlmigrate. """
+        operation = CreateIBANFunctions()
+        schema_editor = connection.SchemaEditorClass(connection, collect_sql=True)
+        operation.database_forwards('django_iban', schema_editor, None, None)
+        self.assertEqual(schema_editor.collected_sql, [])
+
+        # The statements are collected, not executed, so the connection only has to look like PostgreSQL.
+        schema_editor.connection = type(str('PostgreSQLConnection'), (), {'vendor': 'postgresql'})()
+        operation.database_forwards('django_iban', schema_editor, None, None)
+        operation.database_backwards('django_iban', schema_editor, None, None)
+        self.assertEqual(schema_editor.collected_sql, [postgresql_function_sql() + ';',
+                                                       postgresql_drop_function_sql() + ';'])
+        self.assertIn('% 97', schema_editor.collected_sql[0])
+
+    def test_check_constraint(self):
+        obj = CheckedModel.objects.create(iban='nl91 abna 0417 1643 00')
+        CheckedModel.objects.create(iban='')
+        with transaction.atomic():
+            self.assertRaises(IntegrityError, CheckedModel.objects.filter(pk=obj.pk).update, iban='NL91ABNA0417164301')
+        with transaction.atomic():
+            self.assertRaises(IntegrityError, CheckedModel.objects.create, iban='GB82WEST1234569876543')
+        self.assertEqual(CheckedModel.objects.get(pk=obj.pk).iban, 'NL91ABNA0417164300')
+
+    def test_is_valid_iban_expression(self):
+        BulkModel.objects.create(iban='NL91ABNA0417164300')
+        BulkModel.objects.create(iban='NL91ABNA0417164301')
+        self.assertEqual(list(BulkModel.objects.exclude(IsValidIBAN('iban')).values_list('iban', flat=True)),
+                         ['NL91ABNA0417164301'])
+        self.assertEqual(BulkModel.objects.filter(IsValidIBAN('iban')).count(), 1)
+
+    def test_country_code_field(self):
+        obj = CheckedModel.objects.create(iban='be68 5390 0754 7034')
+        CheckedModel.objects.create(iban='NL91ABNA0417164300')
+        self.assertEqual(obj.iban_country_code, 'BE')
+        self.assertEqual(CheckedModel.objects.get(iban_country_code='NL').iban, 'NL91ABNA0417164300')
+        self.assertTrue(CheckedModel._meta.get_field('iban_country_code').db_index)
+
+        obj.iban = 'GB82WEST12345698765432'
+        CheckedModel.objects.validated_bulk_update([obj], ['iban'])
+        self.assertEqual(CheckedModel.objects.get(pk=obj.pk).iban_country_code, 'GB')
+
+    def test_deconstruct(self):
+        name, path, args, kwargs = IBANField(use_nordea_extensions=True, include_countries=('NL', 'BE'),
+                                             db_check_constraint=True).deconstruct()
+        self.assertEqual(kwargs, {'use_nordea_extensions': True, 'include_countries': ('BE', 'NL'),
+                                  'db_check_constraint': True})
+        name, path, args, kwargs = IBANCountryCodeField('iban').deconstruct()
+        self.assertEqual(kwargs, {'iban_field': 'iban'})
+
+        # Options that differ from the defaults of IBANCountryCodeField are kept, also when they are CharField's.
+        field = IBANCountryCodeField('iban', db_index=False, editable=True, blank=False)
+        name, path, args, kwargs = field.deconstruct()
+        self.assertEqual(kwargs, {'iban_field': 'iban', 'db_index': False, 'editable': True, 'blank': False})
+        rebuilt = IBANCountryCodeField(*args, **kwargs)
+        self.assertEqual((rebuilt.db_index, rebuilt.editable, rebuilt.blank, rebuilt.max_length),
+                         (False, True, False, 2))
+        self.assertRaises(TypeError, IBANCountryCodeField)
+
+
+class IndexedIBANModel(models.Model):
+    iban = IBANField(use_nordea_extensions=True)
+
+    class Meta:
+        indexes = [
+            models.Index(IBANCountry('iban'), name='indexed_iban_country'),
+            models.Index(IBANBankCode('iban'), name='indexed_iban_bank_code'),
+        ]
+
+
+class IBANLookupTests(TestCase):
+    def setUp(self):
+        for iban in ['NL91ABNA0417164300', 'NL39RABO0300065264', 'DE89370400440532013000', 'GB82WEST12345698765432',
+                     'SE4550000000058398257466', 'AO06000600000100037131174']:
+            IndexedIBANModel.objects.create(iban=iban)
+
+    def get_ibans(self, **kwargs):
+        return sorted(IndexedIBANModel.objects.filter(**kwargs).values_list('iban', flat=True))
+
+    def test_lookups(self):
+        self.assertEqual(self.get_ibans(iban__country='NL'), ['NL39RABO0300065264', 'NL91ABNA0417164300'])
+        self.assertEqual(self.get_ibans(iban__check_digits='89'), ['DE89370400440532013000'])
+        self.assertEqual(self.get_ibans(iban__bban='WEST12345698765432'), ['GB82WEST12345698765432'])
+        self.assertEqual(self.get_ibans(iban__bank_code='ABNA'), ['NL91ABNA0417164300'])
+        self.assertEqual(self.get_ibans(iban__bank_code='37040044'), ['DE89370400440532013000'])
+        self.assertEqual(self.get_ibans(iban__bank_code='500'), ['SE4550000000058398257466'])
+        self.assertEqual(self.get_ibans(iban__branch_code='123456'), ['GB82WEST12345698765432'])
+        self.assertEqual(self.get_ibans(iban__account_number='0417164300'), ['NL91ABNA0417164300'])
+        self.assertEqual(self.get_ibans(iban__bank_code__startswith='RA'), ['NL39RABO0300065264'])
+        self.assertEqual(self.get_ibans(iban__branch_code__isnull=True), [
+            'DE89370400440532013000', 'NL39RABO0300065264', 'NL91ABNA0417164300', 'SE4550000000058398257466'])
+
+        counts = dict(IndexedIBANModel.objects.values_list('iban__country').annotate(count=models.Count('id')))
+        self.assertEqual(counts, {'AO': 1, 'DE': 1, 'GB': 1, 'NL': 2, 'SE': 1})
+
+    def test_lookups_match_iban_object(self):
+        for obj in IndexedIBANModel.objects.all():
+            iban = IBAN(obj.iban)
+            row = IndexedIBANModel.objects.filter(pk=obj.pk).values(
+                'iban__country', 'iban__bank_code', 'iban__branch_code', 'iban__account_number').get()
+            self.assertEqual(row, {
+                'iban__country': iban.country_code,
+                'iban__bank_code': iban.bank_code,
+                'iban__branch_code': iban.branch_code,
+                'iban__account_number': iban.account_number,
+            })
+
+    def test_functional_indexes(self):
+        if connection.vendor != 'sqlite':
+            return
+        for kwargs, index in [({'iban__country': 'NL'}, 'indexed_iban_country'),
+                              ({'iban__bank_code': 'ABNA'}, 'indexed_iban_bank_code')]:
+            self.assertIn(index, IndexedIBANModel.objects.filter(**kwargs).explain())
+
+
+class BankDirectory(object):
+    """ Local stand-in for a bank directory service. """
+
+    def __init__(self, banks):
+        self.banks = banks
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, iban):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0)
+        self.running -= 1
+        bank = self.banks.get(IBAN(iban).bank_code)
+        if bank is None:
+            raise ValidationError('Unknown bank.', code='unknown_bank')
+        return {'bank': bank}
+
+
+async def collect(async_iterable):
+    return [item async for item in async_iterable]
+
+
+class AsyncValidationTests(SimpleTestCase):
+    values = ['nl91 abna 0417 1643 00', 'NL91ABNA0417164301', None, 'GB82WEST12345698765432', 'NL39RABO0300065264']
+
+    async def test_avalidate_many(self):
+        results = await collect(avalidate_many(self.values, batch_size=2))
+        self.assertEqual(results, [
+            ('nl91 abna 0417 1643 00', 'NL91ABNA0417164300', None, {}),
+            ('NL91ABNA0417164301', 'NL91ABNA0417164301', IBAN_INVALID_CHECKSUM, {}),
+            (None, None, None, {}),
+            ('GB82WEST12345698765432', 'GB82WEST12345698765432', None, {}),
+            ('NL39RABO0300065264', 'NL39RABO0300065264', None, {}),
+        ])
+
+        async def values():
+            for value in self.values:
+                yield value
+        self.assertEqual(await collect(avalidate_many(values(), executor_threshold=1)), results)
+        with ProcessPoolExecutor(1) as executor:
+            self.assertEqual(await collect(avalidate_many(self.values, executor_threshold=1, executor=executor)),
+                             results)
+
+    async def test_hooks(self):
+        directory = BankDirectory({'ABNA': 'ABN AMRO', 'WEST': 'Westminster'})
+        results = await collect(avalidate_many(self.values * 10, hooks=[directory], concurrency=3))
+        self.assertEqual([(error_code, extra) for value, normalized, error_code, extra in results[:5]], [
+            (None, {'bank': 'ABN AMRO'}),
+            (IBAN_INVALID_CHECKSUM, {}),
+            (None, {}),
+            (None, {'bank': 'Westminster'}),
+            ('unknown_bank', {}),
+        ])
+        self.assertEqual(len(results), 50)
+        self.assertEqual(directory.max_running, 3)
+
+        # A later hook that rejects the value drops the data of the earlier hooks.
+        async def country(iban):
+            return {'country': iban[:2]}
+        results = await collect(avalidate_many(self.values, hooks=[country, directory]))
+        self.assertEqual([extra for value, normalized, error_code, extra in results],
+                         [{'country': 'NL', 'bank': 'ABN AMRO'}, {}, {}, {'country': 'GB', 'bank': 'Westminster'}, {}])
+
+        self.assertEqual(await avalidate('NL91ABNA0417164300', hooks=[directory]), {'bank': 'ABN AMRO'})
+        with self.assertRaises(ValidationError):
+            await avalidate('NL91ABNA0417164301', hooks=[directory])
+        with self.assertRaises(ValidationError):
+            await avalidate('NL39RABO0300065264', hooks=[directory])
+
+    async def test_bic(self):
+        results = await collect(avalidate_many(['DEUTDEFF', None, 'D3UTDEFF'], validator=swift_bic_validator))
+        self.assertEqual(results, [('DEUTDEFF', 'DEUTDEFF', None, {}), (None, None, None, {}),
+                                   ('D3UTDEFF', None, BIC_INVALID_INSTITUTION_CODE, {})])
+        self.assertEqual(await avalidate('DEUTDEFF', validator=swift_bic_validator), {})
+        self.assertEqual(await avalidate(None, validator=swift_bic_validator), {})
+
+
+class BICDirectoryTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.csv_path = os.path.join(self.directory, 'banks.csv')
+        self.index_path = os.path.join(self.directory, 'banks.idx')
+        with io.open(self.csv_path, 'w', newline='') as f:
+            f.write('bic,country_code,bank_code,name\n'
+                    'DEUTDEFF,DE,10070000,Deutsche Bank\n'
+                    'COBADEFFXXX,DE,37040044,Commerzbank\n'
+                    'COBADEFF370,DE,37040044,Commerzbank Koeln\n'
+                    'abnanl2a,NL,ABNA,ABN AMRO\n'
+                    'MIDLGB22,,,HSBC\n'
+                    'INVALID,NL,INVA,Invalid\n')
+        self.assertEqual(build_bic_index(self.csv_path, self.index_path), 5)
+
+    def test_lookups(self):
+        directory = BICDirectory(self.index_path)
+        self.addCleanup(directory.close)
+        self.assertEqual(len(directory), 5)
+        for bic in ['DEUTDEFF', 'DEUTDEFFXXX', 'cobadeff370', 'ABNANL2A', 'MIDLGB22']:
+            self.assertTrue(directory.exists(bic), bic)
+        for bic in ['DEUTDEFF500', 'INVALID', 'ABNANL2B', '', 'DEUTDEF\u00c9']:
+            self.assertFalse(directory.exists(bic), bic)
+
+        self.assertEqual(directory.bic_for_bank_code('DE', '10070000'), 'DEUTDEFFXXX')
+        self.assertEqual(directory.bic_for_bank_code('DE', '37040044'), 'COBADEFF370')
+        self.assertIsNone(directory.bic_for_bank_code('DE', '50010517'))
+        self.assertIsNone(directory.bic_for_bank_code('NL', 'INVA'))
+        self.assertEqual(directory.bic_for_iban('nl91 abna 0417 1643 00'), 'ABNANL2AXXX')
+        self.assertEqual(directory.bic_for_iban(IBAN('DE89370400440532013000')), 'COBADEFF370')
+        self.assertIsNone(directory.bic_for_iban('GB82WEST12345698765432'))
+        self.assertIsNone(directory.bic_for_iban('XX00'))
+
+    def test_non_ascii_rows(self):
+        """ Rows with non-ASCII BICs are skipped, non-ASCII bank codes only add the BIC. """
+        with io.open(self.csv_path, 'w', newline='', encoding='utf-8') as f:
+            f.write('bic,country_code,bank_code\n'
+                    'DEUTDEF\u00c9,DE,10070000\n'
+                    'DEUTDEFF,DE,10070000\n'
+                    'RABONL2U,NL,R\u00c4BO\n'
+                    'ABNANL2A,N\u00cb,ABNA\n'
+                    '\u0663\u0663\u0663\u0663DEFF,DE,50010517\n')
+        self.assertEqual(build_bic_index(self.csv_path, self.index_path), 3)
+        directory = BICDirectory(self.index_path)
+        self.addCleanup(directory.close)
+        self.assertTrue(directory.exists('RABONL2U'))
+        self.assertTrue(directory.exists('ABNANL2A'))
+        self.assertEqual(directory.bic_for_bank_code('DE', '10070000'), 'DEUTDEFFXXX')
+        self.assertIsNone(directory.bic_for_bank_code('DE', '50010517'))
+        self.assertIsNone(directory.bic_for_iban('NL91ABNA0417164300'))
+
+    def test_validator(self):
+        with override_settings(IBAN_BIC_DIRECTORY=None):
+            self.assertRaises(ImproperlyConfigured, bic_exists_validator, 'DEUTDEFF')
+        with override_settings(IBAN_BIC_DIRECTORY=self.index_path):
+            self.addCleanup(get_bic_directory().close)
+            bic_exists_validator('DEUTDEFF')
+            with self.assertRaisesMessage(ValidationError, 'DEUTDEFF500 is not in the SWIFT-BIC directory.') as cm:
+                bic_exists_validator('DEUTDEFF500')
+            self.assertEqual((cm.exception.code, cm.exception.params), (BIC_NOT_IN_DIRECTORY, {'bic': 'DEUTDEFF500'}))
+            self.assertRaisesMessage(ValidationError, 'A SWIFT-BIC is either 8 or 11 characters long.',
+                                     bic_exists_validator, 'DEUTDEF')
+
+            field = SWIFTBICField(require_existence=True)
+            self.assertEqual(field.clean('ABNANL2A', None), 'ABNANL2A')
+            self.assertRaises(ValidationError, field.clean, 'ABNANL2B', None)
+            self.assertEqual(field.deconstruct()[3], {'require_existence': True})
+
+            # The first positional argument is the verbose name.
+            field = SWIFTBICField('Bank BIC')
+            self.assertEqual((field.verbose_name, field.require_existence), ('Bank BIC', False))
+            self.assertEqual(field.clean('DEUTDEFF', None), 'DEUTDEFF')
+
+
+class ValidationMetricsTests(TestCase):
+    def test_disabled(self):
+        self.assertIsNone(get_validation_metrics())
+        IBANValidator()('NL91ABNA0417164300')
+
+    @override_settings(IBAN_VALIDATION_METRICS=True)
+    def test_metrics(self):
+        measurements = []
+
+        def receiver(sender, **kwargs):
+            measurements.append(kwargs)
+        validation_measured.connect(receiver)
+        self.addCleanup(validation_measured.disconnect, receiver)
+
+        metrics = get_validation_metrics()
+        validator = IBANValidator()
+        validator('NL91ABNA0417164300')
+        validator('nl91 abna 0417 1643 00')
+        self.assertRaises(ValidationError, validator, 'NL91ABNA0417164301')
+        self.assertRaises(ValidationError, validator, 'JJ00ABCD12345678')
+        self.assertRaises(ValidationError, validator, 'QQ00ABCD12345678')
+        self.assertRaises(ValidationError, validator, '91')
+        swift_bic_validator('DEUTDEFF')
+        for bic in ['DEUTDEF', 'D3UTDEFF', 'DEUTJJFF', 'DEUTQQFF', 'DEUT']:
+            self.assertRaises(ValidationError, swift_bic_validator, bic)
+        IBANFormField().clean('NL91ABNA0417164300')
+        SWIFTBICField().clean('DEUTDEFF', None)
+
+        self.assertEqual(metrics.counters(), {
+            ('iban', 'NL', 'valid'): 3,
+            ('iban', 'NL', IBAN_INVALID_CHECKSUM): 1,
+            # Unknown country codes share one counter.
+            ('iban', COUNTRY_INVALID, IBAN_INVALID_COUNTRY): 3,
+            ('bic', 'DE', 'valid'): 2,
+            ('bic', 'DE', BIC_INVALID_LENGTH): 1,
+            ('bic', COUNTRY_INVALID, BIC_INVALID_LENGTH): 1,
+            ('bic', 'DE', BIC_INVALID_INSTITUTION_CODE): 1,
+            ('bic', COUNTRY_INVALID, BIC_INVALID_COUNTRY_CODE): 2,
+        })
+
+        histograms = metrics.histograms()
+        self.assertEqual(sorted(histograms), [('bic', 'model_field'), ('bic', 'validator'), ('iban', 'form_field'),
+                                              ('iban', 'validator')])
+        histogram = histograms[('iban', 'validator')]
+        self.assertEqual(histogram['count'], 7)
+        self.assertEqual(histogram['buckets'][-1], (float('inf'), 7))
+        self.assertGreater(histogram['sum'], 0)
+
+        self.assertEqual(len(measurements), 16)
+        self.assertEqual(measurements[0]['kind'], 'iban')
+        self.assertEqual(measurements[0]['operation'], 'validator')
+        self.assertEqual(measurements[0]['country_code'], 'NL')
+        self.assertEqual(measurements[0]['result'], 'valid')
+        self.assertEqual(measurements[-1]['operation'], 'model_field')
+        self.assertIsNone(measurements[-1]['result'])
+
+        metrics.clear()
+        self.assertEqual(metrics.counters(), {})
+
+
+class ExtractionTests(TestCase):
+    text = ('Pay to NL91 ABNA 0417 1643 00 and GB82-WEST-1234-5698-7654-32, not NL91ABNA0417164301 or '
+            'XNL91ABNA0417164300. AB12 DE89370400440532013000, CH93 0076 2011 6238 5295 7 and gb82west12345698765432.')
+    expected = [(7, 29, 'NL91ABNA0417164300'), (34, 61, 'GB82WEST12345698765432'),
+                (115, 137, 'DE89370400440532013000'), (139, 165, 'CH9300762011623852957')]
+
+    def test_extract_ibans(self):
+        self.assertEqual(list(extract_ibans(self.text)), self.expected)
+        for start, end, iban in extract_ibans(self.text):
+            self.assertEqual(normalize_iban(self.text[start:end]), iban)
+        self.assertEqual(list(extract_ibans(self.text, include_countries=('DE', 'CH'))), self.expected[2:])
+        self.assertEqual([iban for start, end, iban in extract_ibans(self.text, validate=False)], [
+            'NL91ABNA0417164300', 'GB82WEST12345698765432', 'NL91ABNA0417164301', 'DE89370400440532013000',
+            'CH9300762011623852957'])
+        self.assertEqual(list(extract_ibans('')), [])
+
+    def test_chunk_boundaries(self):
+        text = self.text * 3
+        expected = list(extract_ibans(text))
+        self.assertEqual(len(expected), 12)
+        for size in [1, 2, 3, 7, 20, 67, 68, 69, 200]:
+            chunks = (text[i:i + size] for i in range(0, len(text), size))
+            self.assertEqual(list(extract_ibans(chunks)), expected, size)
+            self.assertEqual(list(extract_ibans(io.StringIO(text), chunk_size=size)), expected, size)
+
+    def test_binary_input(self):
+        text = '\u20ac 100 \u2192 ' + self.text
+        data = text.encode('utf-8')
+        offset = len(data) - len(self.text)
+        expected = [(start + offset, end + offset, iban) for start, end, iban in self.expected]
+        self.assertEqual(list(extract_ibans(data)), expected)
+        self.assertEqual(list(extract_ibans(io.BytesIO(data), chunk_size=10)), expected)
+
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                self.assertEqual(list(extract_ibans(mapped, chunk_size=100)), expected)
+
+
 class SWIFTBICTests(TestCase):
     def test_valid_swift_bic(self):
         wikipedia_examples = [
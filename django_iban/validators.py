@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import functools
+import hashlib
 import string
+import types
 
 from django.core.exceptions import ValidationError, ImproperlyConfigured
 from django.utils.translation import ugettext_lazy as _
 
-try:
-    from django_countries.data import COUNTRIES
-except ImportError:
-    from django_countries.countries import OFFICIAL_COUNTRIES as COUNTRIES
+from .bban import compile_iban_format, get_iban_format
+from .cache import BIC_NAMESPACE, get_validation_cache
+from .checksum import first_invalid_character, mod97
+from .countries import CountrySet
+from .metrics import COUNTRY_INVALID, get_validation_metrics, now
 
 
 # Dictionary of ISO country code to IBAN length.
@@ -112,22 +116,211 @@ NORDEA_COUNTRY_CODE_LENGTH = {'AO': 25,  # Angola
                               'UA': 29,  # Ukraine
                               'SN': 28}  # Senegal
 
+# The length of the shortest IBAN (Norway), precomputed from IBAN_COUNTRY_CODE_LENGTH.
+IBAN_MIN_LENGTH = 15
+
+
+# Error codes returned by IBANValidator.check, IBANValidator.precheck and IBANValidator.validate_many, and the codes of
+# the ValidationErrors raised by IBANValidator.
+IBAN_INVALID_COUNTRY = 'invalid_country'
+IBAN_INVALID_LENGTH = 'invalid_length'
+IBAN_COUNTRY_NOT_ALLOWED = 'country_not_allowed'
+IBAN_INVALID_CHARACTER = 'invalid_character'
+IBAN_INVALID_CHECKSUM = 'invalid_checksum'
+IBAN_INVALID_FORMAT = 'invalid_format'
+
+# Error codes of the ValidationErrors raised by swift_bic_validator.
+
+BIC_INVALID_LENGTH = 'invalid_length'
+BIC_INVALID_INSTITUTION_CODE = 'invalid_institution_code'
+BIC_INVALID_COUNTRY_CODE = 'invalid_country_code'
+
+# The messages of the ValidationErrors by error code. They are translated and formatted with the ``params`` of the
+# ValidationError only when the messages are read, e.g. by ``ValidationError.messages`` or when a form is rendered.
+IBAN_ERROR_MESSAGES = {
+    IBAN_INVALID_COUNTRY: _('%(country_code)s is not a valid country code for IBAN.'),
+    IBAN_INVALID_LENGTH: _('%(country_code)s IBANs must contain %(number)s characters.'),
+    IBAN_COUNTRY_NOT_ALLOWED: _('%(country_code)s IBANs are not allowed in this field.'),
+    IBAN_INVALID_CHARACTER: _('%(character)s is not a valid character for IBAN.'),
+    IBAN_INVALID_CHECKSUM: _('Not a valid IBAN.'),
+    IBAN_INVALID_FORMAT: _('Not a valid IBAN.'),
+}
+
+BIC_ERROR_MESSAGES = {
+    BIC_INVALID_LENGTH: _('A SWIFT-BIC is either 8 or 11 characters long.'),
+    BIC_INVALID_INSTITUTION_CODE: _('%(institution_code)s is not a valid SWIFT-BIC Institution Code.'),
+    BIC_INVALID_COUNTRY_CODE: _('%(country_code)s is not a valid SWIFT-BIC Country Code.'),
+}
+
+
+class NormalizedIBAN(str):
+    """
+    An IBAN in the electronic format returned by ``normalize_iban``.
+
+    The type marks the value as normalized so later stages (model field, form field, validator and display formatting)
+    don't normalize it again.
+    """
+    __slots__ = ()
+
+
+def normalize_iban(value):
+    """ Returns the IBAN in upper case without spaces and dashes, as a NormalizedIBAN. """
+    if type(value) is NormalizedIBAN:
+        return value
+    if not isinstance(value, str):
+        # E.g. an IBAN object, whose str() is its NormalizedIBAN value.
+        return normalize_iban(str(value))
+    return NormalizedIBAN(value.upper().replace(' ', '').replace('-', ''))
+
+
+# The number of display formats kept by format_iban, enough for the rows of a few large formsets.
+IBAN_DISPLAY_CACHE_SIZE = 4096
+# Longer values aren't IBANs even with a separator after every character, they aren't cached so that large form input
+# can't fill the cache.
+IBAN_DISPLAY_CACHE_MAX_LENGTH = 68
+
+
+def _display_format(value):
+    value = normalize_iban(value)
+    return ' '.join([value[i:i + 4] for i in range(0, len(value), 4)])
+
+
+_format_iban = functools.lru_cache(maxsize=IBAN_DISPLAY_CACHE_SIZE)(_display_format)
+
+
+def format_iban(value):
+    """
+    Returns the IBAN in the display format, normalized and with a space every 4 characters.
+
+    The display formats of recently formatted values are cached, so rendering the same IBANs again (e.g. a formset
+    that is shown again after a validation error) only looks them up without normalizing them again. Values longer
+    than ``IBAN_DISPLAY_CACHE_MAX_LENGTH`` are formatted without the cache.
+    """
+    if not isinstance(value, str):
+        # E.g. an IBAN object, the cache is keyed by strings.
+        value = str(value)
+    if len(value) > IBAN_DISPLAY_CACHE_MAX_LENGTH:
+        return _display_format(value)
+    return _format_iban(value)
 
-class IBANValidator(object):
-    """ A validator for International Bank Account Numbers (IBAN - ISO 13616-1:2007). """
 
-    def __init__(self, use_nordea_extensions=False, include_countries=None):
-        self.validation_countries = IBAN_COUNTRY_CODE_LENGTH.copy()
-        if use_nordea_extensions:
-            self.validation_countries.update(NORDEA_COUNTRY_CODE_LENGTH)
+class IBANCountryRules(object):
+    """
+    The country rules of an IBANValidator configuration.
 
-        self.include_countries = include_countries
-        if self.include_countries:
-            for country_code in include_countries:
-                if country_code not in self.validation_countries:
+    ``lengths`` is a read-only mapping of every country code that can be validated to its IBAN length and
+    ``include_countries`` is a ``django_iban.countries.CountrySet`` of the allowed country codes, or None if all of them
+    are allowed. Instances are immutable and shared by all validators with the same configuration, get them from
+    ``iban_rules_registry``.
+
+    ``iban_format`` is the compiled IBAN format of the countries (see ``django_iban.bban.get_iban_format``), or None
+    for the shared format of the current BBAN structures. ``cache_key`` is a digest of the rules that is the same in
+    all processes, the shared validation caches use it. The shared caches can outlive an upgrade of django-iban, so the
+    digest of the shared format includes the version of the current rule set (see ``django_iban.rules``).
+    """
+    __slots__ = ('lengths', 'include_countries', 'iban_format', 'cache_key')
+
+    def __init__(self, lengths, include_countries, iban_format=None):
+        object.__setattr__(self, 'lengths', types.MappingProxyType(dict(lengths)))
+        object.__setattr__(self, 'include_countries', include_countries)
+        object.__setattr__(self, 'iban_format', iban_format)
+        if iban_format is None:
+            # django_iban.rules imports this module.
+            from .rules import get_current_rule_set
+            format_key = get_current_rule_set().version
+        else:
+            format_key = iban_format.pattern
+        rules = repr((sorted(lengths.items()), sorted(include_countries or ()), format_key))
+        object.__setattr__(self, 'cache_key', hashlib.blake2b(rules.encode('ascii'), digest_size=8).hexdigest())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('IBANCountryRules instances are immutable.')
+
+    def __reduce__(self):
+        # Pickled with the validators that are sent to worker processes.
+        return IBANCountryRules, (dict(self.lengths), self.include_countries, self.iban_format)
+
+
+class IBANRulesRegistry(object):
+    """
+    Interns IBANCountryRules by (use_nordea_extensions, include_countries, rule set version) and keeps hit and miss
+    counts.
+    """
+
+    def __init__(self):
+        self._rules = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, use_nordea_extensions=False, include_countries=None, rule_set=None):
+        """
+        Returns the rules of the configuration. ``rule_set`` is a ``django_iban.rules.CountryRuleSet`` to use instead of
+        the current country rules, e.g. for comparing with a previous version of the rules.
+        """
+        if include_countries:
+            try:
+                include_countries = CountrySet(include_countries)
+            except ValueError as e:
+                raise ImproperlyConfigured('Invalid include_countries: %s' % e)
+        key = (bool(use_nordea_extensions), include_countries or None,
+               rule_set.version if rule_set is not None else None)
+        rules = self._rules.get(key)
+        if rules is not None:
+            self.hits += 1
+            return rules
+
+        self.misses += 1
+        use_nordea_extensions, include_countries, version = key
+        if rule_set is None:
+            lengths = IBAN_COUNTRY_CODE_LENGTH.copy()
+            if use_nordea_extensions:
+                lengths.update(NORDEA_COUNTRY_CODE_LENGTH)
+            iban_format = None
+        else:
+            lengths = dict(rule_set.lengths)
+            if use_nordea_extensions:
+                lengths.update(rule_set.nordea_lengths)
+            iban_format = compile_iban_format(rule_set.formats)
+
+        if include_countries:
+            for country_code in sorted(include_countries):
+                if country_code not in lengths:
                     msg = 'Explicitly requested country code %s is not part of the configured IBAN validation set.' % country_code
                     raise ImproperlyConfigured(msg)
 
+        return self._rules.setdefault(key, IBANCountryRules(lengths, include_countries, iban_format))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._rules)}
+
+    def clear(self):
+        self._rules.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+iban_rules_registry = IBANRulesRegistry()
+
+
+class IBANValidator(object):
+    """ A validator for International Bank Account Numbers (IBAN - ISO 13616-1:2007). """
+
+    def __init__(self, use_nordea_extensions=False, include_countries=None, rule_set=None):
+        self.rules = iban_rules_registry.get(use_nordea_extensions, include_countries, rule_set)
+        # Both are read-only and shared with all validators of the same configuration.
+        self.validation_countries = self.rules.lengths
+        self.include_countries = self.rules.include_countries
+
+    def __getstate__(self):
+        # The read-only lengths can't be pickled, they are restored from the rules.
+        state = self.__dict__.copy()
+        del state['validation_countries']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.validation_countries = self.rules.lengths
+
     def __call__(self, value):
         """
         Validates the IBAN value using the official IBAN validation algorithm.
@@ -137,56 +330,205 @@ class IBANValidator(object):
         if value is None:
             return value
 
-        value = value.upper().replace(' ', '').replace('-', '')
+        metrics = get_validation_metrics()
+        if metrics is not None:
+            start = now()
 
-        # 1. Check that the total IBAN length is correct as per the country. If not, the IBAN is invalid.
-        country_code = value[:2]
-        if country_code in self.validation_countries:
+        cache = get_validation_cache()
+        if cache is None:
+            value, error_code, error_param = self.check(value)
+        else:
+            key = (self.rules, normalize_iban(value))
+            result = cache.get(key)
+            if result is None:
+                result = self.check(key[1])
+                cache.set(key, result)
+            value, error_code, error_param = result
+
+        if metrics is not None:
+            country_code = value[:2]
+            if country_code not in self.validation_countries:
+                country_code = COUNTRY_INVALID
+            metrics.record_validation('iban', country_code, error_code, now() - start)
 
-            if self.validation_countries[country_code] != len(value):
-                msg_params = {'country_code': country_code, 'number': self.validation_countries[country_code]}
-                raise ValidationError(_('%(country_code)s IBANs must contain %(number)s characters.') % msg_params)
+        if error_code is not None:
+            raise self.validation_error(value, error_code, error_param)
 
+    def validation_error(self, value, error_code, error_param):
+        """
+        Returns the ValidationError of a ``check`` result, with the error code as ``code`` and the values of the message
+        in ``params``.
+        """
+        if error_code == IBAN_INVALID_LENGTH:
+            params = {'country_code': value[:2], 'number': error_param}
+        elif error_code == IBAN_INVALID_COUNTRY or error_code == IBAN_COUNTRY_NOT_ALLOWED:
+            params = {'country_code': error_param}
+        elif error_code == IBAN_INVALID_CHARACTER:
+            params = {'character': error_param}
         else:
-            raise ValidationError(_('%s is not a valid country code for IBAN.') % country_code)
-        if self.include_countries and country_code not in self.include_countries:
-            raise ValidationError(_('%s IBANs are not allowed in this field.') % country_code)
+            params = None
+        return ValidationError(IBAN_ERROR_MESSAGES[error_code], code=error_code, params=params)
 
-        # 2. Move the four initial characters to the end of the string.
-        value = value[4:] + value[:4]
+    def check(self, value):
+        """
+        Runs the validation steps of ``__call__`` without raising ``ValidationError``.
+
+        Returns a ``(normalized, error_code, error_param)`` tuple. ``error_code`` is None for a valid IBAN, otherwise
+        it is one of the ``IBAN_*`` error codes and ``error_param`` holds the value used in the error message (the
+        expected length, the country code or the offending character).
+        """
+        value = normalize_iban(value)
+        error_code, error_param = self._check_structure(value)
+        if error_code is not None:
+            return value, error_code, error_param
 
+        # 2. Move the four initial characters to the end of the string.
         # 3. Replace each letter in the string with two digits, thereby expanding the string, where
         #    A = 10, B = 11, ..., Z = 35.
-        value_digits = ''
-        for x in value:
-            ord_value = ord(x)
-            if 48 <= ord_value <= 57:  # 0 - 9
-                value_digits += x
-            elif 65 <= ord_value <= 90:  # A - Z
-                value_digits += str(ord_value - 55)
-            else:
-                raise ValidationError(_('%s is not a valid character for IBAN.') % x)
-
         # 4. Interpret the string as a decimal integer and compute the remainder of that number on division by 97.
-        if int(value_digits) % 97 != 1:
-            raise ValidationError(_('Not a valid IBAN.'))
+        #    Steps 3 and 4 are done by mod97.
+        if mod97(value[4:] + value[:4]) != 1:
+            return value, IBAN_INVALID_CHECKSUM, None
+
+        return value, None, None
+
+    def precheck(self, value):
+        """
+        Cheap structural check of an IBAN, without the checksum.
+
+        Checks the country code, the length, the allowed countries, the characters, the check digits range (02 - 98)
+        and the BBAN character classes of the country. Returns None if the IBAN passed, otherwise the ``IBAN_*`` error
+        code. Nothing is translated and no exceptions are raised, which makes this suitable for rejecting garbage
+        input early, e.g. in an API gateway. IBANs that pass still need the full validation.
+        """
+        return self._check_structure(normalize_iban(value))[0]
+
+    def _check_structure(self, value):
+        """ The validation steps before the checksum. Returns an ``(error_code, error_param)`` tuple. """
+        country_code = value[:2]
+        expected_length = self.validation_countries.get(country_code)
+        if expected_length is None:
+            return IBAN_INVALID_COUNTRY, country_code
+
+        # The IBAN format of the country covers the characters, the check digits and the BBAN character classes in one
+        # pass. Only IBANs that don't match it go through the separate steps below, which find the error.
+        iban_format = self.rules.iban_format or get_iban_format()
+        if (expected_length == len(value) and iban_format.fullmatch(value) is not None
+                and '02' <= value[2:4] <= '98'):
+            if self.include_countries and country_code not in self.include_countries:
+                return IBAN_COUNTRY_NOT_ALLOWED, country_code
+            return None, None
+
+        # 1. Check that the total IBAN length is correct as per the country. If not, the IBAN is invalid.
+        if expected_length != len(value):
+            return IBAN_INVALID_LENGTH, expected_length
+        if self.include_countries and country_code not in self.include_countries:
+            return IBAN_COUNTRY_NOT_ALLOWED, country_code
+
+        # Only 0-9 and A-Z are allowed. The check digits are in the range 02 - 98 and the BBAN has to match the
+        # character classes of the country.
+        if not (value.isalnum() and value.isascii()):
+            return IBAN_INVALID_CHARACTER, first_invalid_character(value[4:] + value[:4])
+        check_digits = value[2:4]
+        if not (check_digits.isdigit() and '02' <= check_digits <= '98'):
+            return IBAN_INVALID_CHECKSUM, None
+        return IBAN_INVALID_FORMAT, None
+
+    def validate_many(self, values):
+        """
+        Validates an iterable of IBANs without raising ``ValidationError``.
+
+        Yields a ``(value, normalized, error_code)`` tuple for every item, in input order. ``error_code`` is None for
+        valid IBANs. None values are passed through as ``(None, None, None)``, just like ``__call__`` accepts them.
+        """
+        check = self.check
+        for value in values:
+            if value is None:
+                yield None, None, None
+                continue
+            normalized, error_code, _error_param = check(value)
+            yield value, normalized, error_code
+
+
+_country_codes = None
+_bic_namespace = None
+
+
+def get_country_codes():
+    """
+    Returns a frozenset of the ISO 3166-1 alpha-2 country codes of django_countries.
+
+    django_countries is imported on first use, it isn't needed to validate IBANs and importing it takes a while.
+    """
+    global _country_codes
+    if _country_codes is None:
+        try:
+            from django_countries.data import COUNTRIES
+        except ImportError:
+            from django_countries.countries import OFFICIAL_COUNTRIES as COUNTRIES
+        _country_codes = frozenset(COUNTRIES)
+    return _country_codes
+
+
+def _get_bic_namespace():
+    """
+    Returns the first item of the cache keys of BIC results: BIC_NAMESPACE with a digest of the country codes, so the
+    shared validation caches don't return results of another django_countries version.
+    """
+    global _bic_namespace
+    if _bic_namespace is None:
+        country_codes = ','.join(sorted(get_country_codes()))
+        _bic_namespace = '%s-%s' % (BIC_NAMESPACE, hashlib.blake2b(country_codes.encode('ascii'),
+                                                                   digest_size=8).hexdigest())
+    return _bic_namespace
 
 
 def swift_bic_validator(value):
     """ Validation for ISO 9362:2009 (SWIFT-BIC). """
+    metrics = get_validation_metrics()
+    if metrics is not None:
+        start = now()
+
+    cache = get_validation_cache()
+    if cache is None:
+        error_code = _check_swift_bic(value)
+    else:
+        key = (_bic_namespace or _get_bic_namespace(), value)
+        result = cache.get(key)
+        if result is None:
+            result = (value, _check_swift_bic(value), None)
+            cache.set(key, result)
+        error_code = result[1]
+
+    if metrics is not None:
+        country_code = value[4:6]
+        if error_code is not None and country_code not in (_country_codes or get_country_codes()):
+            country_code = COUNTRY_INVALID
+        metrics.record_validation('bic', country_code, error_code, now() - start)
+
+    if error_code == BIC_INVALID_LENGTH:
+        raise ValidationError(BIC_ERROR_MESSAGES[error_code], code=error_code)
+    elif error_code == BIC_INVALID_INSTITUTION_CODE:
+        raise ValidationError(BIC_ERROR_MESSAGES[error_code], code=error_code, params={'institution_code': value[:4]})
+    elif error_code == BIC_INVALID_COUNTRY_CODE:
+        raise ValidationError(BIC_ERROR_MESSAGES[error_code], code=error_code, params={'country_code': value[4:6]})
+
 
+def _check_swift_bic(value):
+    """ Returns the ``BIC_*`` error code of the SWIFT-BIC, or None if it is valid. """
     # Length is 8 or 11.
     swift_bic_length = len(value)
     if swift_bic_length != 8 and swift_bic_length != 11:
-        raise ValidationError(_('A SWIFT-BIC is either 8 or 11 characters long.'))
+        return BIC_INVALID_LENGTH
 
     # First 4 letters are A - Z.
     institution_code = value[:4]
     for x in institution_code:
         if x not in string.ascii_uppercase:
-            raise ValidationError(_('{0} is not a valid SWIFT-BIC Institution Code.').format(institution_code))
+            return BIC_INVALID_INSTITUTION_CODE
 
     # Letters 5 and 6 consist of an ISO 3166-1 alpha-2 country code.
     country_code = value[4:6]
-    if country_code not in COUNTRIES:
-        raise ValidationError(_('{0} is not a valid SWIFT-BIC Country Code.').format(country_code))
+    if country_code not in (_country_codes or get_country_codes()):
+        return BIC_INVALID_COUNTRY_CODE
+    return None
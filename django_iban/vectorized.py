@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized IBAN validation for columnar data, e.g. an IBAN column loaded from Parquet or CSV.
+
+This module requires NumPy. It gives exactly the same results as ``IBANValidator.check``, but normalization, the
+country and length checks, the character check and the mod-97 checksum are all done as array operations over the
+whole column.
+
+Example:
+
+.. code-block:: python
+
+    from django_iban.vectorized import validate_array
+
+    valid, error_codes = validate_array(ibans, include_countries=IBAN_SEPA_COUNTRIES)
+"""
+from __future__ import unicode_literals
+
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('django_iban.vectorized requires NumPy.')
+
+from .bban import get_bban_structures
+from .validators import IBANValidator, IBAN_COUNTRY_NOT_ALLOWED, IBAN_INVALID_CHARACTER, IBAN_INVALID_CHECKSUM, \
+    IBAN_INVALID_COUNTRY, IBAN_INVALID_FORMAT, IBAN_INVALID_LENGTH
+
+
+# Country codes are looked up in tables indexed by the two (ASCII) code points of the country code.
+_COUNTRY_TABLE_SIZE = 128 * 128
+
+
+# The number of rows that validate_array converts to a code point matrix at a time, about 50 MB of matrix and
+# temporaries for spaced IBANs.
+BLOCK_SIZE = 65536
+
+# The longest value that is validated in the code point matrix: 34 characters with a separator after each one.
+_MAX_VECTORIZED_LENGTH = 68
+
+# Lookup tables of every IBANCountryRules instance seen so far. The rules are interned, so this stays small.
+_country_tables = {}
+
+
+def _country_key(first, second):
+    return first * 128 + second
+
+
+# Character classes of the BBAN positions in the class table.
+_ANY, _DIGIT, _LETTER = 0, 1, 2
+
+
+def _get_country_tables(rules):
+    """
+    Returns the lookup tables for ``rules``: the IBAN length and the row in the class table by country key, the class
+    table with the character class of every IBAN position of a country and the allowed countries (or None).
+    """
+    tables = _country_tables.get(rules)
+    if tables is None:
+        length_table = np.zeros(_COUNTRY_TABLE_SIZE, dtype=np.int64)
+        index_table = np.zeros(_COUNTRY_TABLE_SIZE, dtype=np.intp)
+        class_table = np.zeros((len(rules.lengths), max(rules.lengths.values())), dtype=np.uint8)
+        for index, (country_code, length) in enumerate(sorted(rules.lengths.items())):
+            key = _country_key(ord(country_code[0]), ord(country_code[1]))
+            length_table[key] = length
+            index_table[key] = index
+            position = 4
+            for count, character_class in get_bban_structures()[country_code].character_classes:
+                if character_class != 'c':
+                    class_table[index, position:position + count] = _DIGIT if character_class == 'n' else _LETTER
+                position += count
+
+        allowed_table = None
+        if rules.include_countries:
+            allowed_table = np.zeros(_COUNTRY_TABLE_SIZE, dtype=bool)
+            for country_code in rules.include_countries:
+                allowed_table[_country_key(ord(country_code[0]), ord(country_code[1]))] = True
+        tables = _country_tables.setdefault(rules, (length_table, index_table, class_table, allowed_table))
+    return tables
+
+
+def _to_code_points(values):
+    """
+    Converts a 1-D array of strings to a 2-D array of code points with one row per string, padded with zeros.
+
+    Returns the code points as ``uint8`` (anything outside ASCII becomes 127, which is not valid in an IBAN) and a mask
+    of the rows that contain non-ASCII characters.
+    """
+    strings = np.ascontiguousarray(values.astype(np.str_))
+    width = max(strings.dtype.itemsize // 4, 1)
+    code_points = strings.view(np.uint32).reshape(len(strings), width)
+    non_ascii = code_points >= 128
+    return np.where(non_ascii, 127, code_points).astype(np.uint8), non_ascii.any(axis=1)
+
+
+def _normalize(codes):
+    """ Uppercases ASCII letters and removes spaces and dashes. Returns the normalized code points and lengths. """
+    lowercase = (codes >= 97) & (codes <= 122)
+    codes = np.where(lowercase, codes - 32, codes)
+
+    separator = (codes == 32) | (codes == 45)  # ' ' and '-'
+    lengths = (codes != 0).sum(axis=1) - separator.sum(axis=1)
+    rows = np.flatnonzero(separator.any(axis=1))
+    if len(rows):
+        # A stable sort on the separator mask moves the other characters to the front of each row in their original
+        # order. Only the rows that contain separators need this.
+        order = np.argsort(separator[rows], axis=1, kind='stable')
+        compacted = np.take_along_axis(np.where(separator[rows], 0, codes[rows]), order, axis=1)
+        codes[rows] = compacted
+    return codes, lengths
+
+
+# The remainder is reduced modulo 97 after this many characters. Each character multiplies the running value by at most
+# 100, so 8 characters keep it below 97 * 100 ** 8, well within the int64 range.
+_MOD97_CHUNK = 8
+
+
+def _mod97(codes, lengths):
+    """ Computes the IBAN checksum remainder of every row. All characters in the rows must be 0-9 or A-Z. """
+    inside = np.arange(codes.shape[1]) < lengths[:, np.newaxis]
+    is_letter = codes >= 65
+    # Positions past the end of a row multiply by 1 and add 0, which leaves the remainder unchanged.
+    values = np.ascontiguousarray((np.where(is_letter, codes - 55, codes - 48) * inside).T.astype(np.uint8))
+    multipliers = np.ascontiguousarray(np.where(inside, np.where(is_letter, 100, 10), 1).T.astype(np.uint8))
+
+    remainders = np.zeros(len(codes), dtype=np.int64)
+    # The four initial characters are moved to the end of the string.
+    positions = list(range(4, codes.shape[1])) + list(range(4))
+    for step, position in enumerate(positions, 1):
+        remainders *= multipliers[position]
+        remainders += values[position]
+        if step % _MOD97_CHUNK == 0:
+            remainders %= 97
+    return remainders % 97
+
+
+def _is_missing(value):
+    """ Returns whether a value that isn't a string is a missing value: None, NaN or ``pandas.NA``. """
+    if value is None:
+        return True
+    try:
+        return bool(value != value)
+    except TypeError:
+        # pandas.NA, whose comparisons return pandas.NA.
+        return True
+
+
+def _validate_block(validator, present_values):
+    """ Validates an object array of strings. Returns the valid mask and the error codes of the rows. """
+    raw_lengths = np.fromiter(map(len, present_values), dtype=np.int64, count=len(present_values))
+    # Every row of the code point matrix is as wide as the longest value, so longer values than any IBAN with
+    # separators are left out of it and checked by the scalar validator.
+    oversized = raw_lengths > _MAX_VECTORIZED_LENGTH
+    if oversized.any():
+        matrix_values = present_values.copy()
+        matrix_values[oversized] = ''
+    else:
+        matrix_values = present_values
+    codes, non_ascii = _to_code_points(matrix_values)
+    # Non-ASCII text (where upper() is not a simple offset) and NUL characters (which NumPy strings can not hold) are
+    # left to the scalar validator.
+    fallback = oversized | non_ascii | ((codes != 0).sum(axis=1) != np.where(oversized, 0, raw_lengths))
+    codes, lengths = _normalize(codes)
+    row_codes = np.full(len(codes), None, dtype=object)
+
+    # 1. Country code and total length.
+    length_table, index_table, class_table, allowed_table = _get_country_tables(validator.rules)
+    if codes.shape[1] < 4:
+        # The country code and the check digits are read from the first four columns, also when all values are
+        # shorter (or were left out of the matrix for being too long).
+        codes = np.pad(codes, ((0, 0), (0, 4 - codes.shape[1])))
+    keys = _country_key(codes[:, 0].astype(np.intp), codes[:, 1].astype(np.intp))
+    expected_lengths = length_table[keys]
+
+    invalid_country = expected_lengths == 0
+    row_codes[invalid_country] = IBAN_INVALID_COUNTRY
+    pending = ~invalid_country
+
+    invalid_length = pending & (expected_lengths != lengths)
+    row_codes[invalid_length] = IBAN_INVALID_LENGTH
+    pending &= ~invalid_length
+
+    if allowed_table is not None:
+        not_allowed = pending & ~allowed_table[keys]
+        row_codes[not_allowed] = IBAN_COUNTRY_NOT_ALLOWED
+        pending &= ~not_allowed
+
+    # 2. Characters other than 0-9 and A-Z, the check digits range and the BBAN character classes.
+    inside = np.arange(codes.shape[1]) < lengths[:, np.newaxis]
+    is_digit = (codes >= 48) & (codes <= 57)
+    is_letter = (codes >= 65) & (codes <= 90)
+    invalid_character = pending & (inside & ~(is_digit | is_letter)).any(axis=1)
+    row_codes[invalid_character] = IBAN_INVALID_CHARACTER
+    pending &= ~invalid_character
+
+    check_digits = (codes[:, 2].astype(np.int64) - 48) * 10 + (codes[:, 3].astype(np.int64) - 48)
+    invalid_check_digits = pending & ~(is_digit[:, 2] & is_digit[:, 3] & (check_digits >= 2) & (check_digits <= 98))
+    row_codes[invalid_check_digits] = IBAN_INVALID_CHECKSUM
+    pending &= ~invalid_check_digits
+
+    if pending.any():
+        rows = np.flatnonzero(pending)
+        # The remaining rows have the length of their country, so the classes past the width of codes are all _ANY.
+        width = min(class_table.shape[1], codes.shape[1])
+        classes = class_table[index_table[keys[rows]], :width]
+        row_is_digit = is_digit[rows, :width]
+        row_is_letter = is_letter[rows, :width]
+        invalid_format = ((classes == _DIGIT) & ~row_is_digit) | ((classes == _LETTER) & ~row_is_letter)
+        invalid_format_rows = rows[invalid_format.any(axis=1)]
+        row_codes[invalid_format_rows] = IBAN_INVALID_FORMAT
+        pending[invalid_format_rows] = False
+
+    # 3. The mod-97 checksum of the remaining candidates.
+    if pending.any():
+        invalid_checksum = np.zeros(len(codes), dtype=bool)
+        invalid_checksum[pending] = _mod97(codes[pending], lengths[pending]) != 1
+        row_codes[invalid_checksum] = IBAN_INVALID_CHECKSUM
+        pending &= ~invalid_checksum
+
+    # Rows that are not handled by the vectorized path go through the scalar validator.
+    for index in np.flatnonzero(fallback):
+        row_codes[index] = validator.check(present_values[index])[1]
+        pending[index] = row_codes[index] is None
+
+    return pending, row_codes
+
+
+def validate_array(values, use_nordea_extensions=False, include_countries=None):
+    """
+    Validates an array of IBANs.
+
+    ``values`` is anything that converts to a 1-D NumPy array of strings, such as a list, a NumPy array or an Arrow
+    array. Missing entries (None, NaN or ``pandas.NA``) are considered valid, just like ``IBANValidator`` accepts None.
+    The validator options have the same meaning as for ``IBANValidator``. The values are validated in blocks of
+    ``BLOCK_SIZE`` rows, so the memory used doesn't grow with the length of the column.
+
+    Returns a ``(valid, error_codes)`` tuple: a boolean array and an object array holding None for valid IBANs and the
+    ``IBAN_*`` error code of ``IBANValidator.check`` otherwise.
+    """
+    validator = IBANValidator(use_nordea_extensions, include_countries)
+
+    to_numpy = getattr(values, 'to_numpy', None)
+    if to_numpy is not None:
+        # Arrow arrays only convert strings with zero_copy_only=False, pandas objects don't know the argument.
+        try:
+            values = to_numpy(zero_copy_only=False)
+        except TypeError:
+            values = to_numpy()
+    values = np.asarray(values, dtype=object).ravel()
+    count = len(values)
+
+    valid = np.ones(count, dtype=bool)
+    error_codes = np.full(count, None, dtype=object)
+    for start in range(0, count, BLOCK_SIZE):
+        block = values[start:start + BLOCK_SIZE]
+        present = np.fromiter(map(isinstance, block, repeat(str)), dtype=bool, count=len(block))
+        others = np.flatnonzero(~present)
+        if len(others):
+            block = block.copy()
+            for index in others:
+                if not _is_missing(block[index]):
+                    # E.g. an IBAN object, which the scalar validator also converts with str().
+                    block[index] = str(block[index])
+                    present[index] = True
+        if present.any():
+            block_valid, block_error_codes = _validate_block(validator, block[present])
+            valid[start:start + len(block)][present] = block_valid
+            error_codes[start:start + len(block)][present] = block_error_codes
+    return valid, error_codes
@@ -2,8 +2,7 @@
 import os
 import sys
 import re
-from distutils.core import setup
-from setuptools import find_packages
+from setuptools import find_packages, setup
 
 
 def get_long_description():
@@ -39,23 +38,29 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     zip_safe=False,
+    python_requires='>=3.8',
     install_requires=[
-        'django>=1.4',
-        'django-countries>=1.5',
+        'django>=3.2,<4.0',
+        'django-countries>=7.0',
     ],
+    extras_require={
+        'vectorized': ['numpy'],
+    },
 
     classifiers=[
         'Development Status :: 4 - Beta',
         'Environment :: Web Environment',
         'Framework :: Django',
+        'Framework :: Django :: 3.2',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: BSD License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2.6',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
         'Topic :: Utilities',
     ],
 )
@@ -10,3 +10,5 @@ INSTALLED_APPS = (
 )
 
 SECRET_KEY = "notimportant"
+
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'